@@ -1,19 +1,95 @@
-from fastapi import APIRouter, HTTPException, Query, Request
-from fastapi.responses import HTMLResponse, Response
+import base64
+import json
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from datetime import datetime
-from pathlib import Path
 
 from services.generator import GenerationService
-from schemas.requests import GenerateFaceRequest, GenerateGridRequest
+from services.executor import QueueFullError
+from services.admission import AdmissionController
+from services.model_registry import UnknownModelError
+from services.encoding import FORMATS, negotiate_format, normalize_format
+from services.video import VIDEO_FORMATS, normalize_video_format
+from models.stylegan2 import INTERPOLATION_MODES, StyleGAN2Generator
+from api.http_cache import cached_response, make_etag, not_modified
+from schemas.requests import GenerateFaceRequest, GenerateGridRequest, GenerateJobRequest
 from schemas.responses import GenerateFaceResponse
 from core.config import settings
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
-# Initialize the service
+# Initialize the service, models are loaded in the app lifespan
 generation_service = GenerationService(settings.STYLEGAN2_MODEL_PATH)
+# Cost-weighted per-client rate limits and the global compute budget
+admission = AdmissionController()
+
+def require_models():
+    """Reject generation requests until every model is loaded and warmed up"""
+    if not generation_service.is_ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Models are still loading",
+            headers={"Retry-After": str(settings.RETRY_AFTER_SECONDS)}
+        )
+
+@asynccontextmanager
+async def use_model(name: Optional[str]) -> AsyncIterator[None]:
+    """Bind the requested checkpoint for the block, loading it on first use (the default one when omitted)"""
+    if name is None:
+        yield
+        return
+    try:
+        model = await generation_service.models.get(name)
+    except UnknownModelError:
+        raise HTTPException(status_code=404, detail=f"Model {name} is not configured")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Model {name} failed to load: {str(e)}")
+    with generation_service.models.use(model):
+        yield
+
+def client_id(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def resolve_format(format: Optional[str], accept: Optional[str] = None) -> str:
+    """An explicit format wins, otherwise the best match for the Accept header"""
+    if format is None:
+        return negotiate_format(accept)
+    try:
+        return normalize_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def check_grid_size(request: GenerateGridRequest):
+    """Reject grids with more cells than one synthesis batch"""
+    cells = len(request.row_seeds) * len(request.col_seeds)
+    if cells > settings.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Grid has {cells} cells, at most MAX_BATCH_SIZE={settings.MAX_BATCH_SIZE} are allowed"
+        )
+
+def check_col_styles(request: GenerateGridRequest):
+    """Reject W layer indices the bound checkpoint does not have"""
+    num_ws = generation_service.generator.G.num_ws
+    if request.col_styles is not None and max(request.col_styles) >= num_ws:
+        raise HTTPException(
+            status_code=422,
+            detail=f"col_styles must be within [0, {num_ws - 1}] for this model"
+        )
+
+def server_sent_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+def image_headers(format: str, filename: str) -> dict:
+    """The body depends on Accept, so caches must vary on it"""
+    return {
+        "Content-Disposition": f"attachment; filename={filename}.{FORMATS[format].extension}",
+        "Vary": "Accept"
+    }
 
 # ===== WEB UI ENDPOINTS =====
 
@@ -29,90 +105,350 @@ async def grid_page(request: Request):
 
 # ===== API ENDPOINTS =====
 
-@router.post("/single", response_model=GenerateFaceResponse)
-async def generate_single_face(request: GenerateFaceRequest):
+@router.post("/single", response_model=GenerateFaceResponse, dependencies=[Depends(require_models)])
+async def generate_single_face(request: GenerateFaceRequest, http_request: Request):
     """Generate a single face image"""
-    try:
-        result = await generation_service.generate_single_image(
-            seed=request.seed,
-            truncation_psi=request.truncation,
-            enhance_face=True
-        )
-        return GenerateFaceResponse(**result)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Single image generation failed: {str(e)}")
+    async with use_model(request.model):
+        format = resolve_format(request.format)
+        cost = generation_service.estimate_single_cost(request.seed, request.truncation, True, format)
+        async with admission.admit(client_id(http_request), cost):
+            try:
+                result = await generation_service.generate_single_image(
+                    seed=request.seed,
+                    truncation_psi=request.truncation,
+                    enhance_face=True,
+                    format=format
+                )
+                return GenerateFaceResponse(**result)
+            except QueueFullError:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Single image generation failed: {str(e)}")
 
-@router.post("/style-mix")
-async def generate_face_grid(request: GenerateGridRequest):
+@router.post("/style-mix", dependencies=[Depends(require_models)])
+async def generate_face_grid(request: GenerateGridRequest, http_request: Request):
     """Generate a style-mixing of faces"""
-    try:
-        result = await generation_service.generate_grid_image(
-            row_seeds=request.row_seeds,
-            col_seeds=request.col_seeds,
-            truncation_psi=request.truncation,
-            enhance_face=True
+    check_grid_size(request)
+    async with use_model(request.model):
+        check_col_styles(request)
+        format = resolve_format(request.format)
+        cost = generation_service.estimate_grid_cost(
+            request.row_seeds, request.col_seeds, request.col_styles, request.truncation, True, format
         )
-        if result.get("url"):
-            result["url"] = result["url"] + f"?t={int(datetime.now().timestamp())}"
+        async with admission.admit(client_id(http_request), cost):
+            try:
+                result = await generation_service.generate_grid_image(
+                    row_seeds=request.row_seeds,
+                    col_seeds=request.col_seeds,
+                    col_styles=request.col_styles,
+                    truncation_psi=request.truncation,
+                    enhance_face=True,
+                    format=format
+                )
+                result.pop("image_bytes", None)
+                return result
+            except QueueFullError:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Style mixing generation failed: {str(e)}")
 
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Style mixing generation failed: {str(e)}")
+@router.post("/style-mix/stream", dependencies=[Depends(require_models)])
+async def stream_face_grid(request: GenerateGridRequest, http_request: Request):
+    """Stream a style-mixing grid as Server-Sent Events: each cell as it is ready, then the grid URL"""
+    check_grid_size(request)
+    stack = AsyncExitStack()
+    async with use_model(request.model):
+        check_col_styles(request)
+        format = resolve_format(request.format)
+        cost = generation_service.estimate_grid_cost(
+            request.row_seeds, request.col_seeds, request.col_styles, request.truncation, True, format
+        )
+        await stack.enter_async_context(admission.admit(client_id(http_request), cost))
+        # The body runs in the response's own task, outside this binding
+        model = generation_service.models.current()
+
+    async def events():
+        media_type = FORMATS[format].media_type
+        async with stack:
+            yield server_sent_event("start", {
+                "rows": len(request.row_seeds),
+                "cols": len(request.col_seeds),
+                "format": format
+            })
+            try:
+                with generation_service.models.use(model):
+                    async for item in generation_service.stream_grid_image(
+                        row_seeds=request.row_seeds,
+                        col_seeds=request.col_seeds,
+                        col_styles=request.col_styles,
+                        truncation_psi=request.truncation,
+                        format=format
+                    ):
+                        image_bytes = item.pop("image_bytes")
+                        if "row" in item:
+                            image = base64.b64encode(image_bytes).decode()
+                            yield server_sent_event("cell", {**item, "image": f"data:{media_type};base64,{image}"})
+                        else:
+                            yield server_sent_event("grid", item)
+            except Exception as e:
+                # Headers are already sent, so failures are reported in the stream
+                yield server_sent_event("error", {"detail": f"Style mixing generation failed: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-@router.get("/single/direct")
+@router.get("/single/direct", dependencies=[Depends(require_models)])
 async def generate_single_face_direct(
+    request: Request,
+    background_tasks: BackgroundTasks,
     seed: int = Query(..., description="Random seed for generation"),
     truncation: float = Query(0.5, ge=0.0, le=1.0, description="Truncation psi"),
+    format: Optional[str] = Query(None, description="webp, jpeg or png, negotiated from Accept when omitted"),
+    model: Optional[str] = Query(None, description="Configured checkpoint name, the default one when omitted"),
 ):
     """Generate and return image directly"""
-    try:
-        image_bytes = await generation_service.generate_direct_image_response(
-            seed=seed,
-            truncation_psi=truncation,
-            enhance_face=True
-        )
-        
-        return Response(
-            content=image_bytes,
-            media_type="image/png",
-            headers={"Content-Disposition": f"attachment; filename={seed}.png"}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Direct generation failed: {str(e)}")
-    
-from fastapi.responses import FileResponse
+    async with use_model(model):
+        format = resolve_format(format, request.headers.get("accept"))
+        headers = image_headers(format, str(seed))
+        # Revalidation is answered from the parameters alone, before the model or disk is touched
+        etag = make_etag(generation_service.single_filename(seed, truncation, True, format))
+        response = not_modified(request, etag, headers)
+        if response is not None:
+            return response
+        cost = generation_service.estimate_single_cost(seed, truncation, True, format)
+        async with admission.admit(client_id(request), cost):
+            try:
+                image_bytes = await generation_service.generate_direct_image_response(
+                    seed=seed,
+                    truncation_psi=truncation,
+                    enhance_face=True,
+                    background_tasks=background_tasks,
+                    format=format
+                )
 
-@router.get("/single/download")
+                return cached_response(request, image_bytes, etag, FORMATS[format].media_type, headers)
+            except QueueFullError:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Direct generation failed: {str(e)}")
+
+@router.get("/single/download", dependencies=[Depends(require_models)])
 async def download_cached_single_face(
+    request: Request,
+    background_tasks: BackgroundTasks,
     seed: int = Query(..., description="Random seed for generation"),
+    truncation: float = Query(0.5, ge=0.0, le=1.0, description="Truncation psi"),
+    format: Optional[str] = Query(None, description="webp, jpeg or png, negotiated from Accept when omitted"),
+    model: Optional[str] = Query(None, description="Configured checkpoint name, the default one when omitted"),
 ):
     """Download cached single face image if exists, otherwise generate new"""
+    async with use_model(model):
+        format = resolve_format(format, request.headers.get("accept"))
+        headers = image_headers(format, f"face_{seed}")
+        etag = make_etag(generation_service.single_filename(seed, truncation, True, format))
+        response = not_modified(request, etag, headers)
+        if response is not None:
+            return response
+        cost = generation_service.estimate_single_cost(seed, truncation, True, format)
+        async with admission.admit(client_id(request), cost):
+            try:
+                # Served from the result cache when available, generated and cached otherwise
+                result = await generation_service.generate_single_image(
+                    seed=seed,
+                    truncation_psi=truncation,
+                    enhance_face=True,
+                    save_to_disk=True,
+                    background_tasks=background_tasks,
+                    format=format
+                )
+
+                return cached_response(request, result["image_bytes"], etag, FORMATS[format].media_type, headers)
+            except QueueFullError:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
+
+@router.get("/interpolate", dependencies=[Depends(require_models)])
+async def interpolation_video(
+    request: Request,
+    seeds: List[int] = Query(..., description="Seeds to morph through, repeat the parameter for each one"),
+    steps: int = Query(settings.VIDEO_STEPS, ge=1, description="Frames between neighbouring seeds"),
+    truncation: float = Query(0.5, ge=0.0, le=1.0, description="Truncation psi"),
+    mode: str = Query("lerp", description="lerp interpolates W, slerp interpolates Z"),
+    fps: int = Query(settings.VIDEO_FPS, ge=1, le=60, description="Frames per second"),
+    format: str = Query(settings.VIDEO_FORMAT, description="mp4 or webm"),
+    model: Optional[str] = Query(None, description="Configured checkpoint name, the default one when omitted"),
+):
+    """Stream a morph between seeds as a fragmented MP4 or WebM clip"""
+    if len(seeds) < 2:
+        raise HTTPException(status_code=422, detail="At least two seeds are needed to interpolate")
+    if mode not in INTERPOLATION_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported interpolation mode '{mode}', use one of {', '.join(INTERPOLATION_MODES)}")
     try:
-        # Check if cached file exists
-        cached_path = Path("static/generated") / f"{seed}.png"
-        
-        if cached_path.exists():
-            # Return cached file instantly
-            return FileResponse(
-                cached_path,
-                media_type="image/png",
-                filename=f"face_{seed}.png"
-            )
-        else:
-            # Generate and cache the image
-            result = await generation_service.generate_single_image(
-                seed=seed,
-                truncation_psi=0.5,
-                enhance_face=True,
-                save_to_disk=True
-            )
-            
-            # Return the cached file
-            return FileResponse(
-                Path("static/generated") / result["filename"],
-                media_type="image/png",
-                filename=f"face_{seed}.png"
-            )
+        format = normalize_video_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    num_frames = StyleGAN2Generator.num_interpolation_frames(len(seeds), steps)
+    if num_frames > settings.MAX_VIDEO_FRAMES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Clip has {num_frames} frames, at most MAX_VIDEO_FRAMES={settings.MAX_VIDEO_FRAMES} are allowed"
+        )
+
+    # The clip is rendered while it streams, so the budget is held until the body is done
+    stack = AsyncExitStack()
+    async with use_model(model):
+        await stack.enter_async_context(
+            admission.admit(client_id(request), generation_service.estimate_interpolation_cost(num_frames))
+        )
+        try:
+            chunks = await generation_service.stream_interpolation_video(seeds, steps, truncation, mode, fps, format)
+        except Exception as e:
+            await stack.aclose()
+            raise HTTPException(status_code=500, detail=f"Video encoder failed to start: {str(e)}")
+
+    async def body():
+        async with stack:
+            async for chunk in chunks:
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=VIDEO_FORMATS[format].media_type,
+        headers={"Content-Disposition": f"inline; filename=interpolation_{seeds[0]}_{seeds[-1]}.{format}"}
+    )
+
+# ===== BULK JOB ENDPOINTS =====
+
+def get_job(job_id: str):
+    """Look up a bulk job or 404"""
+    job = generation_service.jobs.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/jobs", dependencies=[Depends(require_models)])
+async def submit_job(request: GenerateJobRequest):
+    """Queue a bulk generation job over a seed range and truncation values"""
+    if request.seed_end <= request.seed_start:
+        raise HTTPException(status_code=422, detail="seed_end must be greater than seed_start")
+    if any(not 0.0 <= psi <= 1.0 for psi in request.truncations):
+        raise HTTPException(status_code=422, detail="Truncation values must be between 0 and 1")
+    num_items = (request.seed_end - request.seed_start) * len(request.truncations)
+    if num_items > settings.JOB_MAX_ITEMS:
+        raise HTTPException(status_code=422, detail=f"Job has {num_items} images, at most {settings.JOB_MAX_ITEMS} are allowed")
+    job = generation_service.jobs.submit(
+        seed_start=request.seed_start,
+        seed_end=request.seed_end,
+        truncations=request.truncations,
+        enhance_face=request.enhance_face,
+        format=resolve_format(request.format),
+        shard_size=request.shard_size or settings.JOB_SHARD_SIZE
+    )
+    return job.to_dict()
+
+@router.get("/jobs")
+async def list_jobs():
+    """All bulk jobs with their progress"""
+    return [job.to_dict() for job in generation_service.jobs.jobs.values()]
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Progress of one bulk job"""
+    return get_job(job_id).to_dict()
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Stop a bulk job, finished shards are kept"""
+    job = get_job(job_id)
+    generation_service.jobs.cancel(job)
+    return job.to_dict()
+
+@router.post("/jobs/{job_id}/resume", dependencies=[Depends(require_models)])
+async def resume_job(job_id: str):
+    """Continue a cancelled or failed bulk job after its last finished shard"""
+    job = get_job(job_id)
+    generation_service.jobs.resume(job)
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}/shards/{shard}")
+async def download_shard(job_id: str, shard: int):
+    """Stream a finished tar shard"""
+    job = get_job(job_id)
+    if not 0 <= shard < job.num_shards or not job.is_complete(shard):
+        raise HTTPException(status_code=404, detail=f"Shard {shard} is not finished")
+    path = job.shard_path(shard)
+    return FileResponse(str(path), media_type="application/x-tar", filename=f"{job_id}-{path.name}")
+
+@router.get("/jobs/{job_id}/shards/{shard}/index")
+async def shard_index(job_id: str, shard: int):
+    """Name, seed, truncation and byte range of every image in a finished shard"""
+    index = generation_service.jobs.shard_index(get_job(job_id), shard)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"Shard {shard} is not finished")
+    return index
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss/eviction counters"""
+    return {
+        **generation_service.get_cache_stats(),
+        "grid_cells": generation_service.get_cell_cache_stats(),
+        "inflight": generation_service.get_inflight_stats(),
+        "face_pool": generation_service.get_face_pool_stats()
+    }
+
+@router.get("/admission/stats")
+async def admission_stats():
+    """Rate-limit rejections and the global compute budget in use"""
+    return admission.get_stats()
+
+# ===== MODEL REGISTRY ENDPOINTS =====
+
+def get_model_name(name: str) -> str:
+    """404 for a checkpoint name that is not configured"""
+    if name not in generation_service.models.paths:
+        raise HTTPException(status_code=404, detail=f"Model {name} is not configured")
+    return name
+
+@router.get("/models")
+async def list_models():
+    """Every configured checkpoint with its load state, pinning, load time and network info"""
+    return {"models": generation_service.get_models_info(), **generation_service.models.get_stats()}
+
+@router.get("/models/{name}")
+async def model_info(name: str):
+    """Load state, pinning, load time and network info of one checkpoint"""
+    return generation_service.models.get_info(get_model_name(name))
+
+@router.post("/models/{name}/pin", dependencies=[Depends(require_models)])
+async def pin_model(name: str):
+    """Load a checkpoint if needed and keep it loaded"""
+    name = get_model_name(name)
+    try:
+        await generation_service.models.pin(name)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Download failed: {str(e)}")
-    
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Model {name} failed to load: {str(e)}")
+    return generation_service.models.get_info(name)
+
+@router.post("/models/{name}/unpin")
+async def unpin_model(name: str):
+    """Let a checkpoint be evicted again when the memory budget is exceeded"""
+    try:
+        generation_service.models.unpin(get_model_name(name))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return generation_service.models.get_info(name)
+
+@router.get("/enhancer/stats", dependencies=[Depends(require_models)])
+async def enhancer_stats():
+    """Tiled super-resolution timings of the last pass"""
+    return generation_service.get_enhancer_stats()
+
+@router.get("/workers/stats", dependencies=[Depends(require_models)])
+async def worker_stats():
+    """In-flight jobs and core slices of the inference worker processes"""
+    return generation_service.get_worker_stats()
@@ -0,0 +1,76 @@
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.config import settings
+
+# Outputs are addressed by every parameter that affects them, so a given URL never changes
+IMMUTABLE = f"public, max-age={settings.HTTP_CACHE_MAX_AGE}, immutable"
+
+def make_etag(filename: str) -> str:
+    """Strong ETag from a cache filename, which already hashes the parameters, model and format"""
+    return '"' + filename.rsplit(".", 1)[0] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.replace("W/", "", 1) == etag for candidate in candidates)
+
+def not_modified(request: Request, etag: str, headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+    """A 304 when the client already holds this ETag, None otherwise"""
+    if not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": IMMUTABLE, **(headers or {})})
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single bytes range, None to send the whole body
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    # Multiple ranges would need a multipart body, sending everything is also allowed
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+def cached_response(
+    request: Request,
+    data: bytes,
+    etag: str,
+    media_type: str,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Immutable response for deterministic bytes, answering If-None-Match and Range requests"""
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Accept-Ranges": "bytes", **(headers or {})}
+    response = not_modified(request, etag, headers)
+    if response is not None:
+        return response
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range validator asks for the whole, current body
+    if range_header and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, len(data))
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(data)}"})
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+            return Response(content=data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+    return Response(content=data, media_type=media_type, headers=headers)
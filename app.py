@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import mimetypes
+import time
+from pathlib import PurePosixPath
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
 
+from core import metrics
 from core.config import settings
-from api.endpoints import router
+from core.logging_config import configure_logging
+from api.endpoints import router, generation_service
+from api.http_cache import cached_response, make_etag, not_modified
+from services.executor import QueueFullError
+from services.admission import RateLimitedError
+
+configure_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Bind the port right away and load/warm up models in the background"""
+    startup = asyncio.ensure_future(generation_service.start())
+    yield
+    startup.cancel()
+    generation_service.shutdown()
 
 app = FastAPI(
     title="StyleGAN2 Face Generator API",
     description="Generate and enhance AI faces using StyleGAN2",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -22,20 +44,80 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Trace pipeline stages per request and report them in a Server-Timing header"""
+    trace = metrics.start_trace()
+    start = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - start
+
+    route = getattr(request.scope.get("route"), "name", "other")
+    metrics.REQUEST_SECONDS.observe(total, route=route, status=response.status_code)
+    response.headers["Server-Timing"] = trace.server_timing(total)
+    return response
+
+# older Pythons do not know the WebP media type
+mimetypes.add_type("image/webp", ".webp")
+
+# Registered ahead of the /static mount so cached outputs get immutable caching and Range support
+@app.get(settings.CACHE_URL_PREFIX.rstrip("/") + "/{filename}", include_in_schema=False)
+async def cached_file(request: Request, filename: str):
+    """Serve a result cache entry, from the memory tier when it is hot"""
+    etag = make_etag(filename)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    data = await generation_service.read_cached(PurePosixPath(filename).name)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    return cached_response(request, data, etag, media_type)
+
 # mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # add router
 app.include_router(router, prefix="/api/v1/generate", tags=["generation"])
 
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    """Shed load quickly instead of letting latency grow without bound"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(RateLimitedError)
+async def rate_limited_handler(request: Request, exc: RateLimitedError):
+    """Tell the client when its token bucket can afford the request"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Stage latency histograms, queue depth, batch sizes, cache hit ratio and RSS"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "StyleGAN2 Face Generator API."}
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving, models may still be loading"""
     return {"status": "API is running."}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: every model is loaded and warmed up"""
+    readiness = generation_service.get_readiness()
+    return JSONResponse(status_code=200 if readiness["ready"] else 503, content=readiness)
+
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     favicon_path = "static/favicon.png"
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     APP_NAME: str = "StyleGAN2 API"
@@ -7,15 +7,107 @@ class Settings(BaseSettings):
 
     # model paths
     STYLEGAN2_MODEL_PATH: str = "checkpoints/StyleGAN2-256.pkl"
+    # converted G_ema artifact, defaults to the pickle path with a .safetensors suffix
+    STYLEGAN2_ARTIFACT_PATH: str = ""
     REALESRGAN_MODEL_PATH: str = "Real-ESRGAN/weights/RealESRGAN_x4plus.pth"
 
+    # extra checkpoints served by name next to the "default" one above, e.g. {"ffhq1024": "checkpoints/ffhq-1024.pkl"}
+    STYLEGAN2_MODELS: Dict[str, str] = {}
+    # generator weights kept loaded, least recently used unpinned checkpoints are evicted beyond it
+    MODEL_MEMORY_BUDGET_MB: int = 4096
+    # checkpoints never evicted, the default one is always pinned
+    MODEL_PINNED: List[str] = []
+
+    # "fp32" or "bf16" (autocast) synthesis; the enhancer also accepts "int8" (static RRDBNet quantization)
+    GENERATOR_PRECISION: str = "fp32"
+    ENHANCER_PRECISION: str = "fp32"
+    # generated faces used to calibrate int8 RRDBNet activation ranges
+    INT8_CALIBRATION_IMAGES: int = 8
+
+    # "aligned" skips face detection/warping for generator output, "full" always runs it
+    ENHANCE_MODE: str = "aligned"
+
+    # "auto" runs RRDBNet in overlapping tiles sized from the memory budget, "off" runs it whole
+    SR_TILE_MODE: str = "auto"
+    SR_TILE_SIZE: int = 0
+    SR_TILE_OVERLAP: int = 16
+    SR_TILE_BATCH_SIZE: int = 4
+    SR_MEMORY_BUDGET_MB: int = 2048
+
     # generation settings
     DEFAULT_SEED: int = 42
     DEFAULT_TRUNCATION: float = 0.5
     MAX_BATCH_SIZE: int = 64
+    BATCH_WINDOW_MS: float = 10.0
+    # pre-rendered random faces served to seedless requests (0 disables), refilled while idle
+    FACE_POOL_SIZE: int = 8
+    FACE_POOL_BATCH_SIZE: int = 4
+
+    # latent store
+    LATENT_STORE_DIR: str = "checkpoints/latents"
+    LATENT_TABLE_SIZE: int = 100000
+    LATENT_LRU_SIZE: int = 10000
+
+    # inference executor
+    INFERENCE_WORKERS: int = 1
+    INFERENCE_QUEUE_SIZE: int = 16
+    RETRY_AFTER_SECONDS: int = 5
+    # forked inference processes sharing the loaded weights, 0 keeps inference on threads
+    INFERENCE_PROCESSES: int = 0
+    # torch threads per inference process, 0 splits the available cores evenly
+    THREADS_PER_PROCESS: int = 0
+
+    # result cache
+    CACHE_DIR: str = "static/generated/cache"
+    CACHE_URL_PREFIX: str = "/static/generated/cache"
+    CACHE_MAX_BYTES: int = 1024 * 1024 * 1024
+    CACHE_MEMORY_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # style-mixing grids are enhanced per cell, restored cells are kept in memory
+    GRID_CELL_OUTSCALE: int = 2
+    GRID_ENHANCE_BATCH_SIZE: int = 8
+    GRID_CELL_CACHE_BYTES: int = 512 * 1024 * 1024
+
+    # image encoding, "webp", "jpeg" or "png" when the client does not ask for one
+    DEFAULT_IMAGE_FORMAT: str = "png"
+    # WebP/JPEG quality 1-100 (WebP above 100 is lossless), PNG zlib level 0-9
+    WEBP_QUALITY: int = 90
+    JPEG_QUALITY: int = 90
+    PNG_COMPRESSION: int = 3
+    # Cache-Control max-age of deterministic outputs, which are immutable per URL
+    HTTP_CACHE_MAX_AGE: int = 365 * 24 * 3600
+
+    # interpolation clips, streamed as fragmented MP4 or WebM through imageio-ffmpeg
+    VIDEO_FORMAT: str = "mp4"
+    VIDEO_FPS: int = 24
+    VIDEO_STEPS: int = 24
+    MAX_VIDEO_FRAMES: int = 600
+
+    # bulk generation jobs, written as tar shards with a JSON index each and resumed after a restart
+    JOBS_DIR: str = "jobs"
+    JOB_SHARD_SIZE: int = 1000
+    JOB_BATCH_SIZE: int = 8
+    JOB_MAX_ITEMS: int = 10000000
+
+    # logging, hot-path messages are DEBUG so they cost one level check when disabled
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = False
 
     # API settings
     ALLOWED_HOSTS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
+    # per-client token bucket in cost units, one generated and enhanced single face costs 1
     RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_BURST: float = 20.0
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+
+    # cost model, ms per 256px face from the per-item column of scripts.benchmark
+    COST_SYNTHESIS_MS: float = 80.0
+    COST_ENHANCE_ALIGNED_MS: float = 900.0
+    COST_ENHANCE_FULL_MS: float = 1400.0
+    # cost of a request answered from a cache or the face pool
+    COST_MIN_UNITS: float = 0.1
+    # cost units in flight across all clients, requests that do not fit wait up to the timeout
+    ADMISSION_BUDGET_UNITS: float = 16.0
+    ADMISSION_TIMEOUT_SECONDS: float = 10.0
 
 settings = Settings()
\ No newline at end of file
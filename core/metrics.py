@@ -0,0 +1,167 @@
+import bisect
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import psutil
+
+# Default latency buckets in seconds, from sub-millisecond encodes to multi-second grids
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def _format_labels(self, key: tuple, extra: str = "") -> str:
+        pairs = [f'{label}="{value}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(lines + self.samples())
+
+class Counter(_Metric):
+    """Monotonic count, optionally read from a callback at scrape time"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+        self._function = None
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_function(self, function: Callable[[], float]):
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {float(self._function())}"]
+        with self._lock:
+            return [f"{self.name}{self._format_labels(key)} {value}" for key, value in self._values.items()]
+
+class Gauge(Counter):
+    """Point-in-time value, optionally read from a callback at scrape time"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram in the Prometheus text format"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum]
+        self._series = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total) in self._series.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    bucket_label = f'le="{le}"'
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, bucket_label)} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram("stylegan2_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+REQUEST_SECONDS = Histogram("stylegan2_request_seconds", "HTTP request latency", ("route", "status"))
+BATCH_SIZE = Histogram("stylegan2_batch_size", "Seeds per batched generator call", buckets=BATCH_BUCKETS)
+QUEUE_DEPTH = Gauge("stylegan2_inference_queue_depth", "Inference jobs waiting for a free worker")
+IN_FLIGHT = Gauge("stylegan2_inference_in_flight", "Inference jobs running or waiting")
+CACHE_HIT_RATIO = Gauge("stylegan2_cache_hit_ratio", "Result cache hit ratio since start")
+CACHE_HITS = Counter("stylegan2_cache_hits_total", "Result cache hits")
+CACHE_MISSES = Counter("stylegan2_cache_misses_total", "Result cache misses")
+MODEL_LOAD_SECONDS = Histogram("stylegan2_model_load_seconds", "Time to load a checkpoint into the model registry", ("model",))
+MODEL_EVICTIONS = Counter("stylegan2_model_evictions_total", "Checkpoints evicted to stay within the memory budget")
+MODEL_MEMORY_BYTES = Gauge("stylegan2_model_memory_bytes", "Generator weights resident in the model registry")
+PROCESS_RSS = Gauge("stylegan2_process_resident_memory_bytes", "Resident set size of the API process")
+PROCESS_RSS.set_function(lambda: psutil.Process().memory_info().rss)
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+class Trace:
+    """Per-request stage durations, summed when a stage runs more than once"""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        if total is not None:
+            entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+_current_trace: ContextVar = ContextVar("trace", default=None)
+
+def start_trace() -> Trace:
+    """Begin collecting stages for the current request (or job)"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+def record_stage(name: str, seconds: float):
+    """Observe a stage duration and attribute it to the current trace, if any"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as one pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
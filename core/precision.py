@@ -0,0 +1,20 @@
+import contextlib
+
+import torch
+
+PRECISIONS = ("fp32", "bf16", "int8")
+
+# torch.inference_mode only exists from torch 1.9, older versions get no_grad
+inference_mode = getattr(torch, "inference_mode", torch.no_grad)
+
+def check_precision(precision: str, allowed=PRECISIONS) -> str:
+    """Validate a precision mode name"""
+    if precision not in allowed:
+        raise ValueError(f"Unsupported precision {precision!r}, expected one of {', '.join(allowed)}")
+    return precision
+
+def autocast(precision: str, device: torch.device):
+    """bf16 autocast context for the "bf16" mode, a no-op otherwise"""
+    if precision == "bf16":
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+    return contextlib.nullcontext()
@@ -0,0 +1,133 @@
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class LatentStore:
+    """Untruncated W vectors by seed: a memory-mapped table plus an in-process LRU
+
+    Seeds in [0, table_size) are persisted in a memory-mapped .npy table next to
+    a "filled" mask, any other seed only lives in the LRU. Truncation is applied
+    by the caller, so one stored vector serves every psi.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        fingerprint: str,
+        w_dim: int,
+        table_size: int = settings.LATENT_TABLE_SIZE,
+        lru_size: int = settings.LATENT_LRU_SIZE
+    ):
+        self.w_dim = w_dim
+        self.table_size = table_size
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.table = None
+        self.filled = None
+        if table_size > 0:
+            try:
+                self._open_table(Path(directory) / fingerprint)
+            except OSError as e:
+                logger.warning('Latent table unavailable, falling back to in-memory LRU: %s', e)
+                self.table = None
+                self.filled = None
+
+    def _open_table(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        table_path = directory / "w.npy"
+        filled_path = directory / "filled.npy"
+
+        if table_path.exists() and filled_path.exists():
+            table = open_memmap(str(table_path), mode='r+')
+            filled = open_memmap(str(filled_path), mode='r+')
+            if table.shape == (self.table_size, self.w_dim) and filled.shape == (self.table_size,):
+                self.table, self.filled = table, filled
+                return
+            logger.warning('Latent table at "%s" has a different shape, rebuilding it', directory)
+            del table, filled
+
+        # Freshly created tables are sparse files, untouched rows cost no disk
+        self.table = open_memmap(str(table_path), mode='w+', dtype=np.float32, shape=(self.table_size, self.w_dim))
+        self.filled = open_memmap(str(filled_path), mode='w+', dtype=np.bool_, shape=(self.table_size,))
+
+    def _in_table(self, seed: int) -> bool:
+        return self.table is not None and 0 <= seed < self.table_size
+
+    def lookup(self, seed: int) -> Optional[np.ndarray]:
+        """Return the stored W for a seed, or None if it has not been computed yet"""
+        with self._lock:
+            w = self._lru.get(seed)
+            if w is not None:
+                self._lru.move_to_end(seed)
+                return w
+
+        if self._in_table(seed) and self.filled[seed]:
+            w = np.array(self.table[seed])
+            self._remember(seed, w)
+            return w
+        return None
+
+    def put_many(self, seeds: List[int], ws: np.ndarray):
+        """Store untruncated W vectors, shape [N, w_dim]"""
+        for seed, w in zip(seeds, ws):
+            if self._in_table(seed):
+                # Row first, flag second, so a reader never sees a flagged empty row
+                self.table[seed] = w
+                self.filled[seed] = True
+            self._remember(seed, np.array(w, dtype=np.float32))
+
+    def get_many(self, seeds: List[int], compute_fn: Callable[[List[int]], np.ndarray]) -> np.ndarray:
+        """Return W for every seed, computing and storing the missing ones in one batch"""
+        out = np.empty((len(seeds), self.w_dim), dtype=np.float32)
+        missing = OrderedDict()
+        for i, seed in enumerate(seeds):
+            w = self.lookup(seed)
+            if w is None:
+                missing.setdefault(seed, []).append(i)
+            else:
+                out[i] = w
+
+        if missing:
+            missing_seeds = list(missing)
+            computed = compute_fn(missing_seeds)
+            self.put_many(missing_seeds, computed)
+            for seed, w in zip(missing_seeds, computed):
+                out[missing[seed]] = w
+        return out
+
+    def missing_seeds(self, seeds: List[int]) -> List[int]:
+        """Seeds in the persistent table range that have not been computed yet"""
+        if self.table is None:
+            return list(seeds)
+        return [seed for seed in seeds if not (self._in_table(seed) and self.filled[seed])]
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes the LRU holds once full, table pages are file-backed and can be reclaimed"""
+        return max(0, self.lru_size) * self.w_dim * np.dtype(np.float32).itemsize
+
+    def flush(self):
+        """Write dirty table pages back to disk"""
+        if self.table is not None:
+            self.table.flush()
+            self.filled.flush()
+
+    def _remember(self, seed: int, w: np.ndarray):
+        if self.lru_size <= 0:
+            return
+        with self._lock:
+            self._lru[seed] = w
+            self._lru.move_to_end(seed)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
@@ -2,9 +2,13 @@ import torch
 import numpy as np
 from PIL import Image
 import io
+import hashlib
+import json
+import logging
 import sys
 import os
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 # Path to submodule
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -18,22 +22,125 @@ try:
 except ImportError as e:
     raise ImportError(f"Could not import StyleGAN2 module: {e}")
 
+from core import metrics
+from core.config import settings
+from core.precision import autocast, check_precision, inference_mode
+from models.latent_store import LatentStore
+
+logger = logging.getLogger(__name__)
+
+# lerp interpolates W, slerp interpolates Z
+INTERPOLATION_MODES = ('lerp', 'slerp')
+
+def checkpoint_fingerprint(network_pkl: str) -> str:
+    """Content hash of a checkpoint file (or of its URL), used to key cached outputs"""
+    digest = hashlib.sha256()
+    if os.path.isfile(network_pkl):
+        with open(network_pkl, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    else:
+        digest.update(network_pkl.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+def slerp(a: np.ndarray, b: np.ndarray, t: np.ndarray) -> np.ndarray:
+    """Spherical interpolation between the rows of a and b, linear where they are parallel"""
+    a_unit = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b_unit = b / np.linalg.norm(b, axis=1, keepdims=True)
+    omega = np.arccos(np.clip((a_unit * b_unit).sum(axis=1, keepdims=True), -1.0, 1.0))
+    sin_omega = np.sin(omega)
+    parallel = sin_omega < 1e-6
+    sin_omega = np.where(parallel, 1.0, sin_omega)
+    spherical = (np.sin((1 - t) * omega) * a + np.sin(t * omega) * b) / sin_omega
+    return np.where(parallel, (1 - t) * a + t * b, spherical)
+
+def artifact_path_for(network_pkl: str) -> str:
+    """Converted inference artifact that lives next to a network pickle"""
+    return settings.STYLEGAN2_ARTIFACT_PATH or os.path.splitext(network_pkl)[0] + '.safetensors'
+
 class StyleGAN2Generator:
-    def __init__(self, network_pkl: str):
+    def __init__(self, network_pkl: str, use_artifact: bool = True, precision: str = settings.GENERATOR_PRECISION):
         self.network_pkl = network_pkl
+        self.use_artifact = use_artifact
+        self.precision = check_precision(precision, ("fp32", "bf16"))
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.artifact_metadata = None
         self.G = self._load_network()
+        self.fingerprint = self._compute_fingerprint()
+        self.latents = self._create_latent_store()
+
+    def _create_latent_store(self) -> LatentStore:
+        return LatentStore(settings.LATENT_STORE_DIR, self.fingerprint, self.G.w_dim)
     
     def _load_network(self):
-        """Load network using the exact same code as generate.py"""
-        print(f'Loading networks from "{self.network_pkl}"...')
+        """Load the converted artifact if present, else the pickle using the exact same code as generate.py"""
+        artifact_path = artifact_path_for(self.network_pkl)
+        if self.use_artifact and os.path.isfile(artifact_path):
+            try:
+                G = self._load_artifact(artifact_path)
+            except ImportError as e:
+                logger.warning('Skipping converted network "%s": %s', artifact_path, e)
+            else:
+                return self._prepare_for_inference(G)
+
+        logger.info('Loading networks from "%s"', self.network_pkl)
         with dnnlib.util.open_url(self.network_pkl) as f:
             G = legacy.load_network_pkl(f)['G_ema'].to(self.device)
-        
+        return self._prepare_for_inference(G)
+
+    def _prepare_for_inference(self, G):
+        """Disable fp16 blocks on CPU and keep synthesis activations channels-last"""
         if not torch.cuda.is_available():
             G.apply(lambda module: setattr(module, 'use_fp16', False))
+        # SynthesisBlock converts its activations to this memory format on entry
+        for module in G.synthesis.modules():
+            if hasattr(module, 'channels_last'):
+                module.channels_last = True
         return G
+
+    def _load_artifact(self, artifact_path: str):
+        """Build G_ema from its constructor kwargs and stream weights from the memory-mapped artifact"""
+        from safetensors import safe_open
+
+        logger.info('Loading converted network from "%s"', artifact_path)
+        with safe_open(artifact_path, framework='pt', device='cpu') as f:
+            metadata = f.metadata()
+            G_class = dnnlib.util.get_obj_by_name(metadata['class_name'])
+            G = G_class(*json.loads(metadata['init_args']), **json.loads(metadata['init_kwargs']))
+            G.eval().requires_grad_(False)
+
+            # Copy one tensor at a time from the mapping, never holding a second full state dict
+            state = G.state_dict(keep_vars=True)
+            with torch.no_grad():
+                for name in f.keys():
+                    state[name].copy_(f.get_tensor(name))
+
+        self.artifact_metadata = metadata
+        return G.to(self.device)
     
+    def _compute_fingerprint(self) -> str:
+        """Content hash of the checkpoint, used to key cached outputs"""
+        # Converted artifacts carry the source pickle's fingerprint so cache keys survive conversion
+        if self.artifact_metadata and self.artifact_metadata.get('source_fingerprint'):
+            return self.artifact_metadata['source_fingerprint']
+        return checkpoint_fingerprint(self.network_pkl)
+
+    def compute_ws(self, seeds: List[int]) -> np.ndarray:
+        """Run the mapping network for seeds and return untruncated W, shape [N, w_dim]"""
+        z = np.stack([np.random.RandomState(seed).randn(self.G.z_dim) for seed in seeds])
+        # Always fp32, stored W is shared by every precision mode
+        with inference_mode(), metrics.stage("mapping"):
+            ws = self.G.mapping(torch.from_numpy(z).to(self.device), None)
+        # Without truncation every layer receives the same W
+        return ws[:, 0].cpu().numpy()
+
+    def get_ws(self, seeds: List[int], truncation_psi: float = 0.5) -> torch.Tensor:
+        """Truncated W for seeds from the latent store, shape [N, num_ws, w_dim]"""
+        w = torch.from_numpy(self.latents.get_many(seeds, self.compute_ws)).to(self.device)
+        w_avg = self.G.mapping.w_avg
+        w = w_avg + (w - w_avg) * truncation_psi
+        return w.unsqueeze(1).repeat(1, self.G.num_ws, 1)
+
     def generate_from_seed(
         self, 
         seed: int, 
@@ -42,24 +149,57 @@ class StyleGAN2Generator:
         class_idx: Optional[int] = None
     ) -> Image.Image:
         """Generate image using the exact same logic as generate.py"""
-        
-        # Labels
-        label = torch.zeros([1, self.G.c_dim], device=self.device)
-        if self.G.c_dim != 0 and class_idx is not None:
-            label[:, class_idx] = 1
-        
-        # Generate latent vector
-        z = torch.from_numpy(np.random.RandomState(seed).randn(1, self.G.z_dim)).to(self.device)
-        
-        # Generate image
-        print('Generating single face ...')
-        with torch.no_grad():
-            img = self.G(z, label, truncation_psi=truncation_psi, noise_mode=noise_mode)
-            img = (img.permute(0, 2, 3, 1) * 127.5 + 128).clamp(0, 255).to(torch.uint8)
-        
-        # Convert to PIL Image
-        img_np = img[0].cpu().numpy()
-        return Image.fromarray(img_np, 'RGB')
+        return self.generate_from_seeds([seed], truncation_psi, noise_mode, class_idx)[0]
+
+    def generate_from_seeds(
+        self,
+        seeds: List[int],
+        truncation_psi: float = 0.5,
+        noise_mode: str = 'const',
+        class_idx: Optional[int] = None
+    ) -> List[Image.Image]:
+        """Generate a batch of images with one mapping and one synthesis pass"""
+        images = self.generate_arrays(seeds, truncation_psi, noise_mode, class_idx)
+        return [Image.fromarray(image, 'RGB') for image in images]
+
+    def generate_arrays(
+        self,
+        seeds: List[int],
+        truncation_psi: float = 0.5,
+        noise_mode: str = 'const',
+        class_idx: Optional[int] = None,
+        bgr: bool = False
+    ) -> np.ndarray:
+        """Generate a batch as a contiguous uint8 array of shape [N, H, W, 3]
+
+        With bgr=True the channels are flipped on the device, so the result can
+        be handed to OpenCV-based enhancers without another host-side copy.
+        """
+
+        # Generate images
+        logger.debug('Generating batch of %d face(s)', len(seeds))
+        with inference_mode():
+            if self.G.c_dim == 0:
+                ws = self.get_ws(seeds, truncation_psi)
+            else:
+                # Class-conditional W depends on the label, so it bypasses the latent store
+                label = torch.zeros([len(seeds), self.G.c_dim], device=self.device)
+                if class_idx is not None:
+                    label[:, class_idx] = 1
+                z = np.stack([np.random.RandomState(seed).randn(self.G.z_dim) for seed in seeds])
+                with metrics.stage("mapping"):
+                    ws = self.G.mapping(torch.from_numpy(z).to(self.device), label, truncation_psi=truncation_psi)
+            with metrics.stage("synthesis"), autocast(self.precision, self.device):
+                img = self.G.synthesis(ws, noise_mode=noise_mode)
+            return self._to_uint8(img, bgr)
+
+    @staticmethod
+    def _to_uint8(img: torch.Tensor, bgr: bool = False) -> np.ndarray:
+        """Convert NCHW synthesis output in [-1, 1] to a contiguous NHWC uint8 array"""
+        img = (img.float().permute(0, 2, 3, 1) * 127.5 + 128).clamp(0, 255).to(torch.uint8)
+        if bgr:
+            img = img.flip(3)
+        return img.contiguous().cpu().numpy()
     
     def generate_from_grid(
             self,
@@ -70,53 +210,150 @@ class StyleGAN2Generator:
             noise_mode: str = 'const'
     ) -> Image.Image:
         """Generate style mixing grid image"""
+        canvas = self.generate_grid_array(row_seeds, col_seeds, col_styles, truncation_psi, noise_mode)
+        return Image.fromarray(canvas, 'RGB')
 
-        if col_styles is None:
-            col_styles = list(range(0, 7))
+    def generate_grid_array(
+            self,
+            row_seeds: List[int],
+            col_seeds: List[int],
+            col_styles: List[int] = None,
+            truncation_psi: float = 0.5,
+            noise_mode: str = 'const',
+            bgr: bool = False
+    ) -> np.ndarray:
+        """Generate style mixing grid as a uint8 canvas of shape [H, W, 3]"""
+        pairs, cells_by_pair = self.grid_layout(row_seeds, col_seeds)
 
-        all_seeds = list(set(row_seeds + col_seeds))
-        all_z = np.stack([np.random.RandomState(seed).randn(self.G.z_dim) for seed in all_seeds])
-        all_w = self.G.mapping(torch.from_numpy(all_z).to(self.device), None)
-        w_avg = self.G.mapping.w_avg
-        all_w = w_avg + (all_w - w_avg) * truncation_psi
-        w_dict = {seed: w for seed, w in zip(all_seeds, list(all_w))}
-
-        all_images = self.G.synthesis(all_w, noise_mode=noise_mode)
-        all_images = (all_images.permute(0, 2, 3, 1) * 127.5 + 128).clamp(0, 255).to(torch.uint8).cpu().numpy()
-        image_dict = {(seed, seed): image for seed, image in zip(all_seeds, list(all_images))}
-
-        print('Generating style-mixed images...')
-        for row_seed in row_seeds:
-            for col_seed in col_seeds:
-                w = w_dict[row_seed].clone()
-                w[col_styles] = w_dict[col_seed][col_styles]
-                image = self.G.synthesis(w[np.newaxis], noise_mode=noise_mode)
-                image = (image.permute(0, 2, 3, 1) * 127.5 + 128).clamp(0, 255).to(torch.uint8)
-                image_dict[(row_seed, col_seed)] = image[0].cpu().numpy()
-
-        print('Creating style mix grid...')
+        logger.debug('Creating style mix grid of %dx%d', len(row_seeds), len(col_seeds))
         W = self.G.img_resolution
         H = self.G.img_resolution
-        canvas = Image.new('RGB', (W * (len(col_seeds) + 1), H * (len(row_seeds) + 1)), 'black')
-        
-        for row_idx, row_seed in enumerate([0] + row_seeds):
-            for col_idx, col_seed in enumerate([0] + col_seeds):
+        canvas = np.zeros((H * (len(row_seeds) + 1), W * (len(col_seeds) + 1), 3), dtype=np.uint8)
+
+        for start, images in self.iter_mixed_images(pairs, col_styles, truncation_psi, noise_mode, bgr=bgr):
+            for offset, image in enumerate(images):
+                for row_idx, col_idx in cells_by_pair[start + offset]:
+                    canvas[H * row_idx:H * (row_idx + 1), W * col_idx:W * (col_idx + 1)] = image
+
+        return canvas
+
+    @staticmethod
+    def grid_layout(
+            row_seeds: List[int],
+            col_seeds: List[int]
+    ) -> Tuple[List[Tuple[int, int]], Dict[int, List[Tuple[int, int]]]]:
+        """Unique (row_seed, col_seed) pairs of a grid and the canvas cells each one fills"""
+
+        # Header row/column cells are the unmixed seeds, body cells mix row and column styles
+        pairs = [(seed, seed) for seed in row_seeds + col_seeds]
+        pairs += [(row_seed, col_seed) for row_seed in row_seeds for col_seed in col_seeds]
+        pairs = list(OrderedDict.fromkeys(pairs))
+        pair_index = {pair: i for i, pair in enumerate(pairs)}
+
+        # Canvas positions of every pair, (0, 0) stays black
+        cells_by_pair = {}
+        for row_idx, row_seed in enumerate([None] + row_seeds):
+            for col_idx, col_seed in enumerate([None] + col_seeds):
                 if row_idx == 0 and col_idx == 0:
                     continue
-                key = (row_seed, col_seed)
                 if row_idx == 0:
                     key = (col_seed, col_seed)
-                if col_idx == 0:
+                elif col_idx == 0:
                     key = (row_seed, row_seed)
-                
-                # Get the image and paste it onto the canvas
-                img_array = image_dict[key]
-                img_pil = Image.fromarray(img_array, 'RGB')
-                canvas.paste(img_pil, (W * col_idx, H * row_idx))
-        
-        return canvas
+                else:
+                    key = (row_seed, col_seed)
+                cells_by_pair.setdefault(pair_index[key], []).append((row_idx, col_idx))
+
+        return pairs, cells_by_pair
+
+    def iter_mixed_images(
+            self,
+            pairs: List[Tuple[int, int]],
+            col_styles: List[int] = None,
+            truncation_psi: float = 0.5,
+            noise_mode: str = 'const',
+            batch_size: Optional[int] = None,
+            bgr: bool = False
+    ) -> Iterator[Tuple[int, np.ndarray]]:
+        """Synthesize style-mixed (row_seed, col_seed) pairs in chunks
+
+        Yields the index of the first pair in each chunk together with a uint8
+        array of shape [N, H, W, 3], one device-to-host transfer per chunk.
+        """
+
+        if col_styles is None:
+            col_styles = list(range(0, 7))
+        if any(style < 0 or style >= self.G.num_ws for style in col_styles):
+            raise ValueError(f"col_styles must be within [0, {self.G.num_ws - 1}]")
+        batch_size = batch_size or settings.MAX_BATCH_SIZE
+
+        all_seeds = list(OrderedDict.fromkeys(seed for pair in pairs for seed in pair))
+        seed_index = {seed: i for i, seed in enumerate(all_seeds)}
+
+        with inference_mode():
+            all_w = self.get_ws(all_seeds, truncation_psi)
+
+            # Mixed W for every pair in one step: take col_styles from the column seed
+            row_idx = torch.tensor([seed_index[row_seed] for row_seed, _ in pairs], device=self.device)
+            col_idx = torch.tensor([seed_index[col_seed] for _, col_seed in pairs], device=self.device)
+            style_mask = torch.zeros(self.G.num_ws, dtype=torch.bool, device=self.device)
+            style_mask[col_styles] = True
+            mixed_w = torch.where(style_mask[None, :, None], all_w[col_idx], all_w[row_idx])
+
+            logger.debug('Generating %d style-mixed image(s)', len(pairs))
+            for start in range(0, len(pairs), batch_size):
+                with metrics.stage("synthesis"), autocast(self.precision, self.device):
+                    images = self.G.synthesis(mixed_w[start:start + batch_size], noise_mode=noise_mode)
+                yield start, self._to_uint8(images, bgr)
         
-    
+    @staticmethod
+    def num_interpolation_frames(num_seeds: int, steps: int) -> int:
+        """Frames of a morph with steps frames between neighbouring seeds, ending on the last seed"""
+        return (num_seeds - 1) * steps + 1
+
+    def interpolation_ws(
+            self,
+            seeds: List[int],
+            steps: int,
+            truncation_psi: float = 0.5,
+            mode: str = 'lerp'
+    ) -> np.ndarray:
+        """Truncated W of every frame of a morph through seeds, shape [F, w_dim]
+
+        lerp blends the stored W of neighbouring seeds, slerp blends their Z on the
+        sphere and maps every frame. All frames are interpolated in one step.
+        """
+        if mode not in INTERPOLATION_MODES:
+            raise ValueError(f"Unsupported interpolation mode '{mode}', use one of {', '.join(INTERPOLATION_MODES)}")
+        if len(seeds) < 2 or steps < 1:
+            raise ValueError("Interpolation needs at least two seeds and one step")
+
+        # Segment and position within it of every frame, the last frame is the last seed
+        frame = np.arange(self.num_interpolation_frames(len(seeds), steps))
+        segment = np.minimum(frame // steps, len(seeds) - 2)
+        t = ((frame - segment * steps) / steps)[:, None]
+
+        with inference_mode():
+            if mode == 'lerp':
+                w = self.latents.get_many(seeds, self.compute_ws)
+                w = torch.from_numpy((w[segment] * (1 - t) + w[segment + 1] * t).astype(np.float32)).to(self.device)
+            else:
+                z = np.stack([np.random.RandomState(seed).randn(self.G.z_dim) for seed in seeds])
+                z = slerp(z[segment], z[segment + 1], t).astype(np.float32)
+                with metrics.stage("mapping"):
+                    w = self.G.mapping(torch.from_numpy(z).to(self.device), None)[:, 0]
+            w_avg = self.G.mapping.w_avg
+            w = w_avg + (w - w_avg) * truncation_psi
+            return w.cpu().numpy()
+
+    def synthesize_ws(self, ws: np.ndarray, noise_mode: str = 'const', bgr: bool = False) -> np.ndarray:
+        """Synthesize one W per image (shape [N, w_dim]) as a uint8 array of shape [N, H, W, 3]"""
+        with inference_mode():
+            w = torch.from_numpy(ws).to(self.device).unsqueeze(1).repeat(1, self.G.num_ws, 1)
+            with metrics.stage("synthesis"), autocast(self.precision, self.device):
+                img = self.G.synthesis(w, noise_mode=noise_mode)
+            return self._to_uint8(img, bgr)
+
     def image_to_bytes(self, image: Image.Image, format: str = "PNG") -> bytes:
         """Convert PIL image to bytes for API response"""
         img_byte_arr = io.BytesIO()
@@ -124,6 +361,12 @@ class StyleGAN2Generator:
         img_byte_arr.seek(0)
         return img_byte_arr.getvalue()
     
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes held by the generator's parameters and buffers"""
+        tensors = list(self.G.parameters()) + list(self.G.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
     def get_network_info(self) -> dict:
         """Get information about the loaded network"""
         return {
@@ -132,6 +375,9 @@ class StyleGAN2Generator:
             'synthesis_layers': self.G.synthesis.num_layers,
             'latent_dim': self.G.z_dim,
             'conditioning_dim': self.G.c_dim,
-            'device': str(self.device)
+            'fingerprint': self.fingerprint,
+            'precision': self.precision,
+            'device': str(self.device),
+            'memory_bytes': self.memory_bytes
         }
     
\ No newline at end of file
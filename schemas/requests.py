@@ -1,11 +1,26 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, conint
 from typing import Optional, List
 
 class GenerateFaceRequest(BaseModel):
     seed: Optional[int] = Field(None, description="Random seed for generation")
     truncation: float = Field(0.5, ge=0.0, le=1.0, description="Truncation psi value")
+    format: Optional[str] = Field(None, description="Cached image format: webp, jpeg or png (default from settings)")
+    model: Optional[str] = Field(None, description="Configured checkpoint name (default checkpoint when omitted)")
+
+class GenerateJobRequest(BaseModel):
+    seed_start: int = Field(..., ge=0, description="First seed of the range")
+    seed_end: int = Field(..., gt=0, description="End of the seed range (exclusive)")
+    truncations: List[float] = Field([0.5], min_length=1, description="Truncation psi values, every seed is rendered at each")
+    enhance_face: bool = Field(True, description="Restore faces before encoding")
+    format: Optional[str] = Field(None, description="Image format in the shards: webp, jpeg or png (default from settings)")
+    shard_size: Optional[int] = Field(None, ge=1, description="Images per tar shard (default from settings)")
 
 class GenerateGridRequest(BaseModel):
     row_seeds: List[int] = Field(..., description="List of row seeds for style mixing")
     col_seeds: List[int] = Field(..., description="List of column seeds for style mixing")
+    col_styles: Optional[List[conint(ge=0)]] = Field(
+        None, min_length=1, description="W layers taken from the column seed (default 0-6)"
+    )
     truncation: float = Field(0.5, ge=0.0, le=1.0, description="Truncation psi value")
+    format: Optional[str] = Field(None, description="Cached image format: webp, jpeg or png (default from settings)")
+    model: Optional[str] = Field(None, description="Configured checkpoint name (default checkpoint when omitted)")
@@ -0,0 +1,13 @@
+"""Click option parsers shared by the scripts"""
+import re
+from typing import List
+
+def int_list(s: str) -> List[int]:
+    return [int(x) for x in s.split(',') if x]
+
+def num_range(s: str) -> List[int]:
+    """Accept either a comma separated list of numbers 'a,b,c' or a range 'a-c' and return as a list of ints"""
+    m = re.match(r'^(\d+)-(\d+)$', s)
+    if m:
+        return list(range(int(m.group(1)), int(m.group(2)) + 1))
+    return [int(x) for x in s.split(',')]
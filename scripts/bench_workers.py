@@ -0,0 +1,106 @@
+"""Measure throughput and memory of the multi-process inference pool at several worker counts
+
+    python -m scripts.bench_workers --workers 1,2,4,8 --requests 32 --out workers_report.json
+"""
+import asyncio
+import json
+import os
+import time
+from typing import List, Optional
+
+import click
+import numpy as np
+import psutil
+import torch
+
+from core.config import settings
+from models.stylegan2 import StyleGAN2Generator
+from scripts._cli import int_list
+from services.realesrgan_enhance import RealESRGANProcessor
+from services.worker_pool import WorkerPool
+
+def pool_memory(pool: WorkerPool) -> dict:
+    """API process RSS plus per-worker RSS and unique (unshared) memory, in MB"""
+    mb = 1024 * 1024
+    workers = [psutil.Process(pid).memory_full_info() for pid in pool.pids]
+    return {
+        'parent_rss_mb': psutil.Process().memory_info().rss / mb,
+        'worker_rss_mb': sum(info.rss for info in workers) / mb,
+        'worker_uss_mb': sum(info.uss for info in workers) / mb
+    }
+
+async def run_requests(pool: WorkerPool, seeds: List[int], truncation_psi: float, enhance: bool) -> List[float]:
+    """Push every seed through generate (+ aligned enhance) concurrently, returns per-request latency"""
+    async def one(seed: int) -> float:
+        start = time.perf_counter()
+        images = await pool.submit('generator', 'generate_arrays', [seed], truncation_psi, bgr=True)
+        if enhance:
+            await pool.submit('enhancer', 'enhance_array', images[0], aligned=True)
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*[one(seed) for seed in seeds])
+
+async def measure(pool: WorkerPool, requests: int, truncation_psi: float, enhance: bool) -> dict:
+    # Warm every worker so allocator and kernel setup are not timed
+    batches = await pool.broadcast('generator', 'generate_arrays', [0], truncation_psi, bgr=True)
+    if enhance:
+        await pool.broadcast('enhancer', 'enhance_array', batches[0][0], aligned=True)
+
+    start = time.perf_counter()
+    latencies = await run_requests(pool, list(range(1000, 1000 + requests)), truncation_psi, enhance)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'images_per_second': requests / elapsed,
+        'latency_p50': float(np.percentile(latencies, 50)),
+        'latency_p95': float(np.percentile(latencies, 95)),
+        **pool_memory(pool)
+    }
+
+@click.command()
+@click.option('--network', 'network_pkl', default=settings.STYLEGAN2_MODEL_PATH, show_default=True, help='Network pickle filename')
+@click.option('--workers', 'worker_counts', type=int_list, default='1,2,4,8', show_default=True, help='Worker counts to compare')
+@click.option('--threads', type=int, default=0, show_default=True, help='Torch threads per worker, 0 splits the cores evenly')
+@click.option('--requests', type=int, default=32, show_default=True, help='Concurrent requests per run')
+@click.option('--trunc', 'truncation_psi', type=float, default=0.5, show_default=True, help='Truncation psi')
+@click.option('--enhance/--no-enhance', default=True, show_default=True, help='Include aligned face enhancement')
+@click.option('--out', 'out_path', type=str, default=None, help='Write the report as JSON')
+def main(network_pkl: str, worker_counts: List[int], threads: int, requests: int, truncation_psi: float, enhance: bool, out_path: Optional[str]):
+    """Report images/s, latency and memory sharing for each worker count"""
+    # Same as the service: no OpenMP pool in the parent before forking
+    torch.set_num_threads(1)
+    generator = StyleGAN2Generator(network_pkl)
+    enhancer = RealESRGANProcessor(face_enhance=True, fp32=generator.device.type != 'cuda')
+    targets = {'generator': generator, 'enhancer': enhancer}
+
+    rows = []
+    for num_workers in worker_counts:
+        pool = WorkerPool(targets, num_workers=num_workers, threads_per_worker=threads)
+        pool.start()
+        try:
+            row = asyncio.get_event_loop().run_until_complete(measure(pool, requests, truncation_psi, enhance))
+        finally:
+            pool.shutdown()
+        rows.append({'workers': num_workers, 'threads_per_worker': pool.threads_per_worker, **row})
+
+    base = rows[0]['images_per_second']
+    click.echo(f"{'workers':>7} {'threads':>7} {'img/s':>8} {'scaling':>8} {'p50 s':>7} {'p95 s':>7} {'RSS MB':>8} {'USS MB':>8}")
+    for row in rows:
+        row['scaling'] = row['images_per_second'] / base
+        click.echo(
+            f"{row['workers']:>7} {row['threads_per_worker']:>7} {row['images_per_second']:>8.2f} {row['scaling']:>8.2f} "
+            f"{row['latency_p50']:>7.3f} {row['latency_p95']:>7.3f} {row['worker_rss_mb']:>8.0f} {row['worker_uss_mb']:>8.0f}"
+        )
+
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump({
+                'network': network_pkl,
+                'cpu_count': len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count(),
+                'requests': requests,
+                'enhance': enhance,
+                'runs': rows
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Per-stage and end-to-end timings on randomly initialised stand-in networks
+
+    python -m scripts.benchmark --resolutions 64,256 --batch-sizes 1,4,16 --out bench.json
+    python -m scripts.benchmark --baseline bench.json --tolerance 0.2
+"""
+import asyncio
+import json
+import platform
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import click
+import numpy as np
+import torch
+
+from core.config import settings
+from core.precision import autocast, inference_mode
+from scripts._cli import int_list
+from scripts.standins import StandInEnhancer, StandInGenerationService, StandInGenerator
+from services.cache import ResultCache
+from services.encoding import encode_image
+
+def measure(fn: Callable, repeats: int) -> dict:
+    """Seconds per call after one warmup call"""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {'mean': float(np.mean(samples)), 'p50': float(np.median(samples)), 'min': float(np.min(samples))}
+
+def stage_timings(generator: StandInGenerator, enhancer: StandInEnhancer, batch_size: int, repeats: int, cache_dir: str) -> OrderedDict:
+    """Time every stage of the generate -> enhance -> encode -> store pipeline for one batch"""
+    G = generator.G
+    device = generator.device
+    seeds = list(range(batch_size))
+    psi = settings.DEFAULT_TRUNCATION
+    cache = ResultCache(directory=cache_dir, memory_max_bytes=0)
+
+    sample_z = lambda: np.stack([np.random.RandomState(seed).randn(G.z_dim) for seed in seeds])
+    z = torch.from_numpy(sample_z()).to(device)
+
+    def synthesize(ws):
+        with autocast(generator.precision, device):
+            return G.synthesis(ws, noise_mode='const')
+
+    def store(encoded):
+        for i, data in enumerate(encoded):
+            cache.put(f'bench_{i}.png', data).read_bytes()
+
+    timings = OrderedDict()
+    with inference_mode():
+        timings['z_sampling'] = measure(sample_z, repeats)
+
+        timings['mapping'] = measure(lambda: G.mapping(z, None), repeats)
+        ws = G.mapping(z, None)
+
+        w_avg = G.mapping.w_avg
+        timings['truncation'] = measure(lambda: w_avg + (ws - w_avg) * psi, repeats)
+        ws = w_avg + (ws - w_avg) * psi
+
+        timings['synthesis'] = measure(lambda: synthesize(ws), repeats)
+        img = synthesize(ws)
+
+        timings['to_uint8'] = measure(lambda: generator._to_uint8(img, bgr=True), repeats)
+        images = list(generator._to_uint8(img, bgr=True))
+
+    timings['rrdbnet'] = measure(lambda: [enhancer.super_resolve(image) for image in images], repeats)
+    timings['gfpgan_aligned'] = measure(lambda: enhancer.enhance_aligned_batch(images), repeats)
+    enhanced = enhancer.enhance_aligned_batch(images)
+
+    for format in ('png', 'webp', 'jpeg'):
+        timings[f'{format}_encode'] = measure(lambda: [encode_image(image, format) for image in enhanced], repeats)
+    encoded = [encode_image(image) for image in enhanced]
+    timings['disk_round_trip'] = measure(lambda: store(encoded), repeats)
+    return timings
+
+async def service_timings(service: StandInGenerationService, batch_size: int, repeats: int) -> OrderedDict:
+    """Time GenerationService calls with batch_size concurrent requests"""
+    next_seed = iter(range(10 ** 6, 2 * 10 ** 6))
+
+    async def concurrent(**kwargs) -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            service.generate_single_image(seed=next(next_seed), save_to_disk=True, **kwargs) for _ in range(batch_size)
+        ])
+        return time.perf_counter() - start
+
+    async def repeated(coro_fn) -> dict:
+        await coro_fn()
+        samples = [await coro_fn() for _ in range(repeats)]
+        return {'mean': float(np.mean(samples)), 'p50': float(np.median(samples)), 'min': float(np.min(samples))}
+
+    async def cached() -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*[service.generate_single_image(seed=seed) for seed in range(batch_size)])
+        return time.perf_counter() - start
+
+    async def grid() -> float:
+        grids = [([next(next_seed), next(next_seed)], [next(next_seed), next(next_seed)]) for _ in range(batch_size)]
+        start = time.perf_counter()
+        # Small stand-ins have fewer than the default 7 style layers
+        col_styles = list(range(min(7, service.generator.G.num_ws)))
+        await asyncio.gather(*[
+            service.generate_grid_image(rows, cols, save_to_disk=True, col_styles=col_styles) for rows, cols in grids
+        ])
+        return time.perf_counter() - start
+
+    timings = OrderedDict()
+    timings['single_plain'] = await repeated(lambda: concurrent(enhance_face=False))
+    timings['single_enhanced'] = await repeated(lambda: concurrent(enhance_face=True))
+    timings['single_cached'] = await repeated(cached)
+    timings['grid_2x2_enhanced'] = await repeated(grid)
+    return timings
+
+def cost_settings(rows: List[dict]) -> dict:
+    """COST_* admission settings from per-item stage timings at the largest batch, scaled to 256px faces"""
+    largest = max(row['batch_size'] for row in rows)
+    per_face = {}
+    for row in rows:
+        if row['kind'] == 'stage' and row['batch_size'] == largest:
+            ms = row['mean'] / largest * 1000 * (256 / row['resolution']) ** 2
+            per_face.setdefault(row['stage'], []).append(ms)
+    per_face = {stage: float(np.mean(values)) for stage, values in per_face.items()}
+    return {
+        'COST_SYNTHESIS_MS': sum(per_face[stage] for stage in ('mapping', 'truncation', 'synthesis', 'to_uint8')),
+        'COST_ENHANCE_ALIGNED_MS': per_face['gfpgan_aligned'],
+        # The full path also detects and warps faces, which this does not time
+        'COST_ENHANCE_FULL_MS': per_face['rrdbnet'] + per_face['gfpgan_aligned']
+    }
+
+def find_regressions(rows: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Rows whose mean time grew by more than tolerance over the matching baseline row"""
+    key = lambda row: (row['kind'], row['resolution'], row['batch_size'], row['stage'])
+    previous = {key(row): row for row in baseline['results']}
+    regressions = []
+    for row in rows:
+        base = previous.get(key(row))
+        if base and row['mean'] > base['mean'] * (1 + tolerance):
+            regressions.append({**row, 'baseline_mean': base['mean'], 'ratio': row['mean'] / base['mean']})
+    return regressions
+
+@click.command()
+@click.option('--resolutions', type=int_list, default='64,256', show_default=True, help='Stand-in generator resolutions')
+@click.option('--batch-sizes', type=int_list, default='1,4,16', show_default=True, help='Batch sizes / concurrent requests')
+@click.option('--repeats', type=int, default=3, show_default=True, help='Timed repeats per stage')
+@click.option('--service/--no-service', 'with_service', default=True, show_default=True, help='Include end-to-end GenerationService timings')
+@click.option('--out', 'out_path', type=str, default=None, help='Write results as JSON')
+@click.option('--baseline', 'baseline_path', type=str, default=None, help='Flag regressions against a saved run')
+@click.option('--tolerance', type=float, default=0.2, show_default=True, help='Allowed slowdown over the baseline')
+def main(resolutions: List[int], batch_sizes: List[int], repeats: int, with_service: bool, out_path: Optional[str], baseline_path: Optional[str], tolerance: float):
+    """Time each pipeline stage over resolutions and batch sizes, offline and CPU-only"""
+    rows = []
+    enhancer = StandInEnhancer()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for resolution in resolutions:
+            generator = StandInGenerator(resolution)
+            for batch_size in batch_sizes:
+                for stage, stats in stage_timings(generator, enhancer, batch_size, repeats, cache_dir).items():
+                    rows.append({'kind': 'stage', 'resolution': resolution, 'batch_size': batch_size, 'stage': stage, **stats})
+
+            if with_service:
+                service = StandInGenerationService(resolution, cache_dir=cache_dir)
+                loop = asyncio.get_event_loop()
+                loop.run_until_complete(service.load_models())
+                for batch_size in batch_sizes:
+                    timings = loop.run_until_complete(service_timings(service, batch_size, repeats))
+                    for stage, stats in timings.items():
+                        rows.append({'kind': 'service', 'resolution': resolution, 'batch_size': batch_size, 'stage': stage, **stats})
+                service.shutdown()
+
+    click.echo(f"{'kind':>8} {'res':>5} {'batch':>5} {'stage':>18} {'mean s':>9} {'per item ms':>11}")
+    for row in rows:
+        per_image = row['mean'] / row['batch_size'] * 1000
+        click.echo(f"{row['kind']:>8} {row['resolution']:>5} {row['batch_size']:>5} {row['stage']:>18} {row['mean']:>9.4f} {per_image:>11.2f}")
+
+    costs = cost_settings(rows)
+    click.echo('Admission cost model: ' + ' '.join(f'{name}={ms:.1f}' for name, ms in costs.items()))
+
+    report = {
+        'machine': {'platform': platform.platform(), 'torch': torch.__version__, 'threads': torch.get_num_threads()},
+        'precision': {'generator': settings.GENERATOR_PRECISION, 'enhancer': settings.ENHANCER_PRECISION},
+        'costs': costs,
+        'results': rows
+    }
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = find_regressions(rows, json.load(f), tolerance)
+        for row in regressions:
+            click.echo(
+                f"REGRESSION {row['kind']} {row['stage']} res={row['resolution']} batch={row['batch_size']}: "
+                f"{row['baseline_mean']:.4f}s -> {row['mean']:.4f}s ({row['ratio']:.2f}x)"
+            )
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} stage(s) slower than the baseline by more than {tolerance:.0%}')
+        click.echo(f'No regressions against "{baseline_path}"')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Convert a StyleGAN2-ADA training pickle into a lean, mmap-able inference artifact
+
+    python -m scripts.convert_checkpoint convert --network checkpoints/StyleGAN2-256.pkl
+    python -m scripts.convert_checkpoint compare --network checkpoints/StyleGAN2-256.pkl
+"""
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import click
+
+from core.config import settings
+from models.stylegan2 import StyleGAN2Generator, artifact_path_for, checkpoint_fingerprint, dnnlib, legacy
+
+ARTIFACT_FORMAT = "stylegan2-ada-g_ema-v1"
+
+def tensor_content_hash(tensors: dict) -> str:
+    """sha256 over names, dtypes, shapes and raw bytes of every tensor, in name order"""
+    digest = hashlib.sha256()
+    for name in sorted(tensors):
+        tensor = tensors[name]
+        digest.update(f'{name}:{tensor.dtype}:{list(tensor.shape)};'.encode('utf-8'))
+        digest.update(tensor.numpy().tobytes())
+    return digest.hexdigest()
+
+@click.group()
+def cli():
+    """StyleGAN2 checkpoint conversion tools"""
+
+@cli.command()
+@click.option('--network', 'network_pkl', default=settings.STYLEGAN2_MODEL_PATH, show_default=True, help='Network pickle filename')
+@click.option('--out', 'out_path', default=None, help='Artifact path [default: next to the pickle]')
+def convert(network_pkl: str, out_path: str):
+    """Keep only G_ema weights, constructor kwargs, w_avg and a content hash"""
+    from safetensors.torch import save_file
+
+    out_path = out_path or artifact_path_for(network_pkl)
+    print(f'Loading networks from "{network_pkl}"...')
+    with dnnlib.util.open_url(network_pkl) as f:
+        G = legacy.load_network_pkl(f)['G_ema']
+
+    # w_avg is a registered buffer, so it travels with the weights as mapping.w_avg
+    tensors = {name: tensor.detach().cpu().contiguous() for name, tensor in G.state_dict().items()}
+    metadata = {
+        'format': ARTIFACT_FORMAT,
+        'class_name': f'{type(G).__module__}.{type(G).__name__}',
+        'init_args': json.dumps(list(G.init_args)),
+        'init_kwargs': json.dumps(dict(G.init_kwargs)),
+        'content_hash': tensor_content_hash(tensors),
+        'source_fingerprint': checkpoint_fingerprint(network_pkl),
+        'source': os.path.basename(network_pkl)
+    }
+    save_file(tensors, out_path, metadata=metadata)
+
+    size_mb = os.path.getsize(out_path) / (1024 * 1024)
+    click.echo(f'Wrote "{out_path}" ({len(tensors)} tensors, {size_mb:.1f} MB, content hash {metadata["content_hash"][:16]})')
+
+@cli.command(hidden=True)
+@click.option('--network', 'network_pkl', required=True)
+@click.option('--artifact/--pickle', default=True)
+def probe(network_pkl: str, artifact: bool):
+    """Load one path in a fresh process and print timing and peak RSS as JSON"""
+    start = time.perf_counter()
+    generator = StyleGAN2Generator(network_pkl, use_artifact=artifact)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'source': 'artifact' if generator.artifact_metadata else 'pickle',
+        'load_seconds': elapsed,
+        # ru_maxrss is reported in KiB on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'fingerprint': generator.fingerprint
+    }))
+
+@cli.command()
+@click.option('--network', 'network_pkl', default=settings.STYLEGAN2_MODEL_PATH, show_default=True, help='Network pickle filename')
+def compare(network_pkl: str):
+    """Report cold start time and peak RSS for the pickle and artifact paths"""
+    for flag in ('--pickle', '--artifact'):
+        output = subprocess.run(
+            [sys.executable, '-m', 'scripts.convert_checkpoint', 'probe', '--network', network_pkl, flag],
+            check=True, stdout=subprocess.PIPE, universal_newlines=True
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        click.echo(
+            f"{report['source']:>8}: cold start {report['load_seconds']:.2f}s, "
+            f"peak RSS {report['peak_rss_mb']:.0f} MB, fingerprint {report['fingerprint']}"
+        )
+
+if __name__ == "__main__":
+    cli()
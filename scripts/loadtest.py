@@ -0,0 +1,251 @@
+"""Latency percentiles, throughput, errors and cache hits of the HTTP API under concurrent clients
+
+Requests go through the real FastAPI app in-process (httpx ASGI transport), with
+the stand-in networks behind it, either as a synthetic mix or replayed from a
+JSONL trace of {"method", "path", "params" or "json"} objects.
+
+    python -m scripts.loadtest --concurrency 1,10,100 --requests 200 --save-trace trace.jsonl --out load.json
+    python -m scripts.loadtest --trace trace.jsonl --baseline load.json --tolerance 0.2
+"""
+import asyncio
+import json
+import os
+import platform
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import click
+import httpx
+import numpy as np
+import torch
+
+import app as app_module
+from api import endpoints
+from core.config import settings
+from scripts._cli import int_list
+from scripts.standins import StandInGenerationService
+from services.cache import CellCache, ResultCache
+from services.jobs import JobManager
+
+API_PREFIX = "/api/v1/generate"
+ENDPOINTS = OrderedDict([
+    ("single", "/single"),
+    ("direct", "/single/direct"),
+    ("download", "/single/download"),
+    ("style-mix", "/style-mix")
+])
+
+def weights(s: str) -> Dict[str, float]:
+    """Parse "single=0.4,direct=0.3" into normalised endpoint weights"""
+    mix = {}
+    for part in s.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise click.BadParameter(f"Unknown endpoint '{name}', use one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    total = sum(mix.values())
+    return {name: weight / total for name, weight in mix.items()}
+
+def synthetic_requests(mix: Dict[str, float], count: int, seed_pool: int, seed_offset: int, rng: np.random.RandomState) -> List[dict]:
+    """Requests drawn from the endpoint mix, seeds from a pool of seed_pool so repeats hit the caches"""
+    names = list(mix)
+    seed = lambda: int(seed_offset + rng.randint(seed_pool))
+    requests = []
+    for name in rng.choice(names, size=count, p=[mix[name] for name in names]):
+        path = API_PREFIX + ENDPOINTS[name]
+        if name == "single":
+            requests.append({"method": "POST", "path": path, "json": {"seed": seed(), "truncation": 0.5}})
+        elif name == "style-mix":
+            body = {"row_seeds": [seed(), seed()], "col_seeds": [seed(), seed()], "truncation": 0.5}
+            requests.append({"method": "POST", "path": path, "json": body})
+        else:
+            requests.append({"method": "GET", "path": path, "params": {"seed": seed(), "truncation": 0.5}})
+    return requests
+
+def read_trace(path: str) -> List[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def endpoint_name(request: dict) -> str:
+    path = request["path"][len(API_PREFIX):] if request["path"].startswith(API_PREFIX) else request["path"]
+    return next((name for name, route in ENDPOINTS.items() if route == path), path)
+
+async def replay(client: httpx.AsyncClient, requests: List[dict], concurrency: int) -> List[dict]:
+    """Send the requests in order from concurrency closed-loop clients, returns one sample per request"""
+    pending = iter(requests)
+    samples = []
+
+    async def worker():
+        for request in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.request(
+                    request.get("method", "GET"), request["path"], params=request.get("params"), json=request.get("json")
+                )
+                status = response.status_code
+            except Exception:
+                status = 0
+            samples.append({"endpoint": endpoint_name(request), "status": status, "seconds": time.perf_counter() - start})
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples
+
+def summarize(samples: List[dict], elapsed: float) -> dict:
+    """Latency percentiles, throughput and error counts of a set of samples"""
+    latencies = np.array([sample["seconds"] for sample in samples])
+    errors = [sample for sample in samples if not 200 <= sample["status"] < 400]
+    statuses = OrderedDict()
+    for sample in sorted(samples, key=lambda sample: sample["status"]):
+        statuses[str(sample["status"])] = statuses.get(str(sample["status"]), 0) + 1
+    return {
+        "requests": len(samples),
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "throughput": len(samples) / elapsed,
+        "error_rate": len(errors) / len(samples),
+        "statuses": statuses
+    }
+
+def cache_ratios(before: dict, after: dict) -> dict:
+    """Hit ratios of the result and grid cell caches and the share of deduplicated work during a run"""
+    def delta(*keys) -> float:
+        new, old = after, before
+        for key in keys:
+            new, old = new[key], old[key]
+        return new - old
+
+    ratio = lambda hits, misses: hits / (hits + misses) if hits + misses else 0.0
+    return {
+        "result_cache_hit_ratio": ratio(delta("hits"), delta("misses")),
+        "cell_cache_hit_ratio": ratio(delta("grid_cells", "hits"), delta("grid_cells", "misses")),
+        "inflight_shared_ratio": ratio(delta("inflight", "shared"), delta("inflight", "computed")),
+        "face_pool_served": delta("face_pool", "served")
+    }
+
+async def run_level(client: httpx.AsyncClient, requests: List[dict], concurrency: int) -> List[dict]:
+    """Rows for every endpoint (and "all") at one concurrency level"""
+    before = (await client.get(API_PREFIX + "/cache/stats")).json()
+    start = time.perf_counter()
+    samples = await replay(client, requests, concurrency)
+    elapsed = time.perf_counter() - start
+    after = (await client.get(API_PREFIX + "/cache/stats")).json()
+
+    rows = [{"concurrency": concurrency, "endpoint": "all", **summarize(samples, elapsed), **cache_ratios(before, after)}]
+    for name in OrderedDict.fromkeys(sample["endpoint"] for sample in samples):
+        subset = [sample for sample in samples if sample["endpoint"] == name]
+        rows.append({"concurrency": concurrency, "endpoint": name, **summarize(subset, elapsed)})
+    return rows
+
+def reset_caches(service: StandInGenerationService, cache_dir: str):
+    """Start a level cold so levels are comparable"""
+    service.cache = ResultCache(directory=cache_dir)
+    service.cell_cache = CellCache()
+
+def find_regressions(rows: List[dict], baseline: dict, tolerance: float) -> List[dict]:
+    """Rows whose p95 grew, throughput fell or error rate rose by more than tolerance over the baseline row"""
+    key = lambda row: (row["concurrency"], row["endpoint"])
+    previous = {key(row): row for row in baseline["results"]}
+    regressions = []
+    for row in rows:
+        base = previous.get(key(row))
+        if not base:
+            continue
+        problems = []
+        if row["p95"] > base["p95"] * (1 + tolerance):
+            problems.append(f"p95 {base['p95'] * 1000:.1f}ms -> {row['p95'] * 1000:.1f}ms")
+        if row["throughput"] < base["throughput"] * (1 - tolerance):
+            problems.append(f"throughput {base['throughput']:.1f}/s -> {row['throughput']:.1f}/s")
+        if row["error_rate"] > base["error_rate"] + tolerance * max(base["error_rate"], 0.01):
+            problems.append(f"errors {base['error_rate']:.1%} -> {row['error_rate']:.1%}")
+        if problems:
+            regressions.append({**row, "problems": problems})
+    return regressions
+
+async def run(service: StandInGenerationService, levels: List[int], trace: List[dict], mix: Dict[str, float], count: int, seed_pool: int, seed: int) -> List[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory() as root:
+        # Jobs queued or interrupted in the real JOBS_DIR must not resume inside a load test
+        service.jobs = JobManager(service, directory=os.path.join(root, "jobs"))
+        await service.start()
+        if not service.is_ready:
+            raise click.ClickException("Stand-in models failed to load, see the log")
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            for index, concurrency in enumerate(levels):
+                reset_caches(service, os.path.join(root, "cache", str(concurrency)))
+                # Fresh seeds per level, so the face pool and latent store do not carry hits over
+                requests = trace or synthetic_requests(mix, count, seed_pool, index * 10 ** 6, np.random.RandomState(seed))
+                rows += await run_level(client, requests, concurrency)
+        service.shutdown()
+    return rows
+
+@click.command()
+@click.option('--concurrency', 'levels', type=int_list, default='1,10,100', show_default=True, help='Concurrent clients per level')
+@click.option('--requests', 'count', type=int, default=200, show_default=True, help='Synthetic requests per level')
+@click.option('--mix', type=weights, default='single=0.3,direct=0.3,download=0.3,style-mix=0.1', show_default=True, help='Synthetic endpoint weights')
+@click.option('--seed-pool', type=int, default=50, show_default=True, help='Distinct seeds per level, smaller pools hit the caches more')
+@click.option('--trace', 'trace_path', type=str, default=None, help='Replay a JSONL request log instead of the synthetic mix')
+@click.option('--save-trace', 'save_trace_path', type=str, default=None, help='Write the synthetic requests of the first level as a JSONL trace')
+@click.option('--resolution', type=int, default=64, show_default=True, help='Stand-in generator resolution')
+@click.option('--rate-limit/--no-rate-limit', default=False, show_default=True, help='Keep per-client admission rate limits')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the synthetic mix')
+@click.option('--out', 'out_path', type=str, default=None, help='Write results as JSON')
+@click.option('--baseline', 'baseline_path', type=str, default=None, help='Flag regressions against a saved run')
+@click.option('--tolerance', type=float, default=0.2, show_default=True, help='Allowed relative change against the baseline')
+def main(levels: List[int], count: int, mix: Dict[str, float], seed_pool: int, trace_path: Optional[str], save_trace_path: Optional[str], resolution: int, rate_limit: bool, seed: int, out_path: Optional[str], baseline_path: Optional[str], tolerance: float):
+    """Drive the in-process API with stand-in models at several concurrency levels, offline and CPU-only"""
+    trace = read_trace(trace_path) if trace_path else []
+    if save_trace_path:
+        with open(save_trace_path, 'w') as f:
+            for request in synthetic_requests(mix, count, seed_pool, 0, np.random.RandomState(seed)):
+                f.write(json.dumps(request) + '\n')
+
+    # Every route reads the module-level service, the app lifespan is not run by the ASGI transport
+    service = StandInGenerationService(resolution)
+    endpoints.generation_service = service
+    app_module.generation_service = service
+    if not rate_limit:
+        # All clients share one address in-process, so per-client buckets would throttle the whole run
+        endpoints.admission.buckets.rate = 0
+
+    rows = asyncio.get_event_loop().run_until_complete(run(service, levels, trace, mix, count, seed_pool, seed))
+
+    click.echo(f"{'clients':>7} {'endpoint':>10} {'reqs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7} {'errors':>7} {'cache hit':>9}")
+    for row in rows:
+        hit = f"{row['result_cache_hit_ratio']:.0%}" if 'result_cache_hit_ratio' in row else ''
+        click.echo(
+            f"{row['concurrency']:>7} {row['endpoint']:>10} {row['requests']:>5} {row['p50'] * 1000:>8.1f} {row['p95'] * 1000:>8.1f} "
+            f"{row['p99'] * 1000:>8.1f} {row['throughput']:>7.1f} {row['error_rate']:>7.1%} {hit:>9}"
+        )
+
+    report = {
+        'machine': {'platform': platform.platform(), 'torch': torch.__version__, 'threads': torch.get_num_threads()},
+        'settings': {
+            'resolution': resolution,
+            'trace': trace_path,
+            'mix': None if trace_path else mix,
+            'requests': len(trace) if trace_path else count,
+            'seed_pool': seed_pool,
+            'inference_workers': settings.INFERENCE_WORKERS,
+            'max_batch_size': settings.MAX_BATCH_SIZE
+        },
+        'results': rows
+    }
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = find_regressions(rows, json.load(f), tolerance)
+        for row in regressions:
+            click.echo(f"REGRESSION {row['endpoint']} clients={row['concurrency']}: {', '.join(row['problems'])}")
+        if regressions:
+            raise click.ClickException(f'{len(regressions)} row(s) worse than the baseline by more than {tolerance:.0%}')
+        click.echo(f'No regressions against "{baseline_path}"')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Quality vs latency of the reduced-precision modes, measured against fp32 on a fixed seed set
+
+    python -m scripts.precision_report --seeds 0-7 --out precision_report.json
+"""
+import json
+import time
+from typing import List, Optional, Tuple
+
+import click
+import cv2
+import numpy as np
+
+from core.config import settings
+from models.stylegan2 import StyleGAN2Generator
+from scripts._cli import num_range
+from scripts.bench_aligned_enhance import psnr
+from services.realesrgan_enhance import RealESRGANProcessor
+
+def mode_list(s: str) -> List[str]:
+    return [x for x in s.split(',') if x]
+
+def ssim(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean SSIM over channels with the usual 11x11, sigma 1.5 Gaussian window"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    a, b = a.astype(np.float64), b.astype(np.float64)
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+def run_timed(fn, inputs) -> Tuple[List[np.ndarray], float]:
+    """Run fn once to warm up, then over every input; returns outputs and mean seconds per call"""
+    fn(inputs[0])
+    start = time.perf_counter()
+    outputs = [fn(x) for x in inputs]
+    return outputs, (time.perf_counter() - start) / len(inputs)
+
+def compare(outputs: List[np.ndarray], reference: List[np.ndarray]) -> dict:
+    return {
+        'psnr_db': float(np.mean([psnr(out, ref) for out, ref in zip(outputs, reference)])),
+        'ssim': float(np.mean([ssim(out, ref) for out, ref in zip(outputs, reference)]))
+    }
+
+@click.command()
+@click.option('--network', 'network_pkl', default=settings.STYLEGAN2_MODEL_PATH, show_default=True, help='Network pickle filename')
+@click.option('--seeds', type=num_range, default='0-7', show_default=True, help='Fixed seed set to compare')
+@click.option('--trunc', 'truncation_psi', type=float, default=0.5, show_default=True, help='Truncation psi')
+@click.option('--generator-modes', type=mode_list, default='fp32,bf16', show_default=True, help='Generator precisions')
+@click.option('--enhancer-modes', type=mode_list, default='fp32,bf16,int8', show_default=True, help='Enhancer precisions')
+@click.option('--out', 'out_path', type=str, default=None, help='Write the report as JSON')
+def main(network_pkl: str, seeds, truncation_psi: float, generator_modes: List[str], enhancer_modes: List[str], out_path: Optional[str]):
+    """Time each precision mode and compare its outputs to fp32 with PSNR and SSIM"""
+    rows = []
+    generator = StyleGAN2Generator(network_pkl, precision='fp32')
+    generate = lambda seed: generator.generate_arrays([seed], truncation_psi, bgr=True)[0]
+
+    # Generator: the same network, only the synthesis autocast mode changes
+    reference = None
+    for mode in ['fp32'] + [m for m in generator_modes if m != 'fp32']:
+        generator.precision = mode
+        outputs, seconds = run_timed(generate, seeds)
+        reference = reference or outputs
+        rows.append({'model': 'stylegan2', 'stage': 'synthesis', 'precision': mode, 'seconds': seconds, **compare(outputs, reference)})
+    generator.precision = 'fp32'
+
+    # Enhancers all see the same fp32 faces, calibration uses a disjoint seed range
+    faces = [generate(seed) for seed in seeds]
+    calibration = list(generator.generate_arrays(
+        list(range(max(seeds) + 1, max(seeds) + 1 + settings.INT8_CALIBRATION_IMAGES)), truncation_psi, bgr=True
+    ))
+    references = {}
+    for mode in ['fp32'] + [m for m in enhancer_modes if m != 'fp32']:
+        enhancer = RealESRGANProcessor(
+            face_enhance=True, fp32=generator.device.type != 'cuda', precision=mode, calibration_images=calibration
+        )
+        stages = {
+            'super_resolve': enhancer.super_resolve,
+            'face_aligned': lambda img: enhancer.enhance_array(img, aligned=True)
+        }
+        for stage, fn in stages.items():
+            outputs, seconds = run_timed(fn, faces)
+            reference = references.setdefault(stage, outputs)
+            rows.append({'model': 'realesrgan', 'stage': stage, 'precision': enhancer.precision, 'seconds': seconds, **compare(outputs, reference)})
+
+    click.echo(f"{'model':>10} {'stage':>14} {'precision':>9} {'s/img':>8} {'speedup':>8} {'PSNR dB':>8} {'SSIM':>7}")
+    baselines = {}
+    for row in rows:
+        base = baselines.setdefault((row['model'], row['stage']), row['seconds'])
+        row['speedup'] = base / row['seconds'] if row['seconds'] > 0 else None
+        click.echo(
+            f"{row['model']:>10} {row['stage']:>14} {row['precision']:>9} {row['seconds']:>8.3f} "
+            f"{row['speedup']:>8.2f} {row['psnr_db']:>8.2f} {row['ssim']:>7.4f}"
+        )
+
+    if out_path:
+        with open(out_path, 'w') as f:
+            json.dump({'network': network_pkl, 'truncation_psi': truncation_psi, 'seeds': seeds, 'runs': rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
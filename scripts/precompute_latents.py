@@ -0,0 +1,43 @@
+"""Precompute untruncated W vectors for a seed range into the latent store
+
+    python -m scripts.precompute_latents --network checkpoints/StyleGAN2-256.pkl --seeds 0-99999
+"""
+import time
+from typing import List
+
+import click
+from tqdm import tqdm
+
+from core.config import settings
+from models.stylegan2 import StyleGAN2Generator
+from scripts._cli import num_range
+
+@click.command()
+@click.option('--network', 'network_pkl', default=settings.STYLEGAN2_MODEL_PATH, show_default=True, help='Network pickle filename')
+@click.option('--seeds', type=num_range, required=True, help='Seed range, e.g. 0-99999 or 1,2,3')
+@click.option('--batch', 'batch_size', type=int, default=1024, show_default=True, help='Seeds per mapping pass')
+def main(network_pkl: str, seeds: List[int], batch_size: int):
+    """Fill the latent store for SEEDS, skipping seeds that are already stored"""
+    generator = StyleGAN2Generator(network_pkl)
+    store = generator.latents
+    if store.table is None:
+        raise click.ClickException('Latent table is disabled or unavailable, nothing to precompute')
+
+    out_of_range = [seed for seed in seeds if not 0 <= seed < store.table_size]
+    if out_of_range:
+        click.echo(f'Skipping {len(out_of_range)} seed(s) outside the table range [0, {store.table_size})')
+    todo = store.missing_seeds([seed for seed in seeds if 0 <= seed < store.table_size])
+    click.echo(f'{len(todo)} seed(s) to compute')
+
+    start = time.time()
+    for i in tqdm(range(0, len(todo), batch_size), unit='batch'):
+        batch = todo[i:i + batch_size]
+        store.put_many(batch, generator.compute_ws(batch))
+    store.flush()
+
+    elapsed = time.time() - start
+    rate = len(todo) / elapsed if elapsed > 0 else 0.0
+    click.echo(f'Stored {len(todo)} W vector(s) in {elapsed:.1f}s ({rate:.0f} seeds/s)')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Small randomly initialised stand-ins with the real architectures, for offline benchmarks
+
+The generator is the stylegan2-ada-pytorch Generator, the enhancer uses RRDBNet
+and GFPGANv1Clean, only narrower and shallower than the released checkpoints.
+Nothing is downloaded, so timings can be taken on a CPU-only machine.
+"""
+import os
+import tempfile
+from typing import Optional
+
+import cv2
+import numpy as np
+import torch
+
+from core.config import settings
+from models.latent_store import LatentStore
+from models.stylegan2 import StyleGAN2Generator, dnnlib
+from services.cache import ResultCache
+from services.generator import GenerationService
+from services.realesrgan_enhance import GFPGAN_FACE_SIZE, RealESRGANProcessor
+
+class StandInGenerator(StyleGAN2Generator):
+    """StyleGAN2Generator around a randomly initialised G, latents kept in memory only"""
+
+    def __init__(self, resolution: int = 256, w_dim: int = 512, channel_max: int = 128, seed: int = 0, precision: str = settings.GENERATOR_PRECISION):
+        self.resolution = resolution
+        self.w_dim = w_dim
+        self.channel_max = channel_max
+        self.seed = seed
+        super().__init__(f'standin-{resolution}-{w_dim}-{channel_max}-{seed}', use_artifact=False, precision=precision)
+
+    def _load_network(self):
+        G_class = dnnlib.util.get_obj_by_name('training.networks.Generator')
+        torch.manual_seed(self.seed)
+        G = G_class(
+            z_dim=self.w_dim,
+            c_dim=0,
+            w_dim=self.w_dim,
+            img_resolution=self.resolution,
+            img_channels=3,
+            mapping_kwargs={'num_layers': 8},
+            synthesis_kwargs={'channel_base': self.channel_max * 64, 'channel_max': self.channel_max}
+        )
+        G.eval().requires_grad_(False)
+        return self._prepare_for_inference(G.to(self.device))
+
+    def _create_latent_store(self) -> LatentStore:
+        return LatentStore('', self.fingerprint, self.G.w_dim, table_size=0)
+
+class StandInFaceEnhancer:
+    """The parts of GFPGANer the service uses, without the face detector download
+
+    The full path treats the whole frame as one aligned face, so it times the same
+    background upsampling, restoration and paste-back work as GFPGANer.
+    """
+
+    def __init__(self, gfpgan: torch.nn.Module, device: torch.device, bg_upsampler, upscale: int = 4):
+        self.gfpgan = gfpgan
+        self.device = device
+        self.bg_upsampler = bg_upsampler
+        self.upscale = upscale
+
+    def enhance(self, img: np.ndarray, has_aligned: bool = False, only_center_face: bool = False, paste_back: bool = True, weight: float = 0.5):
+        """GFPGANer.enhance with the frame as the only face, returns (cropped, restored, pasted image)"""
+        face = cv2.resize(img, (GFPGAN_FACE_SIZE, GFPGAN_FACE_SIZE), interpolation=cv2.INTER_LINEAR)
+        face_t = torch.from_numpy(np.ascontiguousarray(face[..., ::-1])).permute(2, 0, 1)[None]
+        face_t = face_t.float().div_(127.5).sub_(1.0).to(self.device)
+        output = self.gfpgan(face_t, return_rgb=False, weight=weight)[0]
+        output = ((output.float().clamp(-1, 1) + 1) * 127.5).round().to(torch.uint8)
+        restored = output[0].permute(1, 2, 0).flip(2).contiguous().cpu().numpy()
+        if has_aligned or not paste_back:
+            return [face], [restored], None
+
+        background, _ = self.bg_upsampler.enhance(img, outscale=self.upscale)
+        height, width = background.shape[:2]
+        restored_full = cv2.resize(restored, (width, height), interpolation=cv2.INTER_LANCZOS4)
+        # Feathered mask like GFPGANer's paste-back, the frame border keeps the upsampled background
+        border = max(1, min(height, width) // 16)
+        mask = np.zeros((height, width), dtype=np.float32)
+        mask[border:height - border, border:width - border] = 1.0
+        mask = cv2.GaussianBlur(mask, (0, 0), border / 2)[..., None]
+        pasted = mask * restored_full + (1 - mask) * background.astype(np.float32)
+        return [face], [restored], np.clip(pasted, 0, 255).round().astype(np.uint8)
+
+class StandInEnhancer(RealESRGANProcessor):
+    """RealESRGANProcessor with a random RRDBNet and GFPGANv1Clean of reduced width"""
+
+    def __init__(self, num_feat: int = 32, num_block: int = 6, gfpgan_narrow: float = 0.25, seed: int = 0, **kwargs):
+        self.num_feat = num_feat
+        self.num_block = num_block
+        self.gfpgan_narrow = gfpgan_narrow
+        self.seed = seed
+        kwargs.setdefault('fp32', True)
+        super().__init__(model_name='standin', **kwargs)
+
+    def _initialize_upsampler(self):
+        from basicsr.archs.rrdbnet_arch import RRDBNet
+        from realesrgan import RealESRGANer
+
+        torch.manual_seed(self.seed)
+        model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=self.num_feat, num_block=self.num_block, num_grow_ch=self.num_feat // 2, scale=4)
+        # RealESRGANer only loads weights from a file
+        fd, model_path = tempfile.mkstemp(suffix='.pth')
+        os.close(fd)
+        try:
+            torch.save({'params_ema': model.state_dict()}, model_path)
+            return RealESRGANer(scale=4, model_path=model_path, model=model, tile=0, tile_pad=10, pre_pad=0, half=not self.fp32, gpu_id=self.gpu_id)
+        finally:
+            os.remove(model_path)
+
+    def _initialize_face_enhancer(self):
+        from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+
+        torch.manual_seed(self.seed)
+        gfpgan = GFPGANv1Clean(
+            out_size=GFPGAN_FACE_SIZE,
+            num_style_feat=128,
+            channel_multiplier=1,
+            decoder_load_path=None,
+            fix_decoder=False,
+            num_mlp=8,
+            input_is_latent=True,
+            different_w=True,
+            narrow=self.gfpgan_narrow,
+            sft_half=True
+        )
+        device = self.upsampler.device
+        self.face_enhancer = StandInFaceEnhancer(gfpgan.eval().requires_grad_(False).to(device), device, self.upsampler)
+
+class StandInGenerationService(GenerationService):
+    """GenerationService wired to the stand-in networks, optionally with its own cache directory"""
+
+    def __init__(self, resolution: int = 256, cache_dir: Optional[str] = None):
+        super().__init__(f'standin-{resolution}')
+        self.resolution = resolution
+        if cache_dir is not None:
+            self.cache = ResultCache(directory=cache_dir)
+
+    def _create_generator(self) -> StyleGAN2Generator:
+        return StandInGenerator(self.resolution)
+
+    def _create_enhancer(self) -> RealESRGANProcessor:
+        return StandInEnhancer()
@@ -0,0 +1,178 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from core.config import settings
+from services.executor import QueueFullError
+
+# Resolution the per-face stage costs are measured at
+COST_REFERENCE_RESOLUTION = 256
+
+class RateLimitedError(Exception):
+    """Raised when a client has spent its token bucket"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Rate limit exceeded, please retry later")
+        self.retry_after = retry_after
+
+class CostModel:
+    """Estimated compute of a request in units of one generated, enhanced single face"""
+
+    def __init__(
+        self,
+        resolution: int = COST_REFERENCE_RESOLUTION,
+        synthesis_ms: float = settings.COST_SYNTHESIS_MS,
+        enhance_aligned_ms: float = settings.COST_ENHANCE_ALIGNED_MS,
+        enhance_full_ms: float = settings.COST_ENHANCE_FULL_MS,
+        minimum: float = settings.COST_MIN_UNITS
+    ):
+        # Synthesis and restoration both scale with the pixel count
+        scale = (resolution / COST_REFERENCE_RESOLUTION) ** 2
+        self.synthesis_ms = synthesis_ms * scale
+        self.enhance_ms = {"none": 0.0, "aligned": enhance_aligned_ms * scale, "full": enhance_full_ms * scale}
+        self.minimum = minimum
+        tier = "aligned" if settings.ENHANCE_MODE == "aligned" else "full"
+        self.unit_ms = self.synthesis_ms + self.enhance_ms[tier]
+
+    def faces(self, count: int, tier: str) -> float:
+        """Cost of synthesizing and enhancing count faces at the given enhancement tier"""
+        return max(self.minimum, count * (self.synthesis_ms + self.enhance_ms[tier]) / self.unit_ms)
+
+class TokenBucket:
+    """Per-client token buckets refilled at rate_per_minute cost units, up to burst"""
+
+    def __init__(
+        self,
+        rate_per_minute: float = settings.RATE_LIMIT_PER_MINUTE,
+        burst: float = settings.RATE_LIMIT_BURST,
+        max_clients: int = settings.RATE_LIMIT_MAX_CLIENTS
+    ):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_clients = max_clients
+        # client -> (tokens, last refill time), least recently seen first
+        self._buckets = OrderedDict()
+
+    def take(self, client: str, cost: float):
+        """Charge cost to the client's bucket, RateLimitedError when it cannot be afforded yet"""
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+
+        # Requests above the burst run on a full bucket and leave it in debt for their full cost
+        needed = min(cost, self.burst)
+        if tokens < needed:
+            self._remember(client, tokens, now)
+            raise RateLimitedError(math.ceil((needed - tokens) / self.rate))
+        self._remember(client, tokens - cost, now)
+
+    def refund(self, client: str, cost: float):
+        """Give back the cost of a request that was admitted here but never ran"""
+        if client in self._buckets:
+            tokens, updated = self._buckets[client]
+            self._buckets[client] = (min(self.burst, tokens + cost), updated)
+
+    @property
+    def clients(self) -> int:
+        return len(self._buckets)
+
+    def _remember(self, client: str, tokens: float, now: float):
+        self._buckets[client] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+class CostBudget:
+    """Global budget of cost units in flight, requests that do not fit wait for room"""
+
+    def __init__(
+        self,
+        capacity: float = settings.ADMISSION_BUDGET_UNITS,
+        timeout: float = settings.ADMISSION_TIMEOUT_SECONDS
+    ):
+        self.capacity = capacity
+        self.timeout = timeout
+        self.used = 0.0
+        self._waiters = deque()
+
+    async def acquire(self, cost: float) -> float:
+        """Reserve cost units and return the amount to release, QueueFullError after the timeout"""
+        # A request larger than the whole budget runs alone
+        cost = min(cost, self.capacity)
+        if self.used + cost <= self.capacity:
+            self.used += cost
+            return cost
+
+        future = asyncio.get_event_loop().create_future()
+        waiter = (cost, future)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise QueueFullError()
+        except asyncio.CancelledError:
+            # Granted in the same loop iteration the caller went away
+            if future.done() and not future.cancelled():
+                self.release(cost)
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        return cost
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def release(self, cost: float):
+        self.used = max(0.0, self.used - cost)
+        # Smaller waiters that fit go ahead of a large one, so a heavy grid cannot stall light requests
+        for waiter in list(self._waiters):
+            waiter_cost, future = waiter
+            if future.done():
+                self._waiters.remove(waiter)
+            elif self.used + waiter_cost <= self.capacity:
+                self._waiters.remove(waiter)
+                self.used += waiter_cost
+                future.set_result(None)
+
+class AdmissionController:
+    """Cost-weighted per-client rate limiting in front of a global compute budget"""
+
+    def __init__(self):
+        self.buckets = TokenBucket()
+        self.budget = CostBudget()
+        self._stats = {"admitted": 0, "rate_limited": 0, "timed_out": 0}
+
+    @asynccontextmanager
+    async def admit(self, client: str, cost: float) -> AsyncIterator[None]:
+        """Charge the client and hold cost units of the global budget for the duration of the block"""
+        try:
+            self.buckets.take(client, cost)
+        except RateLimitedError:
+            self._stats["rate_limited"] += 1
+            raise
+        try:
+            reserved = await self.budget.acquire(cost)
+        except QueueFullError:
+            self.buckets.refund(client, cost)
+            self._stats["timed_out"] += 1
+            raise
+        self._stats["admitted"] += 1
+        try:
+            yield
+        finally:
+            self.budget.release(reserved)
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "budget_used": self.budget.used,
+            "budget_capacity": self.budget.capacity,
+            "waiting": self.budget.waiting,
+            "clients": self.buckets.clients
+        }
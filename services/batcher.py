@@ -0,0 +1,98 @@
+import asyncio
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+from core import metrics
+from core.config import settings
+from services.executor import InferenceExecutor
+
+if TYPE_CHECKING:
+    # Annotation only, so the batcher imports without the StyleGAN2 sources
+    from models.stylegan2 import StyleGAN2Generator
+
+class MicroBatcher:
+    """Coalesce concurrent single-seed requests into batched generator calls"""
+
+    def __init__(
+        self,
+        generator: "StyleGAN2Generator",
+        executor: InferenceExecutor,
+        window_ms: float = settings.BATCH_WINDOW_MS,
+        max_batch_size: int = settings.MAX_BATCH_SIZE
+    ):
+        self.generator = generator
+        self.executor = executor
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[int, float, str, asyncio.Future, Optional[metrics.Trace]]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def submit(
+        self,
+        seed: int,
+        truncation_psi: float = 0.5,
+        noise_mode: str = 'const'
+    ) -> np.ndarray:
+        """Queue a seed for the next batch and wait for its own BGR uint8 image"""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._pending.append((seed, truncation_psi, noise_mode, future, metrics.current_trace()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Close the current window and dispatch one batch per (psi, noise_mode) group"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        groups = OrderedDict()
+        for seed, truncation_psi, noise_mode, future, trace in pending:
+            groups.setdefault((truncation_psi, noise_mode), []).append((seed, future, trace))
+
+        # A batch is shared by every caller in it, so it never waits like background work even
+        # when the window was opened by a background caller
+        with self.executor.foreground():
+            for (truncation_psi, noise_mode), items in groups.items():
+                asyncio.ensure_future(self._run_group(truncation_psi, noise_mode, items))
+
+    async def _run_group(
+        self,
+        truncation_psi: float,
+        noise_mode: str,
+        items: List[Tuple[int, asyncio.Future, Optional[metrics.Trace]]]
+    ):
+        """Run one batched forward pass and hand each caller its own image"""
+        # Identical seeds in the same group only need to be synthesized once
+        seeds = list(OrderedDict.fromkeys(seed for seed, _, _ in items))
+        metrics.BATCH_SIZE.observe(len(seeds))
+
+        # The batch is shared, so every caller's trace gets the whole batch's stages
+        batch_trace = metrics.start_trace()
+        try:
+            images = await self.executor.run(
+                self.generator.generate_arrays, seeds, truncation_psi, noise_mode, bgr=True
+            )
+        except Exception as e:
+            for _, future, _ in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            for _, _, trace in items:
+                if trace is not None:
+                    for name, seconds in batch_trace.stages.items():
+                        trace.add(name, seconds)
+
+        image_dict = dict(zip(seeds, images))
+        for seed, future, _ in items:
+            if not future.done():
+                future.set_result(image_dict[seed])
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional
+
+import numpy as np
+
+from core import metrics
+from core.config import settings
+
+TEMP_PREFIX = ".tmp-"
+
+class ResultCache:
+    """Byte-bounded LRU cache of encoded images with an in-memory hot tier"""
+
+    def __init__(
+        self,
+        directory: str = settings.CACHE_DIR,
+        max_bytes: int = settings.CACHE_MAX_BYTES,
+        memory_max_bytes: int = settings.CACHE_MEMORY_MAX_BYTES,
+        url_prefix: str = settings.CACHE_URL_PREFIX
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.url_prefix = url_prefix.rstrip("/")
+
+        # filename -> size on disk, least recently used first
+        self._entries = OrderedDict()
+        self._disk_bytes = 0
+        # filename -> encoded bytes, least recently used first
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "memory_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def make_filename(prefix: str, extension: str = "png", **params) -> str:
+        """Build a cache filename from every parameter that affects the output"""
+        payload = json.dumps(params, sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:20]
+        return f"{prefix}_{digest}.{extension}"
+
+    def path(self, filename: str) -> Path:
+        return self.directory / filename
+
+    def url(self, filename: str) -> str:
+        return f"{self.url_prefix}/{filename}"
+
+    def get(self, filename: str) -> Optional[bytes]:
+        """Return cached bytes from memory or disk, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(filename)
+            if data is not None:
+                self._memory.move_to_end(filename)
+                # Entries remembered ahead of a deferred put are not on disk yet
+                if filename in self._entries:
+                    self._entries.move_to_end(filename)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return data
+            if filename not in self._entries:
+                self._stats["misses"] += 1
+                return None
+
+        try:
+            with metrics.stage("disk_read"):
+                data = self.path(filename).read_bytes()
+                os.utime(self.path(filename))
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(filename)
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            if filename in self._entries:
+                self._entries.move_to_end(filename)
+            self._remember(filename, data)
+            self._stats["hits"] += 1
+        return data
+
+    def contains(self, filename: str) -> bool:
+        """Whether an entry is cached, without reading it or counting a lookup"""
+        with self._lock:
+            return filename in self._memory or filename in self._entries
+
+    def put(self, filename: str, data: bytes) -> Path:
+        """Atomically write bytes to the cache and evict old entries over budget"""
+        with metrics.stage("disk_write"):
+            fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=str(self.directory))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            path = self._commit(temp_path, filename)
+        with self._lock:
+            self._remember(filename, data)
+        return path
+
+    def remember(self, filename: str, data: bytes):
+        """Serve bytes from the hot tier right away, ahead of a deferred put"""
+        with self._lock:
+            self._remember(filename, data)
+
+    def get_stats(self) -> dict:
+        """Hit/miss/eviction counters and current usage"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "disk_bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes
+            }
+
+    def _commit(self, temp_path: str, filename: str) -> Path:
+        path = self.path(filename)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._forget(filename, keep_memory=True)
+            self._entries[filename] = size
+            self._disk_bytes += size
+            self._stats["writes"] += 1
+            self._evict()
+        return path
+
+    def _remember(self, filename: str, data: bytes):
+        if len(data) > self.memory_max_bytes:
+            return
+        if filename in self._memory:
+            self._memory_bytes -= len(self._memory.pop(filename))
+        self._memory[filename] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _forget(self, filename: str, keep_memory: bool = False):
+        size = self._entries.pop(filename, None)
+        if size is not None:
+            self._disk_bytes -= size
+        if not keep_memory and filename in self._memory:
+            self._memory_bytes -= len(self._memory.pop(filename))
+
+    def _evict(self):
+        # Never evict the entry that was just written
+        while self._disk_bytes > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self._disk_bytes -= size
+            if filename in self._memory:
+                self._memory_bytes -= len(self._memory.pop(filename))
+            try:
+                self.path(filename).unlink()
+            except FileNotFoundError:
+                pass
+            self._stats["evictions"] += 1
+
+    def _scan(self):
+        """Rebuild the index from disk, oldest access first, and drop stale temp files"""
+        files = []
+        for path in self.directory.iterdir():
+            if not path.is_file():
+                continue
+            if path.name.startswith(TEMP_PREFIX):
+                path.unlink()
+                continue
+            stat = path.stat()
+            files.append((stat.st_mtime, path.name, stat.st_size))
+
+        for _, filename, size in sorted(files):
+            self._entries[filename] = size
+            self._disk_bytes += size
+        self._evict()
+
+class CellCache:
+    """Byte-bounded in-memory LRU of enhanced grid cells as BGR uint8 arrays"""
+
+    def __init__(self, max_bytes: int = settings.GRID_CELL_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._cells = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            cell = self._cells.get(key)
+            if cell is None:
+                self._stats["misses"] += 1
+                return None
+            self._cells.move_to_end(key)
+            self._stats["hits"] += 1
+            return cell
+
+    def put(self, key: Hashable, cell: np.ndarray):
+        if cell.nbytes > self.max_bytes:
+            return
+        # Views would pin their whole parent batch and make the byte budget meaningless
+        if cell.base is not None:
+            cell = cell.copy()
+        with self._lock:
+            if key in self._cells:
+                self._bytes -= self._cells.pop(key).nbytes
+            self._cells[key] = cell
+            self._bytes += cell.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._cells.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self._stats["evictions"] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._cells), "bytes": self._bytes, "max_bytes": self.max_bytes}
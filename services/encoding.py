@@ -0,0 +1,82 @@
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from core import metrics
+from core.config import settings
+
+class ImageFormat(NamedTuple):
+    extension: str
+    media_type: str
+    flag: int
+    level: int
+
+# Preference order when the client accepts several formats equally
+FORMATS = {
+    "webp": ImageFormat("webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY, settings.WEBP_QUALITY),
+    "jpeg": ImageFormat("jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY, settings.JPEG_QUALITY),
+    "png": ImageFormat("png", "image/png", cv2.IMWRITE_PNG_COMPRESSION, settings.PNG_COMPRESSION)
+}
+ALIASES = {"jpg": "jpeg"}
+
+def encode_image(image_bgr: np.ndarray, format: str = "png", level: Optional[int] = None) -> bytes:
+    """Encode a BGR uint8 array in one pass, straight from the pipeline's native layout"""
+    spec = FORMATS[format]
+    level = spec.level if level is None else level
+    with metrics.stage("encode"):
+        ok, buffer = cv2.imencode(f".{spec.extension}", image_bgr, [spec.flag, level])
+    if not ok:
+        raise ValueError(f"Could not encode image as {format}")
+    return buffer.tobytes()
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode encoded bytes back to a BGR uint8 array"""
+    with metrics.stage("decode"):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+def normalize_format(format: str) -> str:
+    """Canonical format name, ValueError for formats we cannot encode"""
+    name = ALIASES.get(format.lower(), format.lower())
+    if name not in FORMATS:
+        raise ValueError(f"Unsupported image format '{format}', expected one of {', '.join(FORMATS)}")
+    return name
+
+def negotiate_format(accept: Optional[str], default: str = settings.DEFAULT_IMAGE_FORMAT) -> str:
+    """Pick the best encodable format for an Accept header
+
+    Highest q wins, then a format named explicitly over one matched by a wildcard,
+    then the default, then FORMATS order. An explicit entry, q=0 included, overrides
+    the wildcards, and image/* overrides */*.
+    """
+    if not accept:
+        return default
+
+    scores = {}
+    for part in accept.split(","):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        scores[media_type.lower()] = quality
+
+    wildcard = scores.get("image/*", scores.get("*/*", 0.0))
+    candidates = []
+    for order, (name, spec) in enumerate(FORMATS.items()):
+        explicit = spec.media_type in scores
+        quality = scores[spec.media_type] if explicit else wildcard
+        candidates.append((quality, explicit, name == default, -order, name))
+    quality, _, _, _, best = max(candidates)
+    if quality > 0:
+        return best
+    # Nothing is acceptable, fall back to a format the client did not refuse outright
+    refused = {name for name, spec in FORMATS.items() if scores.get(spec.media_type) == 0.0}
+    return next((name for name in [default, *FORMATS] if name not in refused), default)
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from core import metrics
+from core.config import settings
+
+# Jobs submitted while this is set wait until no other job is in flight
+_background = contextvars.ContextVar("background", default=False)
+IDLE_POLL_SECONDS = 0.05
+# Jobs submitted while this is set stay on the threads, the worker processes do not hold their models
+_threads_only = contextvars.ContextVar("threads_only", default=False)
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot accept another job"""
+
+    def __init__(self, retry_after: int = settings.RETRY_AFTER_SECONDS):
+        super().__init__("Inference queue is full, please retry later")
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    """Run blocking torch/GFPGAN/PIL work off the event loop with a bounded queue"""
+
+    def __init__(
+        self,
+        max_workers: int = settings.INFERENCE_WORKERS,
+        max_queue_size: int = settings.INFERENCE_QUEUE_SIZE
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max(0, max_queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._in_flight = 0
+        self.process_pool = None
+
+    def attach_pool(self, process_pool):
+        """Route calls on the pool's registered models to its worker processes"""
+        self.process_pool = process_pool
+        self.max_workers = max(self.max_workers, process_pool.num_workers)
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of jobs waiting for a free worker"""
+        return max(0, self._in_flight - self.max_workers)
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs running or waiting"""
+        return self._in_flight
+
+    @contextmanager
+    def background(self) -> Iterator[None]:
+        """Run jobs submitted in this context (and tasks it spawns) only while the executor is idle"""
+        token = _background.set(True)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+    @contextmanager
+    def foreground(self) -> Iterator[None]:
+        """Run jobs submitted in this context (and tasks it spawns) right away, even inside background()"""
+        token = _background.set(False)
+        try:
+            yield
+        finally:
+            _background.reset(token)
+
+    @contextmanager
+    def threads_only(self) -> Iterator[None]:
+        """Run jobs submitted in this context (and tasks it spawns) on the threads of this process"""
+        token = _threads_only.set(True)
+        try:
+            yield
+        finally:
+            _threads_only.reset(token)
+
+    def _target(self, fn: Callable):
+        if self.process_pool is None or _threads_only.get():
+            return None
+        return self.process_pool.target_name(fn)
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Schedule a blocking call and await its result, rejecting when the queue is full"""
+        if _background.get():
+            # Foreground work waits behind at most the one background job already running
+            while self._in_flight > 0:
+                await asyncio.sleep(IDLE_POLL_SECONDS)
+        if self._in_flight >= self.max_workers + self.max_queue_size:
+            raise QueueFullError()
+
+        self._in_flight += 1
+        try:
+            target = self._target(fn)
+            if target is not None:
+                return await self.process_pool.submit(target, fn.__name__, *args, **kwargs)
+            # Run in a copy of the caller's context so stages land in the caller's trace
+            context = contextvars.copy_context()
+            queued_at = time.perf_counter()
+
+            def call():
+                metrics.record_stage("queue_wait", time.perf_counter() - queued_at)
+                return fn(*args, **kwargs)
+
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(self._pool, context.run, call)
+        finally:
+            self._in_flight -= 1
+
+    async def broadcast(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a call on every worker process (once without a pool), returns the first result"""
+        target = self._target(fn)
+        if target is None:
+            return await self.run(fn, *args, **kwargs)
+        results = await self.process_pool.broadcast(target, fn.__name__, *args, **kwargs)
+        return results[0]
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting jobs and release the worker threads and processes"""
+        self._pool.shutdown(wait=wait)
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Run short blocking file I/O on the loop's default executor, outside the inference queue"""
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5.0
+
+class FacePool:
+    """Pre-rendered, pre-encoded random faces for seedless requests, refilled while the service is idle"""
+
+    def __init__(
+        self,
+        service,
+        size: int = settings.FACE_POOL_SIZE,
+        batch_size: int = settings.FACE_POOL_BATCH_SIZE,
+        truncation_psi: float = settings.DEFAULT_TRUNCATION,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ):
+        self.service = service
+        self.size = max(0, size)
+        self.batch_size = max(1, batch_size)
+        self.truncation_psi = float(truncation_psi)
+        self.format = format
+        self._faces = deque()
+        self._wanted = None
+        self._task = None
+        self._stats = {"served": 0, "misses": 0, "evicted": 0, "rendered": 0}
+
+    def matches(self, truncation_psi: float, enhance_face: bool, format: str) -> bool:
+        """Whether pooled faces were rendered with these parameters"""
+        return self.size > 0 and float(truncation_psi) == self.truncation_psi and enhance_face and format == self.format
+
+    @property
+    def ready(self) -> int:
+        return len(self._faces)
+
+    def pop(self) -> Optional[dict]:
+        """Take a ready face that is still cached, or None when the pool has run dry"""
+        if self._wanted is not None:
+            self._wanted.set()
+        while self._faces:
+            face = self._faces.popleft()
+            # Ordinary traffic shares the byte-bounded cache and can evict a face before it is served
+            if not self.service.cache.contains(face["filename"]):
+                self._stats["evicted"] += 1
+                continue
+            self._stats["served"] += 1
+            return {**face, "timestamp": datetime.now().isoformat()}
+        self._stats["misses"] += 1
+        return None
+
+    def start(self):
+        """Begin filling the pool in the background"""
+        if self.size == 0 or self._task is not None:
+            return
+        self._wanted = asyncio.Event()
+        self._wanted.set()
+        self._task = asyncio.ensure_future(self._refill())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "ready": len(self._faces), "size": self.size}
+
+    async def _refill(self):
+        # Every inference job of the refill only starts once no foreground job is in flight
+        with self.service.executor.background():
+            while True:
+                if len(self._faces) >= self.size:
+                    self._wanted.clear()
+                    await self._wanted.wait()
+                    continue
+
+                count = min(self.batch_size, self.size - len(self._faces))
+                seeds = [int(seed) for seed in np.random.randint(0, 2147483648, size=count)]
+                try:
+                    faces = await self._render(seeds)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception('Face pool refill failed')
+                    await asyncio.sleep(RETRY_SECONDS)
+                    continue
+
+                self._faces.extend(faces)
+                self._stats["rendered"] += len(faces)
+                logger.debug('Face pool refilled to %d/%d', len(self._faces), self.size)
+
+    async def _render(self, seeds: List[int]) -> List[dict]:
+        """Render, encode and store a batch of faces in one job
+
+        Bypasses the shared micro-batcher, so foreground requests never join a background batch.
+        """
+        service = self.service
+        encoded = await service.executor.run(service.render_encoded, seeds, self.truncation_psi, True, self.format)
+        faces = []
+        for seed, image_bytes in zip(seeds, encoded):
+            filename = service.single_filename(seed, self.truncation_psi, True, self.format)
+            await service._store(filename, image_bytes)
+            faces.append({
+                "seed": seed,
+                "filename": filename,
+                "url": service.cache.url(filename),
+                "enhancement": service._single_params(seed, self.truncation_psi, True)["enhancement"],
+                "truncation_psi": self.truncation_psi,
+                "format": self.format,
+                "image_bytes": image_bytes
+            })
+        return faces
@@ -1,224 +1,759 @@
-import uuid
+import logging
 import os
+import time
+import cv2
 import torch
 from datetime import datetime
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import numpy as np
 from pathlib import Path
 from PIL import Image
+from fastapi import BackgroundTasks
 
+from core import metrics
+from core.config import settings
 from models.stylegan2 import StyleGAN2Generator
 from services.realesrgan_enhance import RealESRGANProcessor
+from services.executor import InferenceExecutor, QueueFullError, run_io
+from services.worker_pool import WorkerPool
+from services.cache import CellCache, ResultCache
+from services.encoding import FORMATS, decode_image, encode_image
+from services.singleflight import SingleFlight
+from services.face_pool import FacePool
+from services.admission import CostModel
+from services.jobs import JobManager
+from services.video import VideoEncoder
+from services.model_registry import DEFAULT_MODEL, ModelRegistry
+
+MODEL_NAMES = ("stylegan2", "realesrgan")
+
+logger = logging.getLogger(__name__)
 
 class GenerationService:
     def __init__(self, model_path: str):
-        self.generator = StyleGAN2Generator(model_path)
-        self.enhancer = RealESRGANProcessor(
+        # Models are loaded by start(), so constructing the service is cheap
+        self.model_path = model_path
+        self.enhancer = None
+        self.model_status = {
+            name: {"state": "pending", "load_seconds": None, "warmup_seconds": None, "error": None}
+            for name in MODEL_NAMES
+        }
+        self.executor = InferenceExecutor()
+        # Checkpoints by name, the default one is loaded at startup and the others on first use
+        self.models = ModelRegistry(self.executor, model_path)
+        
+        # Create output directories
+        os.makedirs("static/generated", exist_ok=True)
+        self.cache = ResultCache()
+        self.cell_cache = CellCache()
+        # Concurrent identical requests await the first one's render/encode instead of repeating it
+        self.inflight = SingleFlight()
+        self.face_pool = FacePool(self)
+        self.jobs = JobManager(self)
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """Read queue and cache gauges from this service at scrape time"""
+        metrics.QUEUE_DEPTH.set_function(lambda: self.executor.queue_depth)
+        metrics.IN_FLIGHT.set_function(lambda: self.executor.in_flight)
+        metrics.CACHE_HIT_RATIO.set_function(lambda: self.cache.get_stats()["hit_ratio"])
+        metrics.CACHE_HITS.set_function(lambda: self.cache.get_stats()["hits"])
+        metrics.CACHE_MISSES.set_function(lambda: self.cache.get_stats()["misses"])
+
+    def _create_generator(self) -> StyleGAN2Generator:
+        return StyleGAN2Generator(self.model_path)
+
+    def _create_enhancer(self) -> RealESRGANProcessor:
+        calibration_images = None
+        if settings.ENHANCER_PRECISION == "int8":
+            # Calibrate int8 activation ranges on the faces the enhancer will actually see
+            seeds = list(range(settings.INT8_CALIBRATION_IMAGES))
+            calibration_images = list(self.generator.generate_arrays(seeds, settings.DEFAULT_TRUNCATION, bgr=True))
+        return RealESRGANProcessor(
             model_name='RealESRGAN_x4plus',
             face_enhance=True,
             fp32=True if not torch.cuda.is_available() else False,
-            gpu_id=None
+            gpu_id=None,
+            precision=settings.ENHANCER_PRECISION,
+            calibration_images=calibration_images
         )
-        
-        # Create output directories
-        os.makedirs("static/generated", exist_ok=True)
+
+    @property
+    def generator(self) -> Optional[StyleGAN2Generator]:
+        """Generator of the model bound to this request, the default one otherwise"""
+        model = self.models.current()
+        return model.generator if model is not None else None
+
+    @property
+    def batcher(self):
+        return self.models.current().batcher
+
+    @property
+    def cost_model(self) -> CostModel:
+        return self.models.current().cost_model
+
+    @property
+    def precision(self) -> str:
+        """Generator and enhancer precision modes, part of every cache key"""
+        return f"{self.generator.precision}/{self.enhancer.precision}"
+
+    async def _run_stage(self, name: str, stage: str, fn, *args, **kwargs):
+        """Await a load or warmup step for one model and record its state and timing"""
+        status = self.model_status[name]
+        status["state"] = "loading" if stage == "load" else "warming_up"
+        start = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as e:
+            status.update({"state": "failed", "error": str(e)})
+            raise
+        status[f"{stage}_seconds"] = time.perf_counter() - start
+        status["state"] = "loaded" if stage == "load" else "ready"
+        return result
+
+    async def load_models(self):
+        """Load StyleGAN2 and the enhancer off the event loop (may download weights)"""
+        num_threads = torch.get_num_threads()
+        if settings.INFERENCE_PROCESSES > 0:
+            # Workers are forked after loading, keep OpenMP uninitialised until then
+            torch.set_num_threads(1)
+        try:
+            generator = await self._run_stage("stylegan2", "load", run_io, self._create_generator)
+            self.models.add(DEFAULT_MODEL, generator, self.model_status["stylegan2"]["load_seconds"])
+            self.enhancer = await self._run_stage("realesrgan", "load", run_io, self._create_enhancer)
+
+            if settings.INFERENCE_PROCESSES > 0:
+                pool = WorkerPool({"service": self, "generator": self.generator, "enhancer": self.enhancer})
+                pool.start()
+                self.executor.attach_pool(pool)
+        finally:
+            # Models that stay in this process (registry checkpoints, threads_only work) use every core again
+            torch.set_num_threads(num_threads)
+
+    async def warmup(self):
+        """Run one dummy batch per model (in every worker) before traffic"""
+        images = await self._run_stage(
+            "stylegan2", "warmup",
+            self.executor.broadcast, self.generator.generate_arrays,
+            [settings.DEFAULT_SEED], settings.DEFAULT_TRUNCATION, bgr=True
+        )
+        aligned = settings.ENHANCE_MODE == "aligned"
+        await self._run_stage(
+            "realesrgan", "warmup",
+            self.executor.broadcast, self.enhancer.enhance_array, images[0], aligned=aligned
+        )
+
+    async def start(self):
+        """Load and warm up all models off the event loop"""
+        try:
+            await self.load_models()
+            await self.warmup()
+            logger.info('Models loaded and warmed up', extra={"models": self.model_status})
+            self.face_pool.start()
+            self.jobs.start()
+        except Exception:
+            logger.exception('Model startup failed')
+
+    def shutdown(self):
+        """Release the inference threads and processes and persist the latent table"""
+        self.face_pool.stop()
+        self.jobs.stop()
+        self.executor.shutdown(wait=False)
+        self.models.flush()
+
+    @property
+    def is_ready(self) -> bool:
+        return all(status["state"] == "ready" for status in self.model_status.values())
+
+    def get_readiness(self) -> dict:
+        """Per-model load state and load/warmup timings"""
+        return {
+            "ready": self.is_ready,
+            "models": {name: dict(status) for name, status in self.model_status.items()}
+        }
 
     async def enhance_with_realesrgan(self, image_path: Path, output_path: Path) -> Path:
         """Enhance image using Real-ESRGAN directly"""
         try:
-            return Path(self.enhancer.enhance_image_file(str(image_path), str(output_path)))
+            return Path(await self.executor.run(
+                self.enhancer.enhance_image_file, str(image_path), str(output_path)
+            ))
+        except QueueFullError:
+            raise
         except Exception as e:
             raise Exception(f"Real-ESRGAN enhancement failed: {str(e)}")
 
     async def enhance_image_direct(self, pil_image: Image.Image) -> Image.Image:
         """Enhance a PIL Image directly in memory"""
         try:
-            return self.enhancer.enhance_image(pil_image)
+            return await self.executor.run(self.enhancer.enhance_image, pil_image)
+        except QueueFullError:
+            raise
+        except Exception as e:
+            raise Exception(f"Real-ESRGAN enhancement failed: {str(e)}")
+
+    async def enhance_array(self, img_bgr: np.ndarray, aligned: bool = False) -> np.ndarray:
+        """Enhance a BGR uint8 array in memory, no disk round-trip or PIL conversion"""
+        try:
+            return await self.executor.run(self.enhancer.enhance_array, img_bgr, aligned=aligned)
+        except QueueFullError:
+            raise
         except Exception as e:
             raise Exception(f"Real-ESRGAN enhancement failed: {str(e)}")
+
+    async def _store(self, filename: str, image_bytes: bytes, background_tasks: Optional[BackgroundTasks] = None):
+        """Write encoded bytes to the cache, deferred to a background task when one is given"""
+        if background_tasks is None:
+            await run_io(self.cache.put, filename, image_bytes)
+        else:
+            self.cache.remember(filename, image_bytes)
+            background_tasks.add_task(self.cache.put, filename, image_bytes)
     
+    def _variant_filename(self, prefix: str, format: str, **params) -> str:
+        """Cache filename of one encoded variant, every format and level is stored separately"""
+        spec = FORMATS[format]
+        return self.cache.make_filename(prefix, extension=spec.extension, format=format, level=spec.level, **params)
+
+    async def _get_variant(
+        self,
+        prefix: str,
+        format: str,
+        background_tasks: Optional[BackgroundTasks] = None,
+        **params
+    ) -> Tuple[str, Optional[bytes]]:
+        """Look up an encoded variant, transcoding the lossless PNG variant when only that is cached"""
+        filename = self._variant_filename(prefix, format, **params)
+        image_bytes = await run_io(self.cache.get, filename)
+        if image_bytes is None and format != "png":
+            source = await run_io(self.cache.get, self._variant_filename(prefix, "png", **params))
+            if source is not None:
+                image_bytes = await self.inflight.do(
+                    ("transcode", filename), self._transcode, source, filename, format, background_tasks
+                )
+        return filename, image_bytes
+
+    async def _transcode(
+        self,
+        source: bytes,
+        filename: str,
+        format: str,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> bytes:
+        image_bytes = await run_io(lambda: encode_image(decode_image(source), format))
+        await self._store(filename, image_bytes, background_tasks)
+        return image_bytes
+
+    async def _encode(
+        self,
+        image: np.ndarray,
+        filename: str,
+        format: str,
+        save_to_disk: bool,
+        background_tasks: Optional[BackgroundTasks] = None
+    ) -> bytes:
+        """Encode a finished image and optionally store it under its cache filename"""
+        # The only encode in the pipeline
+        image_bytes = await self.executor.run(encode_image, image, format)
+        if save_to_disk:
+            await self._store(filename, image_bytes, background_tasks)
+        return image_bytes
+
+    async def _render_single(self, seed: int, truncation_psi: float, enhance_face: bool, aligned: bool) -> np.ndarray:
+        """Generate one face as a contiguous BGR array and enhance it if requested"""
+        base_image = await self.batcher.submit(seed, truncation_psi)
+        if not enhance_face:
+            return base_image
+        return await self.enhance_array(base_image, aligned=aligned)
+
+    def _single_params(self, seed: int, truncation_psi: float, enhance_face: bool) -> dict:
+        """Every parameter that affects a single face, outputs are deterministic given these"""
+        if not enhance_face:
+            enhancement_type = "none"
+        elif settings.ENHANCE_MODE == "aligned":
+            enhancement_type = "face_enhanced_aligned"
+        else:
+            enhancement_type = "face_enhanced"
+        return {
+            "seed": seed,
+            "truncation_psi": float(truncation_psi),
+            "noise_mode": "const",
+            "enhancement": enhancement_type,
+            "model": self.generator.fingerprint,
+            "precision": self.precision
+        }
+
+    def single_filename(
+        self,
+        seed: int,
+        truncation_psi: float = 0.5,
+        enhance_face: bool = True,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ) -> str:
+        """Cache filename of a single face, known without generating or reading anything"""
+        return self._variant_filename(str(seed), format, **self._single_params(seed, truncation_psi, enhance_face))
+
     async def generate_single_image(
         self,
         seed: Optional[int] = None,
         truncation_psi: float = 0.5,
         enhance_face: bool = True,
-        save_to_disk: bool = True
+        save_to_disk: bool = True,
+        background_tasks: Optional[BackgroundTasks] = None,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
     ) -> dict:
         """Generate a single image with optional enhancement"""
         
         if seed is None:
+            # Seedless requests are served from the pre-rendered pool when it has a matching face
+            if save_to_disk and self._uses_face_pool(truncation_psi, enhance_face, format):
+                face = self.face_pool.pop()
+                if face is not None:
+                    return face
             seed = np.random.randint(0, 2147483648)
-        
+
+        # Generator output is already one FFHQ-aligned face
+        aligned = settings.ENHANCE_MODE == "aligned"
+        params = self._single_params(seed, truncation_psi, enhance_face)
+        enhancement_type = params["enhancement"]
+
         # Check if image already exists in cache
-        enhanced_filename = f"{seed}.png"
-        cached_filepath = Path("static/generated") / enhanced_filename
-        
-        if cached_filepath.exists():
-            # Return cached image
-            final_image = Image.open(cached_filepath)
+        filename, image_bytes = await self._get_variant(str(seed), format, background_tasks, **params)
+        if image_bytes is not None:
             return {
                 "seed": seed,
-                "filename": enhanced_filename,
-                "url": f"/static/generated/{enhanced_filename}",
+                "filename": filename,
+                "url": self.cache.url(filename),
                 "enhancement": "cached",
                 "truncation_psi": truncation_psi,
                 "timestamp": datetime.now().isoformat(),
-                "image_data": final_image
+                "format": format,
+                "image_bytes": image_bytes
             }
         
-        # If not cached, generate new image
+        # If not cached, generate new image, pixels are shared by every format of the same face
         try:
-            # Generate base image
-            base_image = self.generator.generate_from_seed(seed, truncation_psi)
-
-            if save_to_disk:
-                # File-based processing
-                base_filename = f"{seed}_base.png"
-                base_filepath = Path("static/generated") / base_filename
-                enhanced_filepath = Path("static/generated") / enhanced_filename
-
-                base_image.save(base_filepath)
-                
-                # Apply enhancement if requested
-                if enhance_face:
-                    enhanced_filepath = await self.enhance_with_realesrgan(base_filepath, enhanced_filepath)
-                    enhancement_type = "face_enhanced"
-                else:
-                    # If no enhancement, just rename the base file
-                    base_filepath.rename(enhanced_filepath)
-                    enhancement_type = "none"
-                
-                final_image = Image.open(enhanced_filepath)
-                
-                # Clean up base file
-                if base_filepath.exists():
-                    base_filepath.unlink()
-
-                image_url = f"/static/generated/{enhanced_filename}"
-            else:
-                # In-memory processing for direct responses
-                if enhance_face:
-                    final_image = await self.enhance_image_direct(base_image)
-                    enhancement_type = "face_enhanced"
-                else:
-                    final_image = base_image
-                    enhancement_type = "none"
-                
-                image_url = None
+            final_image = await self.inflight.do(
+                ("single", self.generator.fingerprint, seed, float(truncation_psi), enhancement_type),
+                self._render_single, seed, truncation_psi, enhance_face, aligned
+            )
+            image_bytes = await self.inflight.do(
+                ("encode", filename, save_to_disk),
+                self._encode, final_image, filename, format, save_to_disk, background_tasks
+            )
+            image_url = self.cache.url(filename) if save_to_disk else None
             
             return {
                 "seed": seed,
-                "filename": f"{seed}.png",
+                "filename": filename,
                 "url": image_url,
                 "enhancement": enhancement_type,
                 "truncation_psi": truncation_psi,
                 "timestamp": datetime.now().isoformat(),
-                "image_data": final_image
+                "format": format,
+                "image_bytes": image_bytes
             }
             
+        except QueueFullError:
+            raise
         except Exception as e:
             raise Exception(f"Image generation failed: {str(e)}")
     
+    def _grid_params(
+        self,
+        row_seeds: List[int],
+        col_seeds: List[int],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        enhance_face: bool
+    ) -> dict:
+        """Every parameter that affects a style-mixing grid"""
+        if not enhance_face:
+            enhancement_type = "none"
+        elif settings.ENHANCE_MODE == "aligned":
+            enhancement_type = "grid_enhanced_aligned"
+        else:
+            enhancement_type = "grid_enhanced"
+        return {
+            "row_seeds": row_seeds,
+            "col_seeds": col_seeds,
+            "col_styles": col_styles,
+            "truncation_psi": float(truncation_psi),
+            "noise_mode": "const",
+            "enhancement": enhancement_type,
+            "cell_outscale": settings.GRID_CELL_OUTSCALE if enhance_face else 1,
+            "model": self.generator.fingerprint,
+            "precision": self.precision
+        }
+
     async def generate_grid_image(
         self,
         row_seeds: List[int],
         col_seeds: List[int],
         truncation_psi: float = 0.5,
         enhance_face: bool = True,
-        save_to_disk: bool = True
+        save_to_disk: bool = True,
+        col_styles: Optional[List[int]] = None,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
     ) -> dict:
-        """Generate grid image and then enhance the entire grid"""
+        """Generate grid image, enhancing each cell and reusing previously enhanced cells"""
+        aligned = settings.ENHANCE_MODE == "aligned"
+        params = self._grid_params(row_seeds, col_seeds, col_styles, truncation_psi, enhance_face)
+        enhancement_type = params["enhancement"]
+
+        # Check if grid already exists in cache
+        filename, image_bytes = await self._get_variant("grid", format, **params)
+        result = {
+            "row_seeds": row_seeds,
+            "col_seeds": col_seeds,
+            "filename": filename,
+            "truncation_psi": truncation_psi,
+            "grid_size": f"{len(row_seeds)}x{len(col_seeds)}",
+            "format": format
+        }
+
+        if image_bytes is not None:
+            result.update({
+                "url": self.cache.url(filename),
+                "enhancement": "cached",
+                "timestamp": datetime.now().isoformat(),
+                "image_bytes": image_bytes
+            })
+            return result
+
         try:
-            # Generate the complete grid image first
-            grid_image = self.generator.generate_from_grid(
-                row_seeds=row_seeds,
-                col_seeds=col_seeds,
-                truncation_psi=truncation_psi
+            grid_key = (
+                "grid", self.generator.fingerprint, tuple(row_seeds), tuple(col_seeds), self._styles_key(col_styles),
+                float(truncation_psi), enhancement_type
             )
+            final_image = await self.inflight.do(
+                grid_key, self._render_grid, row_seeds, col_seeds, col_styles, truncation_psi, enhance_face, aligned
+            )
+            image_bytes = await self.inflight.do(
+                ("encode", filename, save_to_disk),
+                self._encode, final_image, filename, format, save_to_disk
+            )
+            image_url = self.cache.url(filename) if save_to_disk else None
 
-            job_id = uuid.uuid4().hex[:8]
-            
-            if save_to_disk:
-                # File-based processing
-                if enhance_face:
-                    # Save base grid temporarily
-                    base_filename = f"{job_id}_base.png"
-                    enhanced_filename = f"{job_id}.png"
-
-                    base_filepath = Path("static/generated") / base_filename
-                    enhanced_filepath = Path("static/generated") / enhanced_filename
-                    
-                    grid_image.save(base_filepath)
-                    
-                    # Enhance the entire grid image
-                    enhanced_filepath = await self.enhance_with_realesrgan(base_filepath, enhanced_filepath)
-                    enhancement_type = "grid_enhanced"
-                    
-                    # Clean up base file
-                    if base_filepath.exists():
-                        base_filepath.unlink()
-                        
-                    final_image = Image.open(enhanced_filepath)
-                else:
-                    # Save without enhancement
-                    final_filepath = Path("static/generated") / enhanced_filename
-                    grid_image.save(final_filepath)
-                    final_image = grid_image
-                    enhancement_type = "none"
-
-                image_url = f"/static/generated/{enhanced_filename}"
-            else:
-                # In-memory processing
-                if enhance_face:
-                    final_image = await self.enhance_image_direct(grid_image)
-                    enhancement_type = "grid_enhanced"
-                else:
-                    final_image = grid_image
-                    enhancement_type = "none"
-                
-                image_url = None
-            
-            return {
-                "row_seeds": row_seeds,
-                "col_seeds": col_seeds,
-                "filename": f"{job_id}.png",
+            result.update({
                 "url": image_url,
                 "enhancement": enhancement_type,
-                "truncation_psi": truncation_psi,
-                "grid_size": f"{len(row_seeds)}x{len(col_seeds)}",
                 "timestamp": datetime.now().isoformat(),
-                "image_data": final_image
-            }
+                "image_bytes": image_bytes
+            })
+            return result
 
+        except QueueFullError:
+            raise
         except Exception as e:
             raise Exception(f"Style mixing generation failed: {str(e)}")
     
+    async def _render_grid(
+        self,
+        row_seeds: List[int],
+        col_seeds: List[int],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        enhance_face: bool,
+        aligned: bool
+    ) -> np.ndarray:
+        if enhance_face:
+            # Enhance cell by cell, only cells missing from the cell cache are rendered
+            return await self._generate_enhanced_grid(row_seeds, col_seeds, col_styles, truncation_psi, aligned)
+        return await self.executor.run(
+            self.generator.generate_grid_array,
+            row_seeds=row_seeds,
+            col_seeds=col_seeds,
+            col_styles=col_styles,
+            truncation_psi=truncation_psi,
+            bgr=True
+        )
+
+    async def _generate_enhanced_grid(
+        self,
+        row_seeds: List[int],
+        col_seeds: List[int],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        aligned: bool
+    ) -> np.ndarray:
+        """Assemble an enhanced grid from cached cells, rendering only the missing ones"""
+        pairs, cells_by_pair = StyleGAN2Generator.grid_layout(row_seeds, col_seeds)
+        cells = await self._get_cells(pairs, col_styles, truncation_psi, aligned)
+        return await self.executor.run(self._assemble_grid, len(row_seeds), len(col_seeds), cells, cells_by_pair)
+
+    async def _get_cells(
+        self,
+        pairs: List[Tuple[int, int]],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        aligned: bool
+    ) -> List[np.ndarray]:
+        """Enhanced cells of grid pairs from the cell cache, rendering only the missing ones"""
+        keys = [self._cell_key(pair, col_styles, truncation_psi, aligned) for pair in pairs]
+        cells = [self.cell_cache.get(key) for key in keys]
+
+        missing = [i for i, cell in enumerate(cells) if cell is None]
+        if missing:
+            # Cells another grid is already rendering are awaited, not rendered twice
+            pair_by_key = {keys[i]: pairs[i] for i in missing}
+            rendered = await self.inflight.do_many(
+                [keys[i] for i in missing],
+                lambda owned: self._render_cell_batch(owned, [pair_by_key[key] for key in owned], col_styles, truncation_psi, aligned)
+            )
+            for i, cell in zip(missing, rendered):
+                cells[i] = cell
+        return cells
+
+    async def stream_grid_image(
+        self,
+        row_seeds: List[int],
+        col_seeds: List[int],
+        col_styles: Optional[List[int]] = None,
+        truncation_psi: float = 0.5,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ) -> AsyncIterator[dict]:
+        """Enhanced grid, yielding encoded cells as each batch is ready and then the full grid result
+
+        Cells are yielded as {"row", "col", "image_bytes"} at their canvas position, the
+        last item is the generate_grid_image() result. A cached grid yields only that.
+        """
+        aligned = settings.ENHANCE_MODE == "aligned"
+        params = self._grid_params(row_seeds, col_seeds, col_styles, truncation_psi, True)
+        if not self.cache.contains(self._variant_filename("grid", format, **params)):
+            pairs, cells_by_pair = StyleGAN2Generator.grid_layout(row_seeds, col_seeds)
+            batch_size = settings.GRID_ENHANCE_BATCH_SIZE
+            for start in range(0, len(pairs), batch_size):
+                cells = await self._get_cells(pairs[start:start + batch_size], col_styles, truncation_psi, aligned)
+                encoded = await self.executor.run(self._encode_cells, cells, format)
+                for offset, image_bytes in enumerate(encoded):
+                    for row_idx, col_idx in cells_by_pair[start + offset]:
+                        yield {"row": row_idx, "col": col_idx, "image_bytes": image_bytes}
+
+        # Every cell is in the cell cache now, the full grid is only assembled, encoded and stored
+        yield await self.generate_grid_image(
+            row_seeds=row_seeds,
+            col_seeds=col_seeds,
+            truncation_psi=truncation_psi,
+            enhance_face=True,
+            col_styles=col_styles,
+            format=format
+        )
+
+    @staticmethod
+    def _encode_cells(cells: List[np.ndarray], format: str) -> List[bytes]:
+        return [encode_image(cell, format) for cell in cells]
+
+    async def _render_cell_batch(
+        self,
+        keys: List[tuple],
+        pairs: List[Tuple[int, int]],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        aligned: bool
+    ) -> List[np.ndarray]:
+        cells = await self.executor.run(self._render_cells, pairs, col_styles, truncation_psi, aligned)
+        for key, cell in zip(keys, cells):
+            self.cell_cache.put(key, cell)
+        return cells
+
+    @staticmethod
+    def _styles_key(col_styles: Optional[List[int]]) -> tuple:
+        """Only None means the default layers, an explicit list is keyed as given"""
+        return tuple(range(0, 7)) if col_styles is None else tuple(col_styles)
+
+    def _cell_key(self, pair: Tuple[int, int], col_styles: Optional[List[int]], truncation_psi: float, aligned: bool) -> tuple:
+        row_seed, col_seed = pair
+        # Header cells are unmixed, so they are shared by grids with any col_styles
+        styles = None if row_seed == col_seed else self._styles_key(col_styles)
+        return (
+            row_seed, col_seed, styles, float(truncation_psi), "const", aligned,
+            settings.GRID_CELL_OUTSCALE, self.generator.fingerprint, self.precision
+        )
+
+    def _render_cells(
+        self,
+        pairs: List[Tuple[int, int]],
+        col_styles: Optional[List[int]],
+        truncation_psi: float,
+        aligned: bool
+    ) -> List[np.ndarray]:
+        """Synthesize and enhance grid cells, batching both stages (runs on the executor)"""
+        outscale = settings.GRID_CELL_OUTSCALE
+        batch_size = settings.GRID_ENHANCE_BATCH_SIZE
+        cells = []
+        for _, images in self.generator.iter_mixed_images(pairs, col_styles, truncation_psi, bgr=True):
+            if aligned:
+                for start in range(0, len(images), batch_size):
+                    cells += self.enhancer.enhance_aligned_batch(list(images[start:start + batch_size]), outscale=outscale)
+            else:
+                cells += [self.enhancer.enhance_array(image, outscale=outscale) for image in images]
+        return cells
+
+    def render_encoded(
+        self,
+        seeds: List[int],
+        truncation_psi: float,
+        enhance_face: bool = True,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ) -> List[bytes]:
+        """Synthesize, enhance and encode a batch of faces in one job (runs on the executor)"""
+        images = self.generator.generate_arrays(seeds, truncation_psi, bgr=True)
+        if enhance_face:
+            if settings.ENHANCE_MODE == "aligned":
+                images = self.enhancer.enhance_aligned_batch(list(images))
+            else:
+                images = [self.enhancer.enhance_array(image) for image in images]
+        return [encode_image(image, format) for image in images]
+
+    async def iter_interpolation_frames(
+        self,
+        generator: StyleGAN2Generator,
+        seeds: List[int],
+        steps: int,
+        truncation_psi: float = 0.5,
+        mode: str = "lerp"
+    ) -> AsyncIterator[np.ndarray]:
+        """RGB frames of a morph through seeds, synthesized MAX_BATCH_SIZE at a time"""
+        ws = await self.executor.run(generator.interpolation_ws, seeds, steps, truncation_psi, mode)
+        for start in range(0, len(ws), settings.MAX_BATCH_SIZE):
+            yield await self.executor.run(generator.synthesize_ws, ws[start:start + settings.MAX_BATCH_SIZE])
+
+    async def stream_interpolation_video(
+        self,
+        seeds: List[int],
+        steps: int = settings.VIDEO_STEPS,
+        truncation_psi: float = 0.5,
+        mode: str = "lerp",
+        fps: int = settings.VIDEO_FPS,
+        format: str = settings.VIDEO_FORMAT
+    ) -> AsyncIterator[bytes]:
+        """Start the encoder and return the encoded clip as an async stream of chunks"""
+        # Frames render in the encoder's task, outside this request's model binding
+        generator = self.generator
+        resolution = generator.G.img_resolution
+        encoder = VideoEncoder(resolution, resolution, fps, format)
+        await encoder.start()
+        return encoder.stream(self.iter_interpolation_frames(generator, seeds, steps, truncation_psi, mode))
+
+    @staticmethod
+    def _assemble_grid(
+        num_rows: int,
+        num_cols: int,
+        cells: List[np.ndarray],
+        cells_by_pair: Dict[int, List[Tuple[int, int]]]
+    ) -> np.ndarray:
+        """Paste enhanced cells into a preallocated BGR canvas"""
+        size = max(cell.shape[0] for cell in cells)
+        canvas = np.zeros((size * (num_rows + 1), size * (num_cols + 1), 3), dtype=np.uint8)
+        for pair_idx, positions in cells_by_pair.items():
+            cell = cells[pair_idx]
+            # The full GFPGAN path ignores outscale, bring such cells to the common size
+            if cell.shape[0] != size or cell.shape[1] != size:
+                cell = cv2.resize(cell, (size, size), interpolation=cv2.INTER_LANCZOS4)
+            for row_idx, col_idx in positions:
+                canvas[size * row_idx:size * (row_idx + 1), size * col_idx:size * (col_idx + 1)] = cell
+        return canvas
+
+    def get_cell_cache_stats(self) -> dict:
+        """Get enhanced grid cell cache counters"""
+        return self.cell_cache.get_stats()
+
     async def generate_direct_image_response(
         self,
         seed: int,
         truncation_psi: float = 0.5,
-        enhance_face: bool = True
+        enhance_face: bool = True,
+        background_tasks: Optional[BackgroundTasks] = None,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
     ) -> bytes:
         """Generate image and return as bytes for direct API response"""
-        # Check if cached file exists
-        cached_filename = f"{seed}.png"
-        cached_filepath = Path("static/generated") / cached_filename
-        
-        if cached_filepath.exists():
-            # Return cached file
-            with open(cached_filepath, "rb") as f:
-                return f.read()
+        # Served from the cache when available, generated and cached otherwise
+        result = await self.generate_single_image(
+            seed=seed,
+            truncation_psi=truncation_psi,
+            enhance_face=enhance_face,
+            save_to_disk=True,
+            background_tasks=background_tasks,
+            format=format
+        )
+        return result["image_bytes"]
+
+    @staticmethod
+    def _enhancement_tier(enhance_face: bool) -> str:
+        if not enhance_face:
+            return "none"
+        return "aligned" if settings.ENHANCE_MODE == "aligned" else "full"
+
+    def _uses_face_pool(self, truncation_psi: float, enhance_face: bool, format: str) -> bool:
+        """Pooled faces come from the default model"""
+        return self.models.current() is self.models.default and self.face_pool.matches(truncation_psi, enhance_face, format)
+
+    def estimate_single_cost(
+        self,
+        seed: Optional[int],
+        truncation_psi: float = 0.5,
+        enhance_face: bool = True,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ) -> float:
+        """Cost units of a single-face request, the minimum when a cache or the face pool will answer it"""
+        if seed is None:
+            served = self.face_pool.ready > 0 and self._uses_face_pool(truncation_psi, enhance_face, format)
         else:
-            # Generate new image and cache it
-            result = await self.generate_single_image(
-                seed=seed,
-                truncation_psi=truncation_psi,
-                enhance_face=enhance_face,
-                save_to_disk=True
-            )
-            
-            return self.generator.image_to_bytes(result["image_data"])
-    
+            served = self.cache.contains(self.single_filename(seed, truncation_psi, enhance_face, format))
+        if served:
+            return self.cost_model.minimum
+        return self.cost_model.faces(1, self._enhancement_tier(enhance_face))
+
+    def estimate_interpolation_cost(self, num_frames: int) -> float:
+        """Cost units of an interpolation clip, frames are synthesized but not enhanced"""
+        return self.cost_model.faces(num_frames, "none")
+
+    def estimate_grid_cost(
+        self,
+        row_seeds: List[int],
+        col_seeds: List[int],
+        col_styles: Optional[List[int]] = None,
+        truncation_psi: float = 0.5,
+        enhance_face: bool = True,
+        format: str = settings.DEFAULT_IMAGE_FORMAT
+    ) -> float:
+        """Cost units of a grid: every distinct cell, header cells included, is synthesized and enhanced"""
+        params = self._grid_params(row_seeds, col_seeds, col_styles, truncation_psi, enhance_face)
+        if self.cache.contains(self._variant_filename("grid", format, **params)):
+            return self.cost_model.minimum
+        pairs, _ = StyleGAN2Generator.grid_layout(row_seeds, col_seeds)
+        return self.cost_model.faces(len(pairs), self._enhancement_tier(enhance_face))
+
+    async def read_cached(self, filename: str) -> Optional[bytes]:
+        """Encoded bytes of a cache entry from the memory tier or disk, None when not cached"""
+        return await run_io(self.cache.get, filename)
+
+    def get_cache_stats(self) -> dict:
+        """Get result cache counters"""
+        return self.cache.get_stats()
+
+    def get_face_pool_stats(self) -> dict:
+        """Get ready/served counts of the pre-rendered random face pool"""
+        return self.face_pool.get_stats()
+
+    def get_inflight_stats(self) -> dict:
+        """Get counts of computations started vs. shared with an identical in-flight request"""
+        return self.inflight.get_stats()
+
+    def get_enhancer_stats(self) -> dict:
+        """Get tile size, time per tile and peak RSS of the last tiled super-resolution pass"""
+        return self.enhancer.get_tile_stats()
+
+    def get_worker_stats(self) -> dict:
+        """Get per-process load and core assignment of the inference workers"""
+        if self.executor.process_pool is None:
+            return {"workers": 0, "threads": self.executor.max_workers}
+        return self.executor.process_pool.get_stats()
+
     def get_model_info(self) -> dict:
         """Get information about the loaded model"""
-        return self.generator.get_network_info()
\ No newline at end of file
+        return self.generator.get_network_info()
+
+    def get_models_info(self) -> List[dict]:
+        """Get load state, pinning, load time and network info of every configured model"""
+        return [self.models.get_info(name) for name in self.models.paths]
\ No newline at end of file
@@ -0,0 +1,307 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import tarfile
+import time
+import uuid
+from collections import OrderedDict
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.encoding import FORMATS
+from services.executor import run_io
+
+logger = logging.getLogger(__name__)
+
+# Jobs in these states are picked up again after a restart
+RESUMABLE_STATES = ("queued", "running")
+
+class Job:
+    """A bulk generation job: seeds [seed_start, seed_end) x truncation values, written as tar shards"""
+
+    def __init__(self, directory: Path, spec: dict, state: dict):
+        self.directory = directory
+        self.spec = spec
+        self.state = state
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def id(self) -> str:
+        return self.spec["id"]
+
+    @property
+    def num_items(self) -> int:
+        return (self.spec["seed_end"] - self.spec["seed_start"]) * len(self.spec["truncations"])
+
+    @property
+    def num_shards(self) -> int:
+        return -(-self.num_items // self.spec["shard_size"])
+
+    def items(self, shard: int) -> List[Tuple[int, float]]:
+        """(seed, truncation_psi) pairs of one shard, truncation-major so batches share psi"""
+        seeds = self.spec["seed_end"] - self.spec["seed_start"]
+        start = shard * self.spec["shard_size"]
+        stop = min(start + self.spec["shard_size"], self.num_items)
+        return [
+            (self.spec["seed_start"] + index % seeds, self.spec["truncations"][index // seeds])
+            for index in range(start, stop)
+        ]
+
+    def shard_path(self, shard: int) -> Path:
+        return self.directory / f"shard-{shard:05d}.tar"
+
+    def index_path(self, shard: int) -> Path:
+        return self.directory / f"shard-{shard:05d}.json"
+
+    def progress_path(self, shard: int) -> Path:
+        return self.directory / f"shard-{shard:05d}.partial.jsonl"
+
+    def is_complete(self, shard: int) -> bool:
+        # The index is written last, a shard without one is redone
+        return self.index_path(shard).exists()
+
+    def to_dict(self) -> dict:
+        return {
+            **self.spec,
+            **self.state,
+            "num_items": self.num_items,
+            "num_shards": self.num_shards,
+            # Items advance after every batch, shards only once they are published
+            "progress": self.state.get("completed_items", 0) / self.num_items if self.num_items else 1.0
+        }
+
+class JobManager:
+    """Run bulk generation jobs one at a time in the background, checkpointing after every batch"""
+
+    def __init__(self, service, directory: str = settings.JOBS_DIR, batch_size: int = settings.JOB_BATCH_SIZE):
+        self.service = service
+        self.directory = Path(directory)
+        self.batch_size = max(1, batch_size)
+        self.jobs: Dict[str, Job] = {}
+        self._queue = None
+        self._worker = None
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def start(self):
+        """Reload jobs from disk and resume the ones a restart interrupted"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.ensure_future(self._work())
+        for path in sorted(self.directory.glob("*/job.json"), key=lambda path: path.stat().st_mtime):
+            data = json.loads(path.read_text())
+            job = Job(path.parent, data["spec"], data["state"])
+            self.jobs[job.id] = job
+            if job.state["state"] in RESUMABLE_STATES:
+                logger.info('Resuming job %s at shard %d/%d', job.id, job.state["completed_shards"], job.num_shards)
+                self._set_state(job, "queued")
+                self._enqueue(job)
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    def submit(
+        self,
+        seed_start: int,
+        seed_end: int,
+        truncations: List[float],
+        enhance_face: bool = True,
+        format: str = settings.DEFAULT_IMAGE_FORMAT,
+        shard_size: int = settings.JOB_SHARD_SIZE
+    ) -> Job:
+        """Create a job and queue it behind the running one"""
+        spec = {
+            "id": uuid.uuid4().hex[:12],
+            "seed_start": seed_start,
+            "seed_end": seed_end,
+            # Repeated values would render the same members twice
+            "truncations": list(OrderedDict.fromkeys(float(psi) for psi in truncations)),
+            "enhance_face": enhance_face,
+            "format": format,
+            "shard_size": shard_size,
+            "model": self.service.generator.fingerprint,
+            "precision": self.service.precision
+        }
+        directory = self.directory / spec["id"]
+        directory.mkdir(parents=True)
+        job = Job(directory, spec, {
+            "state": "queued",
+            "completed_shards": 0,
+            "completed_items": 0,
+            "created": time.time(),
+            "updated": time.time(),
+            "error": None
+        })
+        self.jobs[job.id] = job
+        self._save(job)
+        self._enqueue(job)
+        return job
+
+    def cancel(self, job: Job):
+        """Stop a queued or running job, finished shards are kept and it can be resumed later"""
+        if job.state["state"] not in RESUMABLE_STATES:
+            return
+        self._set_state(job, "cancelled")
+        if job.task is not None:
+            job.task.cancel()
+
+    def resume(self, job: Job):
+        """Queue a cancelled or failed job again, it continues after its last finished batch"""
+        if job.state["state"] in RESUMABLE_STATES or job.state["state"] == "completed":
+            return
+        self._set_state(job, "queued", error=None)
+        self._enqueue(job)
+
+    def shard_index(self, job: Job, shard: int) -> Optional[list]:
+        if not 0 <= shard < job.num_shards or not job.is_complete(shard):
+            return None
+        return json.loads(job.index_path(shard).read_text())
+
+    def _enqueue(self, job: Job):
+        self._queue.put_nowait(job)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            # Cancelled while it was waiting in the queue
+            if job.state["state"] != "queued":
+                continue
+            job.task = asyncio.ensure_future(self._run(job))
+            try:
+                await asyncio.shield(job.task)
+            except asyncio.CancelledError:
+                if not job.task.cancelled():
+                    job.task.cancel()
+                    raise
+            except Exception:
+                pass
+            job.task = None
+
+    async def _run(self, job: Job):
+        pending = [shard for shard in range(job.num_shards) if not job.is_complete(shard)]
+        completed = job.num_shards - len(pending)
+        completed_items = job.num_items - sum(len(job.items(shard)) for shard in pending)
+        self._set_state(job, "running", completed_shards=completed, completed_items=completed_items)
+        try:
+            # Shards rendered by another checkpoint would not match the finished ones
+            if job.spec["model"] != self.service.generator.fingerprint or job.spec["precision"] != self.service.precision:
+                raise RuntimeError("Job was started with a different model or precision")
+            # Bulk work only uses the inference workers while interactive traffic leaves them idle
+            with self.service.executor.background():
+                for shard in pending:
+                    await self._write_shard(job, shard, completed_items)
+                    completed += 1
+                    completed_items += len(job.items(shard))
+                    self._set_state(job, "running", completed_shards=completed, completed_items=completed_items)
+        except asyncio.CancelledError:
+            logger.info('Job %s cancelled at shard %d/%d', job.id, job.state["completed_shards"], job.num_shards)
+            raise
+        except Exception as e:
+            logger.exception('Job %s failed', job.id)
+            self._set_state(job, "failed", error=str(e))
+            raise
+        self._set_state(job, "completed")
+
+    async def _write_shard(self, job: Job, shard: int, completed_items: int):
+        """Render one shard into a temp tar, then publish the tar and its index atomically
+
+        After every batch the new index entries and the tar size are appended to a
+        checkpoint file, so an interrupted shard continues after its last finished batch.
+        """
+        extension = FORMATS[job.spec["format"]].extension
+        temp_path = job.shard_path(shard).with_suffix(".tar.tmp")
+        progress_path = job.progress_path(shard)
+        index, size = await run_io(self._load_progress, temp_path, progress_path)
+        # Polled progress, job.json is saved when the shard is published
+        job.state["completed_items"] = completed_items + len(index)
+        with open(str(temp_path), "r+b" if index else "wb") as f, open(str(progress_path), "a") as progress:
+            # Anything after the last checkpoint is a partly written batch
+            f.seek(size)
+            f.truncate()
+            with tarfile.open(fileobj=f, mode="w") as tar:
+                items = job.items(shard)[len(index):]
+                for truncation_psi, group in groupby(items, key=lambda item: item[1]):
+                    seeds = [seed for seed, _ in group]
+                    for start in range(0, len(seeds), self.batch_size):
+                        batch = seeds[start:start + self.batch_size]
+                        encoded = await self.service.executor.run(
+                            self.service.render_encoded, batch, truncation_psi, job.spec["enhance_face"], job.spec["format"]
+                        )
+                        # The exact psi, as in the cache parameters, so distinct values never share a name
+                        names = [f"{seed:010d}_psi{truncation_psi!r}.{extension}" for seed in batch]
+                        entries = await run_io(self._append, tar, names, encoded)
+                        for entry, seed in zip(entries, batch):
+                            entry.update({"seed": seed, "truncation_psi": truncation_psi})
+                        await run_io(self._checkpoint, progress, entries, tar.offset)
+                        index += entries
+                        job.state["completed_items"] = completed_items + len(index)
+        await run_io(self._publish, job, shard, temp_path, index)
+
+    def _publish(self, job: Job, shard: int, temp_path: Path, index: List[dict]):
+        os.replace(str(temp_path), str(job.shard_path(shard)))
+        self._write_json(job.index_path(shard), index)
+        job.progress_path(shard).unlink()
+
+    @staticmethod
+    def _checkpoint(progress, entries: List[dict], size: int):
+        """Append one batch to the checkpoint, only its own entries so the cost stays per batch"""
+        progress.write(json.dumps({"entries": entries, "size": size}) + "\n")
+        progress.flush()
+
+    @staticmethod
+    def _load_progress(temp_path: Path, progress_path: Path) -> Tuple[list, int]:
+        """Index and byte size of the members checkpointed in a temp tar, nothing when it must be redone"""
+        index, size, valid = [], 0, 0
+        if temp_path.exists() and progress_path.exists():
+            with open(str(progress_path), "rb") as f:
+                for line in f:
+                    try:
+                        checkpoint = json.loads(line)
+                    except ValueError:
+                        # Cut short by a crash, the batch is rendered again
+                        break
+                    if not line.endswith(b"\n") or temp_path.stat().st_size < checkpoint["size"]:
+                        break
+                    index += checkpoint["entries"]
+                    size = checkpoint["size"]
+                    valid += len(line)
+        # Later checkpoints are appended after the last complete one
+        with open(str(progress_path), "ab") as f:
+            f.truncate(valid)
+        return index, size
+
+    @staticmethod
+    def _append(tar: tarfile.TarFile, names: List[str], encoded: List[bytes]) -> List[dict]:
+        """Add encoded images to the tar, returning their byte ranges for the shard index"""
+        entries = []
+        for name, data in zip(names, encoded):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+            # The header is 512 bytes, the member data follows it
+            entries.append({"name": name, "offset": tar.offset - _padded(len(data)), "size": len(data)})
+        # On disk before the checkpoint that refers to it
+        tar.fileobj.flush()
+        os.fsync(tar.fileobj.fileno())
+        return entries
+
+    def _set_state(self, job: Job, state: str, **fields):
+        job.state.update({"state": state, "updated": time.time(), **fields})
+        self._save(job)
+
+    def _save(self, job: Job):
+        self._write_json(job.directory / "job.json", {"spec": job.spec, "state": job.state})
+
+    @staticmethod
+    def _write_json(path: Path, data):
+        temp_path = path.with_suffix(".json.tmp")
+        temp_path.write_text(json.dumps(data))
+        os.replace(str(temp_path), str(path))
+
+def _padded(size: int) -> int:
+    return -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
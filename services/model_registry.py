@@ -0,0 +1,199 @@
+import contextvars
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from core import metrics
+from core.config import settings
+from models.stylegan2 import StyleGAN2Generator, artifact_path_for
+from services.admission import CostModel
+from services.batcher import MicroBatcher
+from services.executor import InferenceExecutor, run_io
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Name of the checkpoint at STYLEGAN2_MODEL_PATH, loaded at startup and always pinned
+DEFAULT_MODEL = "default"
+
+# Model bound to the current request, the default one when unset
+_current = contextvars.ContextVar("model", default=None)
+
+class UnknownModelError(KeyError):
+    """Raised for a checkpoint name that is not configured"""
+
+class LoadedModel:
+    """A loaded checkpoint with its own micro-batcher and cost model"""
+
+    def __init__(self, name: str, path: str, generator: StyleGAN2Generator, executor: InferenceExecutor, load_seconds: float):
+        self.name = name
+        self.path = path
+        self.generator = generator
+        self.batcher = MicroBatcher(generator, executor)
+        self.cost_model = CostModel(generator.G.img_resolution)
+        # Parameters and buffers on the device plus the latent LRU, measured once loaded
+        self.memory_bytes = generator.memory_bytes + generator.latents.memory_bytes
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.uses = 0
+
+class ModelRegistry:
+    """Serve configured checkpoints by name, loading on first use and evicting LRU under a memory budget"""
+
+    def __init__(
+        self,
+        executor: InferenceExecutor,
+        default_path: str = settings.STYLEGAN2_MODEL_PATH,
+        paths: Dict[str, str] = settings.STYLEGAN2_MODELS,
+        memory_budget_mb: int = settings.MODEL_MEMORY_BUDGET_MB,
+        pinned: List[str] = settings.MODEL_PINNED,
+        create: Callable[[str], StyleGAN2Generator] = StyleGAN2Generator
+    ):
+        self.executor = executor
+        self.paths = {DEFAULT_MODEL: default_path, **paths}
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.pinned = {DEFAULT_MODEL, *pinned}
+        self.create = create
+        # Least recently used first
+        self._loaded = OrderedDict()
+        # Concurrent first requests for a checkpoint share one load
+        self._loading = SingleFlight()
+        self._stats = {"loads": 0, "hits": 0, "evictions": 0}
+        # name -> bytes measured when the checkpoint was last loaded
+        self._measured = {}
+        metrics.MODEL_MEMORY_BYTES.set_function(lambda: self.memory_bytes)
+
+    @property
+    def default(self) -> Optional[LoadedModel]:
+        return self._loaded.get(DEFAULT_MODEL)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(model.memory_bytes for model in self._loaded.values())
+
+    def current(self) -> Optional[LoadedModel]:
+        """Model bound to this request by use(), else the default one"""
+        return _current.get() or self.default
+
+    def add(self, name: str, generator: StyleGAN2Generator, load_seconds: float) -> LoadedModel:
+        """Register a checkpoint that was loaded outside the registry"""
+        model = LoadedModel(name, self.paths[name], generator, self.executor, load_seconds)
+        self._loaded[name] = model
+        metrics.MODEL_LOAD_SECONDS.observe(load_seconds, model=name)
+        return model
+
+    async def get(self, name: str) -> LoadedModel:
+        """The loaded checkpoint, loading it (and evicting others to make room) on first use"""
+        if name not in self.paths:
+            raise UnknownModelError(name)
+        model = self._loaded.get(name)
+        if model is None:
+            model = await self._loading.do(name, self._load, name)
+        else:
+            self._stats["hits"] += 1
+        if name in self._loaded:
+            self._loaded.move_to_end(name)
+        model.last_used = time.time()
+        model.uses += 1
+        return model
+
+    @contextmanager
+    def use(self, model: LoadedModel) -> Iterator[None]:
+        """Bind a model to this context (and the tasks it spawns)"""
+        token = _current.set(model)
+        try:
+            if model is self.default:
+                yield
+            else:
+                # Worker processes are forked with the default model only
+                with self.executor.threads_only():
+                    yield
+        finally:
+            _current.reset(token)
+
+    async def pin(self, name: str) -> LoadedModel:
+        """Keep a checkpoint loaded, it is never evicted"""
+        if name not in self.paths:
+            raise UnknownModelError(name)
+        self.pinned.add(name)
+        return await self.get(name)
+
+    def unpin(self, name: str):
+        if name not in self.paths:
+            raise UnknownModelError(name)
+        if name == DEFAULT_MODEL:
+            raise ValueError("The default model is always pinned")
+        self.pinned.discard(name)
+        self._evict()
+
+    def flush(self):
+        """Persist the latent tables of every loaded checkpoint"""
+        for model in self._loaded.values():
+            model.generator.latents.flush()
+
+    async def _load(self, name: str) -> LoadedModel:
+        path = self.paths[name]
+        # Make room before the load when the size is known up front, the loaded model is measured after
+        self._evict(incoming=self._estimate_bytes(name))
+        logger.info('Loading model "%s" from "%s"', name, path)
+        start = time.perf_counter()
+        generator = await run_io(self.create, path)
+        model = self.add(name, generator, time.perf_counter() - start)
+        self._measured[name] = model.memory_bytes
+        self._stats["loads"] += 1
+        self._evict(keep=name)
+        return model
+
+    def _estimate_bytes(self, name: str) -> int:
+        """Measured size of an earlier load, else the converted artifact, which holds only G's tensors
+
+        A network pickle also carries the discriminator and training state, so it is not counted.
+        """
+        if name in self._measured:
+            return self._measured[name]
+        artifact = artifact_path_for(self.paths[name])
+        return os.path.getsize(artifact) if os.path.isfile(artifact) else 0
+
+    def _evict(self, incoming: int = 0, keep: Optional[str] = None):
+        """Drop least recently used unpinned checkpoints until the budget holds incoming more bytes
+
+        Requests already using an evicted model keep it alive until they finish.
+        """
+        while self.memory_bytes + incoming > self.memory_budget:
+            name = next((name for name in self._loaded if name not in self.pinned and name != keep), None)
+            if name is None:
+                logger.warning('Model memory budget exceeded by pinned models')
+                return
+            model = self._loaded.pop(name)
+            model.generator.latents.flush()
+            self._stats["evictions"] += 1
+            metrics.MODEL_EVICTIONS.inc()
+            logger.info('Evicted model "%s" (%d bytes)', name, model.memory_bytes)
+
+    def get_info(self, name: str) -> dict:
+        """Load state, pinning, load time and network info of one configured checkpoint"""
+        if name not in self.paths:
+            raise UnknownModelError(name)
+        model = self._loaded.get(name)
+        info = {"name": name, "path": self.paths[name], "loaded": model is not None, "pinned": name in self.pinned}
+        if model is not None:
+            info.update({
+                "load_seconds": model.load_seconds,
+                "loaded_at": model.loaded_at,
+                "last_used": model.last_used,
+                "uses": model.uses,
+                "network": model.generator.get_network_info()
+            })
+        return info
+
+    def get_stats(self) -> dict:
+        return {
+            **self._stats,
+            "loaded": list(self._loaded),
+            "memory_bytes": self.memory_bytes,
+            "memory_budget": self.memory_budget
+        }
@@ -1,22 +1,57 @@
 import cv2
+import logging
 import os
 import numpy as np
+import torch
 from PIL import Image
+from typing import List, Optional
 
 from basicsr.archs.rrdbnet_arch import RRDBNet
 from basicsr.utils.download_util import load_file_from_url
 from realesrgan import RealESRGANer
 from gfpgan import GFPGANer
 
+from core import metrics
+from core.config import settings
+from core.precision import autocast, check_precision, inference_mode
+from services.tiled_sr import TiledUpsampler
+
+# GFPGAN restores faces at this fixed, FFHQ-aligned crop size
+GFPGAN_FACE_SIZE = 512
+# int8 activation ranges are calibrated on center crops of this size, RRDBNet is fully convolutional
+INT8_CALIBRATION_CROP = 64
+
+logger = logging.getLogger(__name__)
+
 class RealESRGANProcessor:
-    def __init__(self, model_name='RealESRGAN_x4plus', face_enhance=True, fp32=False, gpu_id=None):
+    def __init__(
+        self,
+        model_name='RealESRGAN_x4plus',
+        face_enhance=True,
+        fp32=False,
+        gpu_id=None,
+        tile_mode=settings.SR_TILE_MODE,
+        precision=settings.ENHANCER_PRECISION,
+        calibration_images: Optional[List[np.ndarray]] = None
+    ):
         self.model_name = model_name
         self.face_enhance = face_enhance
         self.fp32 = fp32
         self.gpu_id = gpu_id
+        self.tile_mode = tile_mode
+        self.precision = check_precision(precision)
         
-        # Initialize the upsampler
+        # Initialize the upsampler, tiled mode also covers the GFPGAN background pass
         self.upsampler = self._initialize_upsampler()
+        self.upsampler.model = self.upsampler.model.to(memory_format=torch.channels_last)
+        if self.precision == "int8":
+            if self.upsampler.device.type != 'cpu' or not calibration_images:
+                logger.warning('int8 needs the CPU and calibration images, running RRDBNet in fp32')
+                self.precision = "fp32"
+            else:
+                self._quantize_upsampler(calibration_images)
+        if self.tile_mode == "auto":
+            self.upsampler = TiledUpsampler(self.upsampler)
         
         # Initialize face enhancer if needed
         self.face_enhancer = None
@@ -52,6 +87,30 @@ class RealESRGANProcessor:
             
         return upsampler
 
+    def _quantize_upsampler(self, calibration_images: List[np.ndarray]):
+        """Static int8 quantization of RRDBNet, only the super-resolution net (all convolutions) is affected"""
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+        crops = []
+        for img in calibration_images:
+            top = max(0, (img.shape[0] - INT8_CALIBRATION_CROP) // 2)
+            left = max(0, (img.shape[1] - INT8_CALIBRATION_CROP) // 2)
+            crop = img[top:top + INT8_CALIBRATION_CROP, left:left + INT8_CALIBRATION_CROP]
+            crop = torch.from_numpy(np.ascontiguousarray(crop[..., ::-1])).permute(2, 0, 1)[None]
+            crops.append(crop.float().div_(255.0).contiguous(memory_format=torch.channels_last))
+
+        model = self.upsampler.model.float().eval()
+        qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+        prepared = prepare_fx(model, qconfig_mapping, (crops[0],))
+        # Observers update their buffers in place, which inference mode would not allow later
+        with torch.no_grad():
+            for crop in crops:
+                prepared(crop)
+        self.upsampler.model = convert_fx(prepared)
+        self.upsampler.half = False
+        logger.info('Quantized RRDBNet to int8 with %d calibration crop(s)', len(crops))
+
     def _initialize_face_enhancer(self):
         """Initialize GFPGAN face enhancer"""
         self.face_enhancer = GFPGANer(
@@ -71,27 +130,81 @@ class RealESRGANProcessor:
         else:
             img_array = image
 
+        output = self.enhance_array(img_array, outscale=outscale)
+
+        # Convert back to RGB
+        output_rgb = cv2.cvtColor(output, cv2.COLOR_BGR2RGB)
+        return Image.fromarray(output_rgb)
+
+    def enhance_array(self, img_bgr, outscale=4, aligned=False):
+        """Enhance a contiguous BGR uint8 array and return a BGR uint8 array
+
+        aligned=True marks the input as a single centered FFHQ-aligned face,
+        such as StyleGAN2 output, and skips detection, warping and paste-back.
+        Non-square inputs always take the full path.
+        """
+        if aligned and self.face_enhance and self.face_enhancer and img_bgr.shape[0] == img_bgr.shape[1]:
+            return self.enhance_aligned_batch([img_bgr], outscale=outscale)[0]
+
         try:
-            if self.face_enhance and self.face_enhancer:
-                # Use GFPGAN for face enhancement
-                _, _, output = self.face_enhancer.enhance(
-                    img_array, 
-                    has_aligned=False, 
-                    only_center_face=False, 
-                    paste_back=True
-                )
-            else:
-                # Use Real-ESRGAN only
-                output, _ = self.upsampler.enhance(img_array, outscale=outscale)
-                
-            # Convert back to RGB
-            output_rgb = cv2.cvtColor(output, cv2.COLOR_BGR2RGB)
-            return Image.fromarray(output_rgb)
+            with inference_mode(), autocast(self.precision, self.upsampler.device), metrics.stage("enhancement"):
+                if self.face_enhance and self.face_enhancer:
+                    # Use GFPGAN for face enhancement
+                    _, _, output = self.face_enhancer.enhance(
+                        img_bgr, 
+                        has_aligned=False, 
+                        only_center_face=False, 
+                        paste_back=True
+                    )
+                else:
+                    # Use Real-ESRGAN only
+                    output, _ = self.upsampler.enhance(img_bgr, outscale=outscale)
+            return output
             
         except RuntimeError as error:
-            print('Error during enhancement:', error)
+            logger.error('Error during enhancement: %s', error)
             raise
 
+    def super_resolve(self, img_bgr, outscale=4):
+        """Real-ESRGAN only, no face restoration"""
+        with inference_mode(), autocast(self.precision, self.upsampler.device), metrics.stage("enhancement"):
+            output, _ = self.upsampler.enhance(img_bgr, outscale=outscale)
+        return output
+
+    def enhance_aligned_batch(self, images_bgr: List[np.ndarray], outscale=4, weight=0.5) -> List[np.ndarray]:
+        """Restore pre-aligned faces in one GFPGAN pass at the native crop size"""
+        faces = np.stack([
+            cv2.resize(img, (GFPGAN_FACE_SIZE, GFPGAN_FACE_SIZE), interpolation=cv2.INTER_LINEAR)
+            for img in images_bgr
+        ])
+
+        # BGR uint8 NHWC -> RGB float NCHW in [-1, 1], as GFPGANer prepares each crop
+        faces_t = torch.from_numpy(np.ascontiguousarray(faces[..., ::-1])).permute(0, 3, 1, 2)
+        faces_t = faces_t.float().div_(127.5).sub_(1.0).to(self.face_enhancer.device).contiguous()
+
+        try:
+            # GFPGAN reshapes activations with view(), so it stays in the contiguous format
+            with inference_mode(), autocast(self.precision, self.face_enhancer.device), metrics.stage("enhancement"):
+                output = self.face_enhancer.gfpgan(faces_t, return_rgb=False, weight=weight)[0]
+        except RuntimeError as error:
+            logger.error('Error during enhancement: %s', error)
+            raise
+
+        output = ((output.float().clamp(-1, 1) + 1) * 127.5).round().to(torch.uint8)
+        output = output.permute(0, 2, 3, 1).flip(3).contiguous().cpu().numpy()
+
+        restored = []
+        for img, face in zip(images_bgr, output):
+            size = (int(img.shape[1] * outscale), int(img.shape[0] * outscale))
+            if (face.shape[1], face.shape[0]) != size:
+                face = cv2.resize(face, size, interpolation=cv2.INTER_LANCZOS4)
+            restored.append(face)
+        return restored
+
+    def get_tile_stats(self) -> dict:
+        """Tile size, time per tile and peak RSS of the last tiled super-resolution pass"""
+        return getattr(self.upsampler, 'last_stats', {})
+
     def enhance_image_file(self, input_path, output_path, outscale=4):
         """Enhance an image file and save to output path"""
         # Read image
@@ -100,9 +213,8 @@ class RealESRGANProcessor:
             raise ValueError(f"Could not read image from {input_path}")
 
         # Enhance image
-        enhanced_img = self.enhance_image(img, outscale=outscale)
+        enhanced_img = self.enhance_array(img, outscale=outscale)
         
         # Save enhanced image
-        enhanced_img.save(output_path)
+        cv2.imwrite(str(output_path), enhanced_img)
         return output_path
-    
\ No newline at end of file
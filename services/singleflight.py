@@ -0,0 +1,59 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent callers asking for the same key"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"computed": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Await fn(*args, **kwargs), or the identical call another request already started"""
+        if key in self._calls:
+            self._stats["shared"] += 1
+        else:
+            self._launch([key], self._as_list(fn(*args, **kwargs)))
+        return await asyncio.shield(self._calls[key])
+
+    async def do_many(self, keys: List[Hashable], fn: Callable[[List[Hashable]], Awaitable[List[Any]]]) -> List[Any]:
+        """Batched do(): keys already in flight are awaited, the rest are computed by one fn(keys) call"""
+        owned = [key for key in OrderedDict.fromkeys(keys) if key not in self._calls]
+        self._stats["shared"] += len(keys) - len(owned)
+        if owned:
+            self._launch(owned, fn(owned))
+        # Keys leave the table once resolved, so hold on to the futures before awaiting
+        futures = [self._calls[key] for key in keys]
+        return list(await asyncio.gather(*[asyncio.shield(future) for future in futures]))
+
+    def get_stats(self) -> dict:
+        return {**self._stats, "in_flight": len(self._calls)}
+
+    @staticmethod
+    async def _as_list(coro: Awaitable[Any]) -> List[Any]:
+        return [await coro]
+
+    def _launch(self, keys: List[Hashable], coro: Awaitable[List[Any]]):
+        # The computation runs as its own task, a caller that disconnects does not cancel it for the others
+        loop = asyncio.get_event_loop()
+        futures = {key: loop.create_future() for key in keys}
+        self._calls.update(futures)
+        self._stats["computed"] += len(keys)
+        asyncio.ensure_future(self._resolve(futures, coro))
+
+    async def _resolve(self, futures: Dict[Hashable, asyncio.Future], coro: Awaitable[List[Any]]):
+        try:
+            results = await coro
+            for future, result in zip(futures.values(), results):
+                future.set_result(result)
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key, future in futures.items():
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+                if not future.done():
+                    future.cancel()
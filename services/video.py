@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, NamedTuple
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Encoded bytes read from ffmpeg per streamed chunk
+CHUNK_SIZE = 64 * 1024
+
+class VideoFormat(NamedTuple):
+    media_type: str
+    output_params: List[str]
+
+VIDEO_FORMATS = {
+    # Fragmented MP4 writes the moov box first and needs no seekable output, so it can be streamed
+    "mp4": VideoFormat("video/mp4", [
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-pix_fmt", "yuv420p",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"
+    ]),
+    "webm": VideoFormat("video/webm", [
+        "-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8", "-crf", "32", "-b:v", "0",
+        "-pix_fmt", "yuv420p", "-f", "webm"
+    ]),
+}
+
+def normalize_video_format(format: str) -> str:
+    """Lower-case a requested container, ValueError when it is not supported"""
+    format = format.lower()
+    if format not in VIDEO_FORMATS:
+        raise ValueError(f"Unsupported video format '{format}', use one of {', '.join(VIDEO_FORMATS)}")
+    return format
+
+class VideoEncoder:
+    """Pipe raw RGB frames into imageio-ffmpeg's ffmpeg binary and stream the encoded container"""
+
+    def __init__(self, width: int, height: int, fps: int = settings.VIDEO_FPS, format: str = settings.VIDEO_FORMAT):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.format = normalize_video_format(format)
+        self._process = None
+
+    @property
+    def media_type(self) -> str:
+        return VIDEO_FORMATS[self.format].media_type
+
+    async def start(self):
+        """Launch ffmpeg reading frames from stdin and writing the container to stdout"""
+        import imageio_ffmpeg
+
+        command = [
+            imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{self.width}x{self.height}", "-r", str(self.fps),
+            "-i", "pipe:0", *VIDEO_FORMATS[self.format].output_params, "pipe:1"
+        ]
+        self._process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+    async def stream(self, frames: AsyncIterator[np.ndarray]) -> AsyncIterator[bytes]:
+        """Encode uint8 [N, H, W, 3] frame chunks while yielding the output as it is written
+
+        Only the chunk being written is held in memory, ffmpeg's pipes apply
+        backpressure to rendering when the client reads slowly.
+        """
+        feeder = asyncio.ensure_future(self._feed(frames))
+        try:
+            while True:
+                chunk = await self._process.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+            returncode = await self._process.wait()
+            if returncode != 0:
+                error = (await self._process.stderr.read()).decode(errors="replace").strip()
+                raise RuntimeError(f"ffmpeg exited with code {returncode}: {error}")
+            # Rendering errors close ffmpeg's input early, surface them instead of a short clip
+            await feeder
+        finally:
+            if not feeder.done():
+                feeder.cancel()
+            elif not feeder.cancelled():
+                # Retrieved here, the ffmpeg error above is the one reported
+                feeder.exception()
+            if self._process.returncode is None:
+                self._process.kill()
+                await self._process.wait()
+
+    async def _feed(self, frames: AsyncIterator[np.ndarray]):
+        stdin = self._process.stdin
+        try:
+            async for chunk in frames:
+                # A flat byte view of the contiguous frames, written without a copy
+                stdin.write(memoryview(np.ascontiguousarray(chunk)).cast("B"))
+                await stdin.drain()
+        finally:
+            stdin.close()
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import torch
+
+from core import metrics
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Crashed workers are noticed within this long, busy or idle
+LIVENESS_CHECK_SECONDS = 1.0
+
+def _worker_main(index: int, cores: List[int], num_threads: int, targets: Dict[str, Any], jobs, results):
+    """Inference process loop: pin to a core slice and run jobs against the inherited models"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(num_threads)
+
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id, target, method, args, kwargs, enqueued_at = job
+        # Stage timings travel back with the result, the parent records them
+        trace = metrics.start_trace()
+        trace.add("queue_wait", time.time() - enqueued_at)
+        try:
+            result = getattr(targets[target], method)(*args, **kwargs)
+            results.put((job_id, True, result, trace.stages))
+        except Exception as e:
+            results.put((job_id, False, f"{type(e).__name__}: {e}", trace.stages))
+
+class WorkerPool:
+    """Forked inference processes with CPU core partitioning and copy-on-write shared weights
+
+    Models are loaded once in the API process, then every worker is forked from
+    it, so weight pages stay shared until written (inference never writes them).
+    The API process should load with a single torch thread so no OpenMP pool
+    exists at fork time; each worker sets its own thread count and affinity.
+    """
+
+    def __init__(
+        self,
+        targets: Dict[str, Any],
+        num_workers: int = settings.INFERENCE_PROCESSES,
+        threads_per_worker: int = settings.THREADS_PER_PROCESS
+    ):
+        self.targets = targets
+        self.num_workers = max(1, num_workers)
+        cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.threads_per_worker = threads_per_worker or max(1, len(cores) // self.num_workers)
+        # Contiguous core slices, wrapping around when workers x threads exceeds the core count
+        self.core_slices = [
+            [cores[(i * self.threads_per_worker + j) % len(cores)] for j in range(self.threads_per_worker)]
+            for i in range(self.num_workers)
+        ]
+
+        self._context = multiprocessing.get_context("fork")
+        self._results = self._context.Queue()
+        self._queues = []
+        self._processes = []
+        self._futures = {}
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._reader = None
+        self._running = False
+
+    def start(self):
+        """Fork the workers and start collecting their results"""
+        for index in range(self.num_workers):
+            jobs = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(index, self.core_slices[index], self.threads_per_worker, self.targets, jobs, self._results),
+                name=f"inference-{index}",
+                daemon=True
+            )
+            process.start()
+            self._queues.append(jobs)
+            self._processes.append(process)
+
+        self._running = True
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+        logger.info('Started %d inference worker(s) with %d thread(s) each', self.num_workers, self.threads_per_worker)
+
+    @property
+    def pids(self) -> List[int]:
+        return [process.pid for process in self._processes]
+
+    def target_name(self, fn: Callable) -> Optional[str]:
+        """Name of the registered object a bound method belongs to, if any"""
+        owner = getattr(fn, "__self__", None)
+        for name, target in self.targets.items():
+            if owner is target:
+                return name
+        return None
+
+    async def submit(self, target: str, method: str, *args, worker: Optional[int] = None, **kwargs) -> Any:
+        """Run target.method(*args, **kwargs) on the least-loaded live worker"""
+        if worker is None:
+            alive = [i for i, process in enumerate(self._processes) if process.is_alive()]
+            if not alive:
+                raise RuntimeError("No inference worker is alive")
+            load = self._load
+            worker = min(alive, key=lambda i: load[i])
+
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._futures[job_id] = (loop, future, worker)
+        try:
+            self._queues[worker].put((job_id, target, method, args, kwargs, time.time()))
+            ok, payload, stages = await future
+            for name, seconds in stages.items():
+                metrics.record_stage(name, seconds)
+            if not ok:
+                raise RuntimeError(payload)
+            return payload
+        finally:
+            with self._lock:
+                self._futures.pop(job_id, None)
+
+    async def broadcast(self, target: str, method: str, *args, **kwargs) -> List[Any]:
+        """Run the same job once on every worker, e.g. for warmup"""
+        return await asyncio.gather(*[
+            self.submit(target, method, *args, worker=i, **kwargs) for i in range(self.num_workers)
+        ])
+
+    @property
+    def _load(self) -> List[int]:
+        """Jobs in flight per worker, the jobs of a dead worker stop counting once they are failed"""
+        load = [0] * self.num_workers
+        with self._lock:
+            for _, _, worker in self._futures.values():
+                load[worker] += 1
+        return load
+
+    def get_stats(self) -> dict:
+        return {
+            "workers": self.num_workers,
+            "threads_per_worker": self.threads_per_worker,
+            "in_flight": self._load,
+            "alive": [process.is_alive() for process in self._processes],
+            "cores": self.core_slices
+        }
+
+    def _read_results(self):
+        # Checked on a clock, other workers' results keep the queue busy while one has crashed
+        next_check = time.monotonic() + LIVENESS_CHECK_SECONDS
+        while self._running:
+            try:
+                job_id, ok, payload, stages = self._results.get(timeout=LIVENESS_CHECK_SECONDS)
+            except queue.Empty:
+                pass
+            else:
+                with self._lock:
+                    entry = self._futures.get(job_id)
+                if entry is not None:
+                    loop, future, _ = entry
+                    loop.call_soon_threadsafe(self._resolve, future, (ok, payload, stages), None)
+            if time.monotonic() >= next_check:
+                self._fail_dead_workers()
+                next_check = time.monotonic() + LIVENESS_CHECK_SECONDS
+
+    def _fail_dead_workers(self):
+        dead = {i for i, process in enumerate(self._processes) if not process.is_alive()}
+        if not dead:
+            return
+        with self._lock:
+            job_ids = [job_id for job_id, entry in self._futures.items() if entry[2] in dead]
+            entries = [self._futures.pop(job_id) for job_id in job_ids]
+        for loop, future, worker in entries:
+            loop.call_soon_threadsafe(self._resolve, future, None, RuntimeError(f"Inference worker {worker} exited"))
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any, error: Optional[Exception]):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def shutdown(self):
+        """Stop the workers and the result reader"""
+        self._running = False
+        for jobs in self._queues:
+            jobs.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
@@ -88,8 +88,8 @@ class GridGenerator {
         const startTime = Date.now();
 
         try {
-            // Use POST method with proper error handling
-            const response = await fetch('/api/v1/generate/style-mix', {
+            // Stream cells as they are enhanced, the finished grid arrives last
+            const response = await fetch('/api/v1/generate/style-mix/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -112,7 +112,22 @@ class GridGenerator {
                 throw new Error(errorMessage);
             }
 
-            const result = await response.json();
+            let result = null;
+            await this.readEvents(response, (event, data) => {
+                if (event === 'start') {
+                    this.showStreamingGrid(data.rows, data.cols);
+                } else if (event === 'cell') {
+                    this.placeCell(data.row, data.col, data.image);
+                } else if (event === 'grid') {
+                    result = data;
+                } else if (event === 'error') {
+                    throw new Error(data.detail);
+                }
+            });
+
+            if (!result) {
+                throw new Error('Grid stream ended early');
+            }
             const endTime = Date.now();
             const generationTime = ((endTime - startTime) / 1000).toFixed(1);
             
@@ -124,6 +139,67 @@ class GridGenerator {
         }
     }
 
+    async readEvents(response, onEvent) {
+        // Parse a text/event-stream body, calling onEvent for every complete event
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                block.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
+    showStreamingGrid(rows, cols) {
+        // Placeholder canvas with the header row/column, filled in cell by cell
+        const gridContainer = document.getElementById('facesGrid');
+        gridContainer.innerHTML = '';
+
+        const gridItem = document.createElement('div');
+        gridItem.className = 'col-span-full flex justify-center';
+        const canvas = document.createElement('div');
+        canvas.id = 'streamingGrid';
+        canvas.className = 'max-w-4xl w-full grid gap-0';
+        canvas.style.gridTemplateColumns = `repeat(${cols + 1}, minmax(0, 1fr))`;
+
+        for (let row = 0; row <= rows; row++) {
+            for (let col = 0; col <= cols; col++) {
+                const cell = document.createElement('div');
+                cell.id = `gridCell-${row}-${col}`;
+                cell.className = row === 0 && col === 0 ? 'aspect-square bg-black' : 'aspect-square bg-gray-200 animate-pulse';
+                canvas.appendChild(cell);
+            }
+        }
+        gridItem.appendChild(canvas);
+        gridContainer.appendChild(gridItem);
+
+        document.getElementById('gridLoadingState').classList.add('hidden');
+        document.getElementById('gridResults').classList.remove('hidden');
+    }
+
+    placeCell(row, col, src) {
+        const cell = document.getElementById(`gridCell-${row}-${col}`);
+        if (!cell) return;
+        cell.className = 'aspect-square';
+        cell.innerHTML = `<img src="${src}" alt="Face ${row}×${col}" class="w-full h-full object-cover">`;
+    }
+
     showGridLoadingState() {
         document.getElementById('gridEmptyState').classList.add('hidden');
         document.getElementById('gridResults').classList.add('hidden');
@@ -171,7 +247,7 @@ class GridGenerator {
         gridItem.className = 'col-span-full flex justify-center';
         gridItem.innerHTML = `
             <div class="max-w-4xl">
-                <img src="${result.url}?t=${new Date().getTime()}" 
+                <img src="${result.url}" 
                     alt="Generated face grid"
                     class="w-full h-auto rounded-lg shadow-lg">
                 <div class="mt-4 text-center text-sm text-gray-600">
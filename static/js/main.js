@@ -107,7 +107,8 @@ class FaceGenerator {
     displayResult(result) {
         const image = document.getElementById('generatedImage');
         // Use the URL from the API response directly
-        image.src = result.url + '?t=' + new Date().getTime(); // Cache bust
+        // Cached outputs are immutable per URL, so the browser cache can serve repeats
+        image.src = result.url;
         
         // Add click event to image for preview
         image.onclick = () => this.openModal(result.url);
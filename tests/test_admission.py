@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from services.admission import AdmissionController, CostBudget, CostModel, RateLimitedError, TokenBucket
+from services.executor import QueueFullError
+
+def test_cost_model_scales_with_faces_and_resolution():
+    model = CostModel(resolution=256, synthesis_ms=100, enhance_aligned_ms=300, enhance_full_ms=900, minimum=0.05)
+    assert model.faces(4, "none") == pytest.approx(4 * 100 / model.unit_ms)
+    assert model.faces(0, "aligned") == 0.05
+    large = CostModel(resolution=512, synthesis_ms=100, enhance_aligned_ms=300, enhance_full_ms=900)
+    assert large.synthesis_ms == 400
+
+def test_token_bucket_allows_burst_then_limits():
+    bucket = TokenBucket(rate_per_minute=60, burst=3, max_clients=10)
+    for _ in range(3):
+        bucket.take("a", 1)
+    with pytest.raises(RateLimitedError) as error:
+        bucket.take("a", 1)
+    assert error.value.retry_after >= 1
+    # Buckets are per client
+    bucket.take("b", 1)
+
+def test_token_bucket_refund_and_debt():
+    bucket = TokenBucket(rate_per_minute=60, burst=2, max_clients=10)
+    bucket.take("a", 2)
+    bucket.refund("a", 2)
+    # Above the burst runs on a full bucket and leaves it in debt
+    bucket.take("a", 5)
+    with pytest.raises(RateLimitedError):
+        bucket.take("a", 0.5)
+
+def test_token_bucket_forgets_least_recent_clients():
+    bucket = TokenBucket(rate_per_minute=60, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        bucket.take(client, 1)
+    assert bucket.clients == 2
+    # "a" was forgotten and starts with a full bucket again
+    bucket.take("a", 1)
+
+def test_zero_rate_disables_limits():
+    bucket = TokenBucket(rate_per_minute=0, burst=1)
+    for _ in range(10):
+        bucket.take("a", 1)
+
+def test_budget_waits_for_room_and_lets_small_requests_pass():
+    async def main():
+        budget = CostBudget(capacity=4, timeout=1)
+        assert await budget.acquire(3) == 3
+        large = asyncio.ensure_future(budget.acquire(4))
+        small = asyncio.ensure_future(budget.acquire(1))
+        await asyncio.sleep(0)
+        # The small request fits next to the running one, the large one waits
+        assert small.done() and not large.done()
+        budget.release(3)
+        budget.release(1)
+        assert await large == 4
+        assert budget.used == 4 and budget.waiting == 0
+
+    asyncio.run(main())
+
+def test_budget_times_out_with_queue_full():
+    async def main():
+        budget = CostBudget(capacity=1, timeout=0.01)
+        await budget.acquire(1)
+        with pytest.raises(QueueFullError):
+            await budget.acquire(1)
+        assert budget.waiting == 0
+
+    asyncio.run(main())
+
+def test_admission_refunds_the_bucket_on_timeout():
+    async def main():
+        admission = AdmissionController()
+        admission.buckets = TokenBucket(rate_per_minute=60, burst=2, max_clients=10)
+        admission.budget = CostBudget(capacity=1, timeout=0.01)
+        async with admission.admit("a", 1):
+            with pytest.raises(QueueFullError):
+                async with admission.admit("b", 1):
+                    pass
+        assert admission.budget.used == 0
+        # "b" got its tokens back
+        admission.buckets.take("b", 2)
+        stats = admission.get_stats()
+        assert (stats["admitted"], stats["timed_out"]) == (1, 1)
+
+    asyncio.run(main())
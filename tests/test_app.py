@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+try:
+    import app as app_module
+except ImportError:
+    pytest.skip("needs the stylegan2-ada-pytorch submodule", allow_module_level=True)
+
+from services.admission import RateLimitedError
+from services.executor import QueueFullError
+
+def handle(exc):
+    handler = app_module.app.exception_handlers[type(exc)]
+    return asyncio.run(handler(None, exc))
+
+def test_queue_full_maps_to_503_with_retry_after():
+    response = handle(QueueFullError(retry_after=7))
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+    assert b"Inference queue is full" in response.body
+
+def test_rate_limited_maps_to_429_with_retry_after():
+    response = handle(RateLimitedError(retry_after=12))
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "12"
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from services.batcher import MicroBatcher
+from services.executor import InferenceExecutor
+
+class FakeGenerator:
+    """Records every batch, an image is filled with its seed"""
+
+    def __init__(self):
+        self.batches = []
+
+    def generate_arrays(self, seeds, truncation_psi, noise_mode='const', bgr=True):
+        self.batches.append((list(seeds), truncation_psi))
+        return [np.full((2, 2, 3), seed, dtype=np.uint8) for seed in seeds]
+
+def test_concurrent_submits_share_one_batch():
+    generator = FakeGenerator()
+
+    async def main():
+        batcher = MicroBatcher(generator, InferenceExecutor(max_workers=1), window_ms=20, max_batch_size=8)
+        return await asyncio.gather(*[batcher.submit(seed, 0.5) for seed in (1, 2, 2, 3)])
+
+    images = asyncio.run(main())
+    assert [int(image[0, 0, 0]) for image in images] == [1, 2, 2, 3]
+    # Duplicate seeds are synthesized once
+    assert generator.batches == [([1, 2, 3], 0.5)]
+
+def test_groups_by_truncation_and_flushes_at_max_size():
+    generator = FakeGenerator()
+
+    async def main():
+        batcher = MicroBatcher(generator, InferenceExecutor(max_workers=1), window_ms=1000, max_batch_size=2)
+        await asyncio.wait_for(asyncio.gather(batcher.submit(1, 0.5), batcher.submit(2, 0.7)), timeout=1)
+
+    asyncio.run(main())
+    assert sorted(generator.batches) == [([1], 0.5), ([2], 0.7)]
+
+def test_foreground_submit_joining_a_background_window_does_not_wait():
+    generator = FakeGenerator()
+    release = threading.Event()
+
+    async def main():
+        executor = InferenceExecutor(max_workers=2)
+        batcher = MicroBatcher(generator, executor, window_ms=20, max_batch_size=8)
+        # A long foreground job keeps the executor busy
+        busy = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        try:
+            with executor.background():
+                # Opens the window, its call_later inherits the background context
+                background = asyncio.ensure_future(batcher.submit(1, 0.5))
+            await asyncio.sleep(0)
+            image = await asyncio.wait_for(batcher.submit(2, 0.5), timeout=1)
+            assert int(image[0, 0, 0]) == 2
+            await background
+        finally:
+            release.set()
+            await busy
+
+    asyncio.run(main())
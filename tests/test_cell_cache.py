@@ -0,0 +1,40 @@
+import numpy as np
+
+from services.cache import CellCache
+
+def cell(value, size=4):
+    return np.full((size, size, 3), value, dtype=np.uint8)
+
+def test_hit_and_miss():
+    cache = CellCache(max_bytes=1024)
+    cache.put((1, 2), cell(7))
+    assert cache.get((1, 2))[0, 0, 0] == 7
+    assert cache.get((2, 1)) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+def test_evicts_least_recently_used_within_byte_budget():
+    cache = CellCache(max_bytes=2 * cell(0).nbytes)
+    cache.put("a", cell(1))
+    cache.put("b", cell(2))
+    cache.get("a")
+    cache.put("c", cell(3))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.get_stats()["evictions"] == 1
+    assert cache.get_stats()["bytes"] == 2 * cell(0).nbytes
+
+def test_replacing_a_key_keeps_the_byte_count():
+    cache = CellCache(max_bytes=1024)
+    cache.put("a", cell(1))
+    cache.put("a", cell(2))
+    assert cache.get_stats()["bytes"] == cell(0).nbytes
+    assert cache.get("a")[0, 0, 0] == 2
+
+def test_views_are_copied_and_oversized_cells_skipped():
+    cache = CellCache(max_bytes=cell(0).nbytes)
+    batch = np.zeros((2, 4, 4, 3), dtype=np.uint8)
+    cache.put("view", batch[0])
+    assert cache.get("view").base is None
+    cache.put("big", cell(0, size=8))
+    assert cache.get("big") is None
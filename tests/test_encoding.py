@@ -0,0 +1,33 @@
+import pytest
+
+from services.encoding import negotiate_format
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, "png"),
+    ("", "png"),
+    ("image/webp", "webp"),
+    ("image/jpeg;q=0.8, image/webp;q=0.5", "jpeg"),
+    ("image/jpg", "png"),
+    # Browsers: explicit webp beats the wildcards at the same q
+    ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "webp"),
+    # A bare wildcard gets the default
+    ("*/*", "png"),
+    ("image/*", "png"),
+    # Wildcards match every format at their q
+    ("image/webp;q=0.1, */*", "png"),
+    # An explicit q=0 refuses a format the wildcard would match
+    ("image/png;q=0, */*", "webp"),
+    ("image/png;q=0, image/webp;q=0, image/*;q=0.5", "jpeg"),
+    # image/* is more specific than */*
+    ("image/*;q=0, */*", "png"),
+    ("image/*;q=0.2, image/jpeg;q=0.3, */*;q=0.9", "jpeg"),
+    # Nothing acceptable falls back to a format that was not refused
+    ("text/html", "png"),
+    ("image/png;q=0", "webp"),
+])
+def test_negotiate_format(accept, expected):
+    assert negotiate_format(accept, default="png") == expected
+
+def test_wildcard_prefers_configured_default():
+    assert negotiate_format("*/*", default="jpeg") == "jpeg"
+    assert negotiate_format("image/jpeg;q=0, */*", default="jpeg") == "webp"
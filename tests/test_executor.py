@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.executor import InferenceExecutor, QueueFullError, run_io
+
+def test_runs_blocking_calls_off_the_loop():
+    async def main():
+        executor = InferenceExecutor(max_workers=2, max_queue_size=0)
+        caller = threading.get_ident()
+        worker = await executor.run(threading.get_ident)
+        assert worker != caller
+        assert await executor.run(sum, [1, 2, 3]) == 6
+        assert await run_io(divmod, 7, 2) == (3, 1)
+        executor.shutdown()
+
+    asyncio.run(main())
+
+def test_rejects_beyond_workers_plus_queue():
+    release = threading.Event()
+
+    async def main():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=2)
+        jobs = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert (executor.in_flight, executor.queue_depth) == (3, 2)
+        with pytest.raises(QueueFullError) as error:
+            await executor.run(release.wait, 5)
+        assert error.value.retry_after > 0
+        release.set()
+        await asyncio.gather(*jobs)
+        assert executor.in_flight == 0
+        executor.shutdown()
+
+    asyncio.run(main())
+
+def test_failed_jobs_release_their_slot():
+    def fail():
+        raise ValueError("bad input")
+
+    async def main():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=0)
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                await executor.run(fail)
+        assert executor.in_flight == 0
+        assert await executor.run(int, "4") == 4
+        executor.shutdown()
+
+    asyncio.run(main())
+
+def test_background_jobs_wait_for_an_idle_executor():
+    release = threading.Event()
+
+    async def main():
+        executor = InferenceExecutor(max_workers=2, max_queue_size=0)
+        foreground = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+        with executor.background():
+            background = asyncio.ensure_future(executor.run(int, "1"))
+        await asyncio.sleep(0.2)
+        assert not background.done()
+        # foreground() inside background() runs right away
+        with executor.background(), executor.foreground():
+            assert await asyncio.wait_for(executor.run(int, "2"), timeout=1) == 2
+        release.set()
+        await foreground
+        assert await asyncio.wait_for(background, timeout=1) == 1
+        executor.shutdown()
+
+    asyncio.run(main())
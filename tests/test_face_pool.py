@@ -0,0 +1,66 @@
+import asyncio
+
+from services.cache import ResultCache
+from services.executor import InferenceExecutor, run_io
+from services.face_pool import FacePool
+
+class FakeService:
+    """The parts of GenerationService the pool renders and stores with"""
+
+    def __init__(self, directory, max_bytes=10 ** 6):
+        self.executor = InferenceExecutor(max_workers=1)
+        self.cache = ResultCache(directory=directory, max_bytes=max_bytes)
+
+    def render_encoded(self, seeds, truncation_psi, enhance_face=True, format="png"):
+        return [str(seed).encode().ljust(100, b".") for seed in seeds]
+
+    def single_filename(self, seed, truncation_psi=0.5, enhance_face=True, format="png"):
+        return f"{seed}_{truncation_psi}.{format}"
+
+    def _single_params(self, seed, truncation_psi, enhance_face):
+        return {"enhancement": "face_enhanced_aligned"}
+
+    async def _store(self, filename, image_bytes, background_tasks=None):
+        await run_io(self.cache.put, filename, image_bytes)
+
+async def filled(pool):
+    pool.start()
+    for _ in range(200):
+        if pool.ready >= pool.size:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("pool never filled")
+
+def test_refill_renders_and_caches_faces(tmp_path):
+    async def main():
+        service = FakeService(str(tmp_path))
+        pool = FacePool(service, size=3, batch_size=2, truncation_psi=0.5, format="png")
+        await filled(pool)
+        face = pool.pop()
+        pool.stop()
+        return service, face
+
+    service, face = asyncio.run(main())
+    assert service.cache.get(face["filename"]) == face["image_bytes"]
+    assert face["url"] == service.cache.url(face["filename"])
+    assert "timestamp" in face
+
+def test_faces_evicted_from_the_cache_are_not_served(tmp_path):
+    async def main():
+        # Room for exactly the three pooled faces
+        service = FakeService(str(tmp_path), max_bytes=300)
+        pool = FacePool(service, size=3, batch_size=3, truncation_psi=0.5, format="png")
+        await filled(pool)
+        pool.stop()
+        # Ordinary traffic pushes the two oldest pooled faces out
+        service.cache.put("other-1.png", b"x" * 100)
+        service.cache.put("other-2.png", b"x" * 100)
+
+        face = pool.pop()
+        assert service.cache.contains(face["filename"])
+        # Only evicted faces were left, the caller renders instead
+        assert pool.pop() is None
+        return pool.get_stats()
+
+    stats = asyncio.run(main())
+    assert (stats["served"], stats["evicted"], stats["misses"]) == (1, 2, 1)
@@ -0,0 +1,80 @@
+import pytest
+from starlette.requests import Request
+
+from api.http_cache import cached_response, etag_matches, make_etag, parse_range
+
+DATA = bytes(range(100))
+ETAG = make_etag("face_123abc.webp")
+
+def request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    })
+
+def test_etag_strips_the_extension():
+    assert ETAG == '"face_123abc"'
+
+@pytest.mark.parametrize("header, matches", [
+    (None, False),
+    ('"face_123abc"', True),
+    ('W/"face_123abc"', True),
+    ('"other", "face_123abc"', True),
+    ("*", True),
+    ('"other"', False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, ETAG) is matches
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=90-500", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    # Not a single bytes range, the whole body is sent
+    ("items=0-9", None),
+    ("bytes=0-1,5-6", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, len(DATA)) == expected
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=10-5", "bytes=-0"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, len(DATA))
+
+def test_full_response_is_immutable():
+    response = cached_response(request(), DATA, ETAG, "image/webp")
+    assert response.status_code == 200
+    assert response.body == DATA
+    assert response.headers["etag"] == ETAG
+    assert "immutable" in response.headers["cache-control"]
+    assert response.headers["accept-ranges"] == "bytes"
+
+def test_if_none_match_answers_304_without_a_body():
+    response = cached_response(request(if_none_match=ETAG), DATA, ETAG, "image/webp")
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == ETAG
+
+def test_range_answers_206():
+    response = cached_response(request(range="bytes=10-19"), DATA, ETAG, "image/webp")
+    assert response.status_code == 206
+    assert response.body == DATA[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/100"
+
+def test_unsatisfiable_range_answers_416():
+    response = cached_response(request(range="bytes=200-"), DATA, ETAG, "image/webp")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+def test_stale_if_range_sends_the_whole_body():
+    response = cached_response(request(range="bytes=10-19", if_range='"old"'), DATA, ETAG, "image/webp")
+    assert response.status_code == 200
+    assert response.body == DATA
+    response = cached_response(request(range="bytes=10-19", if_range=ETAG), DATA, ETAG, "image/webp")
+    assert response.status_code == 206
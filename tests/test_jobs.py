@@ -0,0 +1,116 @@
+import asyncio
+import json
+import tarfile
+
+from services.executor import InferenceExecutor
+from services.jobs import JobManager
+
+class FakeGenerator:
+    fingerprint = "fake"
+
+class FakeService:
+    """Encodes a face as its seed and psi, failing once after fail_after batches"""
+
+    def __init__(self, fail_after=None):
+        self.executor = InferenceExecutor(max_workers=1)
+        self.generator = FakeGenerator()
+        self.precision = "fp32"
+        self.fail_after = fail_after
+        self.rendered = []
+
+    def render_encoded(self, seeds, truncation_psi, enhance_face=True, format="png"):
+        if self.fail_after is not None and len(self.rendered) == self.fail_after:
+            self.fail_after = None
+            raise RuntimeError("worker died")
+        self.rendered.append(list(seeds))
+        return [f"{seed}@{truncation_psi}".encode() for seed in seeds]
+
+async def wait_for(job, *states):
+    for _ in range(200):
+        if job.state["state"] in states:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job stuck in {job.state['state']}")
+
+def read_shard(job, shard):
+    with tarfile.open(str(job.shard_path(shard))) as tar:
+        return {member.name: tar.extractfile(member).read() for member in tar.getmembers()}
+
+def test_job_writes_shards_with_byte_range_index(tmp_path):
+    service = FakeService()
+
+    async def main():
+        manager = JobManager(service, directory=str(tmp_path), batch_size=2)
+        manager.start()
+        job = manager.submit(0, 5, [0.5], format="png", shard_size=3)
+        await wait_for(job, "completed")
+        manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.num_shards == 2
+    members = {**read_shard(job, 0), **read_shard(job, 1)}
+    assert len(members) == 5
+    data = job.shard_path(0).read_bytes()
+    for entry in json.loads(job.index_path(0).read_text()):
+        assert data[entry["offset"]:entry["offset"] + entry["size"]] == f"{entry['seed']}@0.5".encode()
+
+def test_interrupted_shard_resumes_after_its_last_batch(tmp_path):
+    service = FakeService(fail_after=2)
+
+    async def main():
+        manager = JobManager(service, directory=str(tmp_path), batch_size=2)
+        manager.start()
+        job = manager.submit(0, 6, [0.5], format="png", shard_size=6)
+        await wait_for(job, "failed")
+        # A batch that was half written when the process died
+        with open(str(job.shard_path(0).with_suffix(".tar.tmp")), "ab") as f:
+            f.write(b"\0" * 700)
+        with open(str(job.progress_path(0)), "a") as f:
+            f.write('{"entries": [{"name": "0000000004')
+        manager.resume(job)
+        await wait_for(job, "completed")
+        manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    # The two checkpointed batches are not rendered again
+    assert service.rendered == [[0, 1], [2, 3], [4, 5]]
+    members = read_shard(job, 0)
+    assert sorted(members.values()) == sorted(f"{seed}@0.5".encode() for seed in range(6))
+    index = json.loads(job.index_path(0).read_text())
+    assert [entry["seed"] for entry in index] == list(range(6))
+    data = job.shard_path(0).read_bytes()
+    for entry in index:
+        assert data[entry["offset"]:entry["offset"] + entry["size"]] == f"{entry['seed']}@0.5".encode()
+    assert not job.progress_path(0).exists()
+
+def test_member_names_keep_the_exact_truncation(tmp_path):
+    service = FakeService()
+
+    async def main():
+        manager = JobManager(service, directory=str(tmp_path), batch_size=4)
+        manager.start()
+        job = manager.submit(7, 8, [0.5, 0.501, 0.5], format="png", shard_size=4)
+        await wait_for(job, "completed")
+        manager.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job.spec["truncations"] == [0.5, 0.501]
+    assert sorted(read_shard(job, 0)) == ["0000000007_psi0.5.png", "0000000007_psi0.501.png"]
+
+def test_progress_counts_items_after_every_batch(tmp_path):
+    service = FakeService(fail_after=3)
+
+    async def main():
+        manager = JobManager(service, directory=str(tmp_path), batch_size=2)
+        manager.start()
+        job = manager.submit(0, 10, [0.5], format="png", shard_size=100)
+        await wait_for(job, "failed")
+        return job
+
+    job = asyncio.run(main())
+    # Three batches of two in a shard that is not finished yet
+    assert job.to_dict()["completed_items"] == 6
+    assert job.to_dict()["progress"] == 0.6
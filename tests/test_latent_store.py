@@ -0,0 +1,67 @@
+import numpy as np
+
+from models.latent_store import LatentStore
+
+W_DIM = 4
+
+def compute(calls):
+    def compute_ws(seeds):
+        calls.append(list(seeds))
+        return np.array([[seed] * W_DIM for seed in seeds], dtype=np.float32)
+    return compute_ws
+
+def make_store(tmp_path, fingerprint="model-a", table_size=10, lru_size=8):
+    return LatentStore(str(tmp_path), fingerprint, W_DIM, table_size=table_size, lru_size=lru_size)
+
+def test_get_many_computes_missing_seeds_once(tmp_path):
+    store = make_store(tmp_path)
+    calls = []
+    ws = store.get_many([3, 5, 3, 42], compute(calls))
+    assert ws[:, 0].tolist() == [3, 5, 3, 42]
+    assert calls == [[3, 5, 42]]
+    store.get_many([5, 42], compute(calls))
+    assert len(calls) == 1
+
+def test_table_rows_persist_across_processes(tmp_path):
+    store = make_store(tmp_path)
+    store.get_many([1, 2, 42], compute([]))
+    assert store.filled.tolist() == [i in (1, 2) for i in range(10)]
+    store.flush()
+    del store
+
+    reopened = make_store(tmp_path)
+    calls = []
+    ws = reopened.get_many([1, 2, 42], compute(calls))
+    assert ws[:, 0].tolist() == [1, 2, 42]
+    # Seeds outside the table only lived in the old process's LRU
+    assert calls == [[42]]
+    assert reopened.missing_seeds([0, 1, 2, 3]) == [0, 3]
+
+def test_another_fingerprint_does_not_reuse_rows(tmp_path):
+    store = make_store(tmp_path, fingerprint="model-a")
+    store.put_many([1], np.ones((1, W_DIM), dtype=np.float32))
+    store.flush()
+
+    other = make_store(tmp_path, fingerprint="model-b")
+    assert other.lookup(1) is None
+    assert other.missing_seeds([1]) == [1]
+    assert make_store(tmp_path, fingerprint="model-a").lookup(1).tolist() == [1.0] * W_DIM
+
+def test_table_of_another_shape_is_rebuilt(tmp_path):
+    store = make_store(tmp_path, table_size=10)
+    store.put_many([1], np.ones((1, W_DIM), dtype=np.float32))
+    store.flush()
+    del store
+
+    resized = make_store(tmp_path, table_size=20)
+    assert resized.table.shape == (20, W_DIM)
+    assert not resized.filled.any()
+    assert resized.lookup(1) is None
+
+def test_lru_only_store_is_bounded(tmp_path):
+    store = make_store(tmp_path, table_size=0, lru_size=2)
+    assert store.table is None
+    store.get_many([1, 2, 3], compute([]))
+    assert store.lookup(1) is None
+    assert store.lookup(3).tolist() == [3.0] * W_DIM
+    assert store.missing_seeds([1, 2]) == [1, 2]
@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    import models.stylegan2  # noqa: F401
+except ImportError:
+    pytest.skip("needs the stylegan2-ada-pytorch submodule", allow_module_level=True)
+
+from services.executor import InferenceExecutor
+from services.model_registry import DEFAULT_MODEL, ModelRegistry, UnknownModelError
+
+MB = 1024 * 1024
+
+class FakeLatents:
+    memory_bytes = MB // 4
+
+    def __init__(self):
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+class FakeGenerator:
+    def __init__(self, path):
+        self.path = path
+        self.G = SimpleNamespace(img_resolution=256)
+        self.memory_bytes = MB
+        self.latents = FakeLatents()
+
+def make_registry(budget_mb=4, pinned=()):
+    registry = ModelRegistry(
+        InferenceExecutor(max_workers=1),
+        default_path="default.pkl",
+        paths={"a": "a.pkl", "b": "b.pkl", "c": "c.pkl"},
+        memory_budget_mb=budget_mb,
+        pinned=list(pinned),
+        create=FakeGenerator
+    )
+    registry.add(DEFAULT_MODEL, FakeGenerator("default.pkl"), 0.0)
+    return registry
+
+def test_memory_counts_weights_and_latents():
+    registry = make_registry()
+    assert registry.memory_bytes == MB + MB // 4
+
+def test_loads_once_and_evicts_least_recently_used():
+    async def main():
+        registry = make_registry(budget_mb=4)
+        a = await registry.get("a")
+        assert await registry.get("a") is a
+        await registry.get("b")
+        await registry.get("a")
+        # A third checkpoint of 1.25 MB is over 4 MB, "b" is the least recently used
+        await registry.get("c")
+        stats = registry.get_stats()
+        assert stats["loaded"] == [DEFAULT_MODEL, "a", "c"]
+        assert (stats["loads"], stats["hits"], stats["evictions"]) == (3, 2, 1)
+        assert registry.memory_bytes <= registry.memory_budget
+
+    asyncio.run(main())
+
+def test_concurrent_first_requests_share_one_load():
+    async def main():
+        registry = make_registry()
+        models = await asyncio.gather(*[registry.get("a") for _ in range(4)])
+        assert all(model is models[0] for model in models)
+        assert registry.get_stats()["loads"] == 1
+
+    asyncio.run(main())
+
+def test_pinned_models_survive_eviction():
+    async def main():
+        registry = make_registry(budget_mb=4, pinned=["a"])
+        await registry.get("a")
+        await registry.get("b")
+        await registry.get("c")
+        assert registry.get_stats()["loaded"] == [DEFAULT_MODEL, "a", "c"]
+
+        await registry.pin("c")
+        # Nothing left to evict, the budget is exceeded by pinned models only
+        await registry.get("b")
+        assert set(registry.get_stats()["loaded"]) == {DEFAULT_MODEL, "a", "b", "c"}
+        registry.unpin("c")
+        assert "c" not in registry.get_stats()["loaded"]
+        with pytest.raises(ValueError):
+            registry.unpin(DEFAULT_MODEL)
+
+    asyncio.run(main())
+
+def test_evicted_model_stays_usable_by_requests_already_using_it():
+    async def main():
+        registry = make_registry(budget_mb=3)
+        a = await registry.get("a")
+        with registry.use(a):
+            await registry.get("b")
+            assert "a" not in registry.get_stats()["loaded"]
+            assert registry.current() is a
+            # Evicted latents are flushed
+            assert a.generator.latents.flushes == 1
+        assert registry.current() is registry.default
+
+    asyncio.run(main())
+
+def test_reload_makes_room_with_the_measured_size():
+    async def main():
+        registry = make_registry(budget_mb=4)
+        loaded_at_create = []
+
+        def create(path):
+            loaded_at_create.append(list(registry.get_stats()["loaded"]))
+            return FakeGenerator(path)
+
+        registry.create = create
+        for name in ("a", "b", "c"):
+            await registry.get(name)
+        assert "a" not in registry.get_stats()["loaded"]
+        # "a" was measured at 1.25 MB when first loaded, so "b" is evicted before it is read again
+        await registry.get("a")
+        assert loaded_at_create[-1] == [DEFAULT_MODEL, "c"]
+        assert registry.get_stats()["loaded"] == [DEFAULT_MODEL, "c", "a"]
+
+    asyncio.run(main())
+
+def test_unknown_model():
+    registry = make_registry()
+    with pytest.raises(UnknownModelError):
+        asyncio.run(registry.get("missing"))
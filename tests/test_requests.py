@@ -0,0 +1,16 @@
+import pytest
+from pydantic import ValidationError
+
+from schemas.requests import GenerateGridRequest
+
+def grid(**fields):
+    return GenerateGridRequest(row_seeds=[1, 2], col_seeds=[3], **fields)
+
+def test_col_styles_default_to_none():
+    assert grid().col_styles is None
+    assert grid(col_styles=[0, 3, 6]).col_styles == [0, 3, 6]
+
+@pytest.mark.parametrize("col_styles", [[], [-1], [0, -2]])
+def test_invalid_col_styles_are_rejected(col_styles):
+    with pytest.raises(ValidationError):
+        grid(col_styles=col_styles)
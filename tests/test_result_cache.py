@@ -0,0 +1,115 @@
+import os
+import time
+
+import pytest
+
+from services import cache as cache_module
+from services.cache import TEMP_PREFIX, ResultCache
+
+def make_cache(tmp_path, max_bytes=1000, memory_max_bytes=1000):
+    return ResultCache(directory=str(tmp_path), max_bytes=max_bytes, memory_max_bytes=memory_max_bytes, url_prefix="/static/")
+
+def test_filename_covers_every_parameter():
+    name = ResultCache.make_filename("42", extension="webp", truncation_psi=0.5, model="a")
+    assert name.startswith("42_") and name.endswith(".webp")
+    assert name == ResultCache.make_filename("42", extension="webp", model="a", truncation_psi=0.5)
+    assert name != ResultCache.make_filename("42", extension="webp", truncation_psi=0.7, model="a")
+
+def test_put_then_get_from_memory_and_disk(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("a.png", b"x" * 10)
+    assert cache.url("a.png") == "/static/a.png"
+    assert (tmp_path / "a.png").read_bytes() == b"x" * 10
+    assert cache.get("a.png") == b"x" * 10
+    assert cache.get_stats()["memory_hits"] == 1
+
+    # A cold process reads from disk and promotes the entry to the hot tier
+    cold = make_cache(tmp_path)
+    assert cold.get("a.png") == b"x" * 10
+    stats = cold.get_stats()
+    assert (stats["hits"], stats["memory_hits"], stats["memory_entries"]) == (1, 0, 1)
+    assert cold.get("missing.png") is None
+    assert cold.get_stats()["misses"] == 1
+
+def test_evicts_least_recently_used_over_budget(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=250)
+    for name in ("a", "b"):
+        cache.put(name, b"x" * 100)
+    # A lookup refreshes "a", so "b" is the oldest when "c" pushes the cache over budget
+    cache.get("a")
+    cache.put("c", b"x" * 100)
+    assert not (tmp_path / "b").exists()
+    assert cache.get("b") is None
+    assert cache.contains("a") and cache.contains("c")
+    stats = cache.get_stats()
+    assert (stats["evictions"], stats["entries"], stats["disk_bytes"]) == (1, 2, 200)
+
+def test_keeps_the_last_entry_even_over_budget(tmp_path):
+    cache = make_cache(tmp_path, max_bytes=50)
+    cache.put("a", b"x" * 10)
+    cache.put("big", b"x" * 100)
+    assert cache.contains("big") and not cache.contains("a")
+    assert cache.get_stats()["entries"] == 1
+
+def test_rewriting_an_entry_keeps_the_byte_count(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("a", b"x" * 100)
+    cache.put("a", b"y" * 40)
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["disk_bytes"], stats["memory_bytes"]) == (1, 40, 40)
+    assert cache.get("a") == b"y" * 40
+
+def test_write_is_atomic(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+
+    def crash(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(cache_module.os, "replace", crash)
+    with pytest.raises(OSError):
+        cache.put("a.png", b"x" * 10)
+    monkeypatch.undo()
+    # The final name never holds a partial file, only a temp file is left behind
+    assert not (tmp_path / "a.png").exists()
+    assert [path.name.startswith(TEMP_PREFIX) for path in tmp_path.iterdir()] == [True]
+    assert not cache.contains("a.png")
+
+    cache.put("b.png", b"x" * 10)
+    assert sorted(path.name for path in tmp_path.iterdir() if not path.name.startswith(TEMP_PREFIX)) == ["b.png"]
+
+def test_startup_scan_drops_temp_files_and_rebuilds_lru_order(tmp_path):
+    now = time.time()
+    for age, name in ((30, "old"), (20, "mid"), (10, "new")):
+        (tmp_path / name).write_bytes(b"x" * 100)
+        os.utime(str(tmp_path / name), (now - age, now - age))
+    (tmp_path / (TEMP_PREFIX + "crashed")).write_bytes(b"partial")
+
+    cache = make_cache(tmp_path, max_bytes=250)
+    assert not (tmp_path / (TEMP_PREFIX + "crashed")).exists()
+    # Over budget at startup, the least recently accessed file goes first
+    assert not (tmp_path / "old").exists()
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["disk_bytes"], stats["evictions"]) == (2, 200, 1)
+    assert cache.contains("mid") and cache.contains("new")
+
+def test_memory_tier_is_byte_bounded(tmp_path):
+    cache = make_cache(tmp_path, memory_max_bytes=150)
+    cache.put("a", b"x" * 100)
+    cache.put("b", b"x" * 100)
+    stats = cache.get_stats()
+    assert (stats["memory_entries"], stats["memory_bytes"], stats["entries"]) == (1, 100, 2)
+    # Still on disk after leaving the hot tier
+    assert cache.get("a") == b"x" * 100
+    assert cache.get_stats()["memory_hits"] == 0
+    # Larger than the whole tier, served from disk only
+    cache.put("huge", b"x" * 200)
+    assert cache.get_stats()["memory_bytes"] <= 150
+
+def test_remember_serves_ahead_of_a_deferred_put(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.remember("a", b"x" * 10)
+    assert cache.get("a") == b"x" * 10
+    assert not (tmp_path / "a").exists()
+    assert cache.get_stats()["entries"] == 0
+    cache.put("a", b"x" * 10)
+    assert cache.get_stats()["entries"] == 1
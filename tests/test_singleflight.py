@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from services.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def compute(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("key", compute, 21) for _ in range(5)])
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == [42] * 5
+    assert calls == [21]
+    assert flight.get_stats() == {"computed": 1, "shared": 4, "in_flight": 0}
+
+def test_finished_keys_are_computed_again():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight()
+        return [await flight.do("key", compute), await flight.do("key", compute)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+def test_errors_reach_every_caller_and_are_not_cached():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.get_stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+def test_a_cancelled_caller_does_not_cancel_the_others():
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.ensure_future(flight.do("key", compute))
+        second = asyncio.ensure_future(flight.do("key", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == "done"
+
+def test_do_many_computes_only_keys_not_in_flight():
+    batches = []
+
+    async def compute_many(keys):
+        batches.append(list(keys))
+        await asyncio.sleep(0.01)
+        return [key * 10 for key in keys]
+
+    async def compute_one():
+        await asyncio.sleep(0.01)
+        return 20
+
+    async def main():
+        flight = SingleFlight()
+        single = asyncio.ensure_future(flight.do(2, compute_one))
+        await asyncio.sleep(0)
+        results = await flight.do_many([1, 2, 3, 1], compute_many)
+        await single
+        return results
+
+    assert asyncio.run(main()) == [10, 20, 30, 10]
+    assert batches == [[1, 3]]
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from services import tiled_sr
+from services.tiled_sr import BYTES_PER_INPUT_PIXEL, MIN_TILE_SIZE, TiledUpsampler
+
+class NearestX4(torch.nn.Module):
+    """Per-pixel network, tiling must not change its output at all"""
+
+    def forward(self, x):
+        return torch.nn.functional.interpolate(x, scale_factor=4, mode="nearest")
+
+def upsampler(model):
+    return SimpleNamespace(model=model.eval(), scale=4, device=torch.device("cpu"), half=False)
+
+def image(size=48, seed=0):
+    return np.random.RandomState(seed).randint(0, 256, size=(size, size, 3), dtype=np.uint8)
+
+def untiled(tiled, img):
+    return tiled._run_batch(img[None])[0].round().clip(0, 255).astype(np.uint8)
+
+def test_overlap_blend_leaves_no_seams():
+    tiled = TiledUpsampler(upsampler(NearestX4()), tile_size=16, tile_overlap=4, tile_batch_size=3)
+    img = image()
+    output, _ = tiled.enhance(img)
+    assert tiled.last_stats["tiles"] == 9
+    # Every output pixel is a weighted mean of identical values, tile borders included
+    assert np.array_equal(output, untiled(tiled, img))
+
+def test_tiled_rrdbnet_matches_untiled_output():
+    try:
+        from basicsr.archs.rrdbnet_arch import RRDBNet
+    except ImportError:
+        pytest.skip("needs basicsr")
+
+    torch.manual_seed(0)
+    # The stand-in enhancer's architecture, narrower still to keep the test fast
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=16, num_block=2, num_grow_ch=8, scale=4)
+    img = image()
+    errors = []
+    for overlap in (0, 12):
+        tiled = TiledUpsampler(upsampler(model), tile_size=24, tile_overlap=overlap, tile_batch_size=2)
+        output, _ = tiled.enhance(img)
+        reference = untiled(tiled, img)
+        assert output.shape == reference.shape == (192, 192, 3)
+        errors.append(np.abs(output.astype(np.int16) - reference.astype(np.int16)))
+    assert errors[1].mean() < 0.2 and errors[1].max() <= 8
+    # The overlap is what hides the tile borders
+    assert errors[1].mean() < errors[0].mean()
+
+def test_outscale_resizes_the_result():
+    tiled = TiledUpsampler(upsampler(NearestX4()), tile_size=16, tile_overlap=4)
+    output, _ = tiled.enhance(image(32), outscale=2)
+    assert output.shape == (64, 64, 3)
+
+def test_fixed_tile_size_is_capped_by_the_input():
+    tiled = TiledUpsampler(upsampler(NearestX4()), tile_size=256)
+    assert tiled.choose_tile_size(64, 48) == 64
+
+def test_automatic_tile_size_follows_available_memory(monkeypatch):
+    tiled = TiledUpsampler(upsampler(NearestX4()), memory_budget_mb=1024, tile_size=0, tile_overlap=8, tile_batch_size=1)
+    available = {"bytes": 1 << 40}
+    monkeypatch.setattr(tiled_sr.psutil, "virtual_memory", lambda: SimpleNamespace(available=available["bytes"]))
+
+    # Fits the budget whole
+    assert tiled.choose_tile_size(128, 128) == 128
+    # Half of the available memory is the limit when it is below the budget
+    available["bytes"] = 2 * 200 * 200 * BYTES_PER_INPUT_PIXEL
+    side = tiled.choose_tile_size(1024, 1024)
+    assert side % 8 == 0 and MIN_TILE_SIZE <= side < 200
+    # Never below the minimum tile
+    available["bytes"] = 1
+    assert tiled.choose_tile_size(1024, 1024) == MIN_TILE_SIZE
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from services.worker_pool import WorkerPool
+
+class Sleeper:
+    def sleep(self, seconds):
+        time.sleep(seconds)
+        return os.getpid()
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool({"sleeper": Sleeper()}, num_workers=2, threads_per_worker=1)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+def test_jobs_run_in_the_workers(pool):
+    async def main():
+        return await pool.broadcast("sleeper", "sleep", 0)
+
+    assert sorted(asyncio.run(main())) == sorted(pool.pids)
+
+def test_crashed_worker_fails_its_jobs_while_another_is_busy(pool):
+    async def main():
+        stuck = asyncio.ensure_future(pool.submit("sleeper", "sleep", 60, worker=1))
+        await asyncio.sleep(0.2)
+        assert pool.get_stats()["in_flight"] == [0, 1]
+        os.kill(pool.pids[1], signal.SIGKILL)
+
+        # The other worker keeps the result queue busy the whole time
+        start = time.monotonic()
+        while not stuck.done() and time.monotonic() - start < 10:
+            await pool.submit("sleeper", "sleep", 0.05, worker=0)
+        assert stuck.done()
+        with pytest.raises(RuntimeError, match="worker 1 exited"):
+            await stuck
+        assert pool.get_stats()["in_flight"] == [0, 0]
+        # New jobs are routed to the live worker only
+        assert await pool.submit("sleeper", "sleep", 0) == pool.pids[0]
+
+    asyncio.run(main())